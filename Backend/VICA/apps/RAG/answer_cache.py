@@ -0,0 +1,139 @@
+import math
+import time
+import logging
+import operator
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+
+def _unit(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else list(vector)
+
+
+def _dot(a: Sequence[float], b: Sequence[float]) -> float:
+    return sum(map(operator.mul, a, b))
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    # Vektor satuan, sehingga cosine similarity cukup dot product
+    embedding: List[float]
+    response: str
+    metadata: dict = field(default_factory=dict)
+    created_at: float = field(default_factory=time.monotonic)
+
+
+####################
+# SemanticAnswerCache
+####################
+
+class SemanticAnswerCache:
+    """Cache jawaban per collection; pertanyaan baru dicocokkan lewat cosine similarity embedding.
+
+    Cache ada di memori tiap worker, jadi validitasnya ditentukan `version`: sidik
+    jari isi collection dari state bersama (tabel file). Lookup dengan version yang
+    berbeda mengosongkan jawaban collection tsb., sehingga ingestion di worker lain
+    tetap terlihat; store dengan version lama (query yang berjalan bersamaan dengan
+    ingestion) ditolak. `invalidate` hanya mempercepat hal ini di worker sendiri.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 256,
+        ttl: float = 3600,
+        max_collections: int = 512,
+    ) -> None:
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.max_collections = max(1, max_collections)
+        self.hits = 0
+        self.misses = 0
+        self._collections: "OrderedDict[str, Deque[CachedAnswer]]" = OrderedDict()
+        self._versions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def lookup(
+        self, collection_id: str, embedding: Sequence[float], version: Optional[str] = None
+    ) -> Optional[Tuple[CachedAnswer, float]]:
+        query = _unit(embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            if version is not None and self._versions.get(collection_id) != version:
+                # Collection berubah (mungkin lewat worker lain): jawaban lama tidak berlaku
+                self._collections.pop(collection_id, None)
+                self._versions[collection_id] = version
+            entries = self._collections.get(collection_id)
+            best, best_score = None, self.threshold
+            if entries:
+                self._collections.move_to_end(collection_id)
+                for entry in list(entries):
+                    if now - entry.created_at > self.ttl:
+                        entries.remove(entry)
+                        continue
+                    score = _dot(query, entry.embedding)
+                    if score >= best_score:
+                        best, best_score = entry, score
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return best, best_score
+
+    def store(
+        self,
+        collection_id: str,
+        question: str,
+        embedding: Sequence[float],
+        response: str,
+        metadata: Optional[dict] = None,
+        version: Optional[str] = None,
+    ) -> bool:
+        entry = CachedAnswer(question, _unit(embedding), response, dict(metadata or {}))
+
+        with self._lock:
+            if version is not None and self._versions.setdefault(collection_id, version) != version:
+                log.debug(f"Skipping stale answer for collection '{collection_id}'")
+                return False
+
+            entries = self._collections.get(collection_id)
+            if entries is None:
+                entries = self._collections[collection_id] = deque(maxlen=self.max_entries)
+            self._collections.move_to_end(collection_id)
+            entries.append(entry)
+
+            while len(self._collections) > self.max_collections:
+                evicted, _ = self._collections.popitem(last=False)
+                self._versions.pop(evicted, None)
+        return True
+
+    def invalidate(self, collection_id: str) -> None:
+        with self._lock:
+            self._collections.pop(collection_id, None)
+            # Tandai version tidak diketahui; store berikutnya dari query lama ditolak
+            self._versions[collection_id] = ""
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = sum(len(collection) for collection in self._collections.values())
+            collections = len(self._collections)
+        lookups = self.hits + self.misses
+        return {
+            "name": "answers",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "collections": collections,
+            "entries": entries,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+        }
@@ -0,0 +1,155 @@
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence
+
+from llama_index.core.schema import BaseNode, NodeWithScore, TextNode
+
+from Backend.VICA.apps.RAG.embedding import attach_file_metadata
+
+log = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Kata umum (Inggris/Indonesia) yang dibuang dari query agar tidak mendominasi skor
+STOPWORDS = frozenset(
+    "a an and are as at be by do does did for from how in is it of on or that the this to "
+    "was were what when where which who why with yang dan di ke dari untuk pada dengan "
+    "adalah ini itu apa apakah bagaimana berapa siapa kapan mengapa atau juga dalam".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.casefold()) if len(token) > 1]
+
+
+def match_expression(question: str, max_terms: int = 32) -> str:
+    # Setiap term dikutip agar karakter khusus FTS5 (AND, NEAR, *, :) tidak diinterpretasi
+    terms = [term for term in dict.fromkeys(tokenize(question)) if term not in STOPWORDS][:max_terms]
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+####################
+# BM25Index
+####################
+
+class BM25Index:
+    """Index sparse (BM25) per knowledge base di SQLite FTS5: satu file per collection.
+
+    Node ditambahkan bertahap saat ingestion dan bisa dihapus per file, sama
+    seperti point di Qdrant. Skor memakai fungsi bm25() bawaan FTS5.
+    """
+
+    def __init__(self, base_dir: str) -> None:
+        self.base_dir = base_dir
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(base_dir, exist_ok=True)
+
+    def db_path(self, collection_id: str) -> str:
+        return os.path.join(self.base_dir, f"{collection_id}.db")
+
+    def add_nodes(self, collection_id: str, file_id: str, nodes: Sequence[BaseNode]) -> int:
+        rows = [
+            (
+                node.get_content(),
+                node.node_id,
+                file_id,
+                json.dumps(
+                    {
+                        "metadata": node.metadata,
+                        "excluded_embed_metadata_keys": node.excluded_embed_metadata_keys,
+                        "excluded_llm_metadata_keys": node.excluded_llm_metadata_keys,
+                    },
+                    ensure_ascii=False,
+                    default=str,
+                ),
+            )
+            for node in nodes
+        ]
+        if not rows:
+            return 0
+
+        with self._lock(collection_id), self._connect(collection_id) as conn:
+            conn.executemany(
+                "INSERT INTO chunks (text, node_id, file_id, metadata) VALUES (?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def search(self, collection_id: str, question: str, top_k: int = 10) -> List[NodeWithScore]:
+        expression = match_expression(question)
+        if not expression or not os.path.exists(self.db_path(collection_id)):
+            return []
+
+        with self._connect(collection_id, read_only=True) as conn:
+            rows = conn.execute(
+                "SELECT node_id, text, metadata, bm25(chunks) AS rank FROM chunks "
+                "WHERE chunks MATCH ? ORDER BY rank LIMIT ?",
+                (expression, top_k),
+            ).fetchall()
+
+        # bm25() FTS5 bernilai negatif (makin kecil makin relevan)
+        return [
+            NodeWithScore(node=_restore_node(node_id, text, metadata), score=-rank)
+            for node_id, text, metadata, rank in rows
+        ]
+
+    def drop_file(self, collection_id: str, file_id: str) -> None:
+        if not os.path.exists(self.db_path(collection_id)):
+            return
+        with self._lock(collection_id), self._connect(collection_id) as conn:
+            conn.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+
+    def drop_collection(self, collection_id: str) -> None:
+        with self._lock(collection_id):
+            for suffix in ("", "-wal", "-shm"):
+                path = self.db_path(collection_id) + suffix
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _lock(self, collection_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(collection_id, threading.Lock())
+
+    @contextmanager
+    def _connect(self, collection_id: str, read_only: bool = False) -> Iterator[sqlite3.Connection]:
+        path = self.db_path(collection_id)
+        if read_only:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        else:
+            conn = sqlite3.connect(path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+                "text, node_id UNINDEXED, file_id UNINDEXED, metadata UNINDEXED, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+def _restore_node(node_id: str, text: str, stored: str) -> TextNode:
+    data = json.loads(stored)
+    # Baris lama hanya berisi metadata tanpa daftar key yang dikecualikan
+    if "metadata" not in data or "excluded_llm_metadata_keys" not in data:
+        data = {"metadata": data}
+    node = TextNode(
+        id_=node_id,
+        text=text,
+        excluded_embed_metadata_keys=data.get("excluded_embed_metadata_keys", []),
+        excluded_llm_metadata_keys=data.get("excluded_llm_metadata_keys", []),
+    )
+    # Metadata pencatatan (file_id, user_id, ...) tetap tidak masuk prompt LLM
+    return attach_file_metadata(node, data["metadata"])
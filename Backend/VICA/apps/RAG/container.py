@@ -0,0 +1,328 @@
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+from Backend.VICA.apps.RAG.cache import PersistentLRUCache, TTLCache
+from Backend.VICA.apps.RAG.model_metadata import ModelMetadataStore
+from Backend.VICA.apps.RAG.workers import CPUWorkerPool, ensure_nltk_data
+from Backend.VICA.config import (
+    LLM_MODEL_NAME,
+    EMBED_MODEL_NAME,
+    COHERE_API_KEY,
+    GROQ_API_KEY,
+    JINA_API_KEY,
+    QDRANT_URL,
+    QDRANT_API_KEY,
+    VISION_CACHE_PATH,
+    VISION_CACHE_MAX_BYTES,
+    EMBED_CACHE_PATH,
+    EMBED_CACHE_MAX_BYTES,
+    RAG_EMBED_BATCH_SIZE,
+    RAG_EMBED_MAX_IN_FLIGHT,
+    RAG_EMBED_RETRIES,
+    QDRANT_UPSERT_BATCH_SIZE,
+    QDRANT_UPSERT_PARALLELISM,
+    QDRANT_UPSERT_WAIT,
+    QDRANT_BARRIER_TIMEOUT,
+    RAG_TABLES_DIR,
+    PDF_IMAGE_FILTER_ENABLED,
+    PDF_IMAGE_MIN_SIDE,
+    PDF_IMAGE_MIN_AREA,
+    PDF_IMAGE_MIN_ENTROPY,
+    PDF_IMAGE_HASH_DISTANCE,
+    MODEL_METADATA_PATH,
+    NLTK_DATA_DIR,
+    RAG_HANDLE_CACHE_SIZE,
+    RAG_HANDLE_CACHE_TTL,
+    RAG_QUERY_CACHE_SIZE,
+    RAG_QUERY_CACHE_TTL,
+    RAG_QUERY_CACHE_PERSIST,
+    RAG_ANSWER_CACHE_ENABLED,
+    RAG_ANSWER_CACHE_THRESHOLD,
+    RAG_ANSWER_CACHE_SIZE,
+    RAG_ANSWER_CACHE_TTL,
+    RAG_ANSWER_CACHE_COLLECTIONS,
+    RAG_BM25_ENABLED,
+    RAG_BM25_DIR,
+)
+
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class lazy_service:
+    """Descriptor: service dibuat saat pertama diakses lalu disimpan di instance.
+
+    Pembuatan dijaga RLock milik container, karena satu factory bisa
+    membutuhkan service lain (mis. pdf_service -> description_cache).
+    """
+
+    def __init__(self, factory: Callable[[Any], Any]) -> None:
+        self.factory = factory
+        self.name = factory.__name__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        value = instance.__dict__.get(self.name, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with instance._lock:
+            value = instance.__dict__.get(self.name, _MISSING)
+            if value is _MISSING:
+                started = time.perf_counter()
+                value = self.factory(instance)
+                instance.__dict__[self.name] = value
+                log.info(f"Built RAG service '{self.name}' in {time.perf_counter() - started:.2f}s")
+        return value
+
+
+####################
+# RAGServices
+####################
+
+class RAGServices:
+    """Container lazy untuk model, client, dan service RAG.
+
+    Tidak ada import berat, koneksi jaringan, atau unduhan saat modul dimuat;
+    semuanya dibuat saat pertama dipakai atau oleh `warm_up` di background.
+    """
+
+    def __init__(self, cpu_pool: CPUWorkerPool) -> None:
+        self.cpu_pool = cpu_pool
+        self.metadata = ModelMetadataStore(MODEL_METADATA_PATH)
+        self._lock = threading.RLock()
+
+    async def aget(self, name: str) -> Any:
+        """Ambil service dari coroutine tanpa memblokir event loop saat pertama dibuat."""
+        if name in self.__dict__:
+            return self.__dict__[name]
+        return await asyncio.to_thread(getattr, self, name)
+
+    async def warm_up(self) -> None:
+        try:
+            await asyncio.to_thread(self._warm_up)
+        except Exception as e:
+            # Warm-up hanya optimasi; service dibuat ulang saat request pertama
+            log.warning(f"RAG warm-up incomplete: {e}")
+
+    def _warm_up(self) -> None:
+        started = time.perf_counter()
+        ensure_nltk_data(NLTK_DATA_DIR)
+        self.multi_modal_rag
+        self.embedding_service.dimension()
+        log.info(f"RAG services warmed up in {time.perf_counter() - started:.2f}s")
+
+    async def aclose(self) -> None:
+        # Hanya client async yang sudah dibuat yang perlu ditutup
+        if "async_qdrant_client" in self.__dict__:
+            await self.async_qdrant_client.close()
+
+    def status(self) -> Dict[str, bool]:
+        return {
+            name: name in self.__dict__
+            for name, attribute in type(self).__dict__.items()
+            if isinstance(attribute, lazy_service)
+        }
+
+    # Model dan client
+
+    @lazy_service
+    def llm(self):
+        from llama_index.core import Settings
+        from llama_index.llms.groq import Groq as llama_Groq
+
+        llm = llama_Groq(model="llama3-8b-8192", api_key=GROQ_API_KEY)
+        Settings.llm = llm
+        return llm
+
+    @lazy_service
+    def ollama_llm(self):
+        from llama_index.llms.ollama import Ollama
+
+        return Ollama(model=LLM_MODEL_NAME, request_timeout=120)
+
+    @lazy_service
+    def embed_model(self):
+        from llama_index.core import Settings
+        from llama_index.embeddings.jinaai import JinaEmbedding
+
+        embed_model = JinaEmbedding(api_key=JINA_API_KEY, model="jina-embeddings-v3")
+        Settings.embed_model = embed_model
+        return embed_model
+
+    @lazy_service
+    def ollama_embed_model(self):
+        from llama_index.embeddings.ollama import OllamaEmbedding
+
+        return OllamaEmbedding(model_name=EMBED_MODEL_NAME)
+
+    @lazy_service
+    def rerank_client(self):
+        import cohere
+
+        return cohere.Client(COHERE_API_KEY)
+
+    @lazy_service
+    def vision_client(self):
+        from groq import Groq
+
+        return Groq(api_key=GROQ_API_KEY)
+
+    @lazy_service
+    def async_rerank_client(self):
+        import cohere
+
+        return cohere.AsyncClient(COHERE_API_KEY)
+
+    @lazy_service
+    def qdrant_client(self):
+        from qdrant_client import QdrantClient
+
+        return QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+
+    @lazy_service
+    def async_qdrant_client(self):
+        from qdrant_client import AsyncQdrantClient
+
+        return AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+
+    # Cache dan service
+
+    @lazy_service
+    def description_cache(self) -> PersistentLRUCache:
+        return PersistentLRUCache(VISION_CACHE_PATH, VISION_CACHE_MAX_BYTES, name="vision_descriptions")
+
+    @lazy_service
+    def embedding_cache(self) -> PersistentLRUCache:
+        return PersistentLRUCache(EMBED_CACHE_PATH, EMBED_CACHE_MAX_BYTES, name="embeddings")
+
+    @lazy_service
+    def query_embedding_cache(self) -> TTLCache:
+        return TTLCache(RAG_QUERY_CACHE_SIZE, RAG_QUERY_CACHE_TTL, name="query_embeddings")
+
+    @lazy_service
+    def collection_handles(self) -> TTLCache:
+        # Dibagi RAGService dan MultiModalRAGService agar invalidasi berlaku untuk keduanya
+        return TTLCache(RAG_HANDLE_CACHE_SIZE, RAG_HANDLE_CACHE_TTL, name="vector_store_handles")
+
+    @lazy_service
+    def answer_cache(self):
+        if not RAG_ANSWER_CACHE_ENABLED:
+            return None
+
+        from Backend.VICA.apps.RAG.answer_cache import SemanticAnswerCache
+
+        return SemanticAnswerCache(
+            threshold=RAG_ANSWER_CACHE_THRESHOLD,
+            max_entries=RAG_ANSWER_CACHE_SIZE,
+            ttl=RAG_ANSWER_CACHE_TTL,
+            max_collections=RAG_ANSWER_CACHE_COLLECTIONS,
+        )
+
+    @lazy_service
+    def pdf_service(self):
+        from Backend.VICA.apps.RAG.pdf import PDFService
+
+        return PDFService(self.vision_client, cache=self.description_cache, cpu_pool=self.cpu_pool)
+
+    @lazy_service
+    def embedding_service(self):
+        from Backend.VICA.apps.RAG.embedding import EmbeddingService
+
+        return EmbeddingService(
+            self.embed_model,
+            batch_size=RAG_EMBED_BATCH_SIZE,
+            max_in_flight=RAG_EMBED_MAX_IN_FLIGHT,
+            retries=RAG_EMBED_RETRIES,
+            cache=self.embedding_cache,
+            metadata=self.metadata,
+            query_cache=self.query_embedding_cache,
+            persist_queries=RAG_QUERY_CACHE_PERSIST,
+        )
+
+    @lazy_service
+    def vector_writer(self):
+        from Backend.VICA.apps.RAG.vector_writer import QdrantBulkWriter
+
+        return QdrantBulkWriter(
+            self.qdrant_client,
+            batch_size=QDRANT_UPSERT_BATCH_SIZE,
+            parallelism=QDRANT_UPSERT_PARALLELISM,
+            wait=QDRANT_UPSERT_WAIT,
+            barrier_timeout=QDRANT_BARRIER_TIMEOUT,
+        )
+
+    @lazy_service
+    def tabular_store(self):
+        from Backend.VICA.apps.RAG.tabular import TabularStore
+
+        return TabularStore(RAG_TABLES_DIR)
+
+    @lazy_service
+    def bm25_index(self):
+        if not RAG_BM25_ENABLED:
+            return None
+
+        from Backend.VICA.apps.RAG.bm25 import BM25Index
+
+        return BM25Index(RAG_BM25_DIR)
+
+    @lazy_service
+    def image_filter(self):
+        if not PDF_IMAGE_FILTER_ENABLED:
+            return None
+
+        from Backend.VICA.apps.RAG.image_filter import DecorativeImageFilter
+
+        return DecorativeImageFilter(
+            min_side=PDF_IMAGE_MIN_SIDE,
+            min_area=PDF_IMAGE_MIN_AREA,
+            min_entropy=PDF_IMAGE_MIN_ENTROPY,
+            max_hash_distance=PDF_IMAGE_HASH_DISTANCE,
+        )
+
+    @lazy_service
+    def rag(self):
+        from Backend.VICA.apps.RAG.rag import RAGService
+
+        return RAGService(
+            self.llm,
+            self.embed_model,
+            self.rerank_client,
+            self.pdf_service,
+            self.embedding_service,
+            self.vector_writer,
+            self.qdrant_client,
+            self.collection_handles,
+            self.bm25_index,
+            self.async_qdrant_client,
+        )
+
+    @lazy_service
+    def multi_modal_rag(self):
+        from Backend.VICA.apps.RAG.multi_modal_rag import MultiModalRAGService
+
+        return MultiModalRAGService(
+            self.llm,
+            self.embed_model,
+            self.rerank_client,
+            self.pdf_service,
+            self.cpu_pool,
+            self.embedding_service,
+            self.vector_writer,
+            self.tabular_store,
+            self.image_filter,
+            self.qdrant_client,
+            NLTK_DATA_DIR,
+            self.collection_handles,
+            self.answer_cache,
+            self.async_qdrant_client,
+            self.async_rerank_client,
+            self.bm25_index,
+        )
@@ -0,0 +1,118 @@
+import io
+import csv
+import logging
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, TextIO
+
+from llama_index.core.schema import TextNode
+from llama_index.core.utils import get_tokenizer
+
+log = logging.getLogger(__name__)
+
+# Metadata baris disimpan di payload Qdrant, tetapi tidak ikut di-embed
+CSV_METADATA_KEYS = ["row_start", "row_end", "row_count", "columns"]
+
+####################
+# CSVChunker
+####################
+
+@dataclass
+class CSVChunk:
+    text: str
+    row_start: int
+    row_end: int
+    columns: List[str]
+
+    @property
+    def row_count(self) -> int:
+        return self.row_end - self.row_start + 1
+
+    def to_node(self) -> TextNode:
+        return TextNode(
+            text=self.text,
+            metadata={
+                "row_start": self.row_start,
+                "row_end": self.row_end,
+                "row_count": self.row_count,
+                "columns": ", ".join(self.columns),
+            },
+            excluded_embed_metadata_keys=list(CSV_METADATA_KEYS),
+            excluded_llm_metadata_keys=["row_count", "columns"],
+        )
+
+
+class CSVChunker:
+    """Baca CSV baris demi baris dan kemas baris utuh ke chunk sesuai batas token.
+
+    Header diulang di setiap chunk sehingga tiap chunk bisa dibaca sendiri;
+    memori yang dipakai hanya sebesar satu chunk, berapapun ukuran file.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 800,
+        tokenizer: Optional[Callable[[str], List]] = None,
+    ) -> None:
+        self.max_tokens = max(1, max_tokens)
+        self._tokenizer = tokenizer or get_tokenizer()
+
+    def iter_chunks(self, stream: TextIO) -> Iterator[CSVChunk]:
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        header_line = self._format_row(header)
+        header_tokens = self._count_tokens(header_line)
+
+        lines: List[str] = []
+        tokens = header_tokens
+        row_start = last_row = 1
+
+        # Nomor baris data dimulai dari 1 (header tidak dihitung)
+        for row_number, row in enumerate(reader, start=1):
+            if not any(cell.strip() for cell in row):
+                continue
+
+            line = self._format_row(row)
+            line_tokens = self._count_tokens(line)
+
+            if lines and tokens + line_tokens > self.max_tokens:
+                yield self._build_chunk(header, header_line, lines, row_start, last_row)
+                lines = []
+                tokens = header_tokens
+
+            if not lines:
+                row_start = row_number
+                if header_tokens + line_tokens > self.max_tokens:
+                    log.warning(
+                        f"CSV row {row_number} has {line_tokens} tokens, above the "
+                        f"{self.max_tokens} token budget; storing it as its own chunk"
+                    )
+            lines.append(line)
+            tokens += line_tokens
+            last_row = row_number
+
+        if lines:
+            yield self._build_chunk(header, header_line, lines, row_start, last_row)
+
+    def _build_chunk(
+        self, header: List[str], header_line: str, lines: List[str], row_start: int, row_end: int
+    ) -> CSVChunk:
+        return CSVChunk(
+            text="\n".join([header_line, *lines]),
+            row_start=row_start,
+            row_end=row_end,
+            columns=header,
+        )
+
+    def _count_tokens(self, text: str) -> int:
+        # +1 untuk pemisah baris
+        return len(self._tokenizer(text)) + 1
+
+    @staticmethod
+    def _format_row(row: List[str]) -> str:
+        # Tulis ulang sebagai CSV agar sel berisi koma atau newline tetap utuh
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerow(row)
+        return buffer.getvalue()[:-1]
@@ -0,0 +1,290 @@
+import re
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple, Union
+
+log = logging.getLogger(__name__)
+
+Page = Tuple[int, str]
+PageSource = Union[Iterable[Page], AsyncIterable[Page]]
+
+# Header section jawaban batch: "### Image 1", "## Image 2: chart", "**Image 3**",
+# "**Image 4:** teks", "1. Image 5 -", atau "Image 6:" polos (wajib diikuti pemisah)
+IMAGE_HEADER_PATTERN = re.compile(
+    r"^[ \t]*(?P<decor>#{1,6}[ \t]*|[*_]{1,2}[ \t]*|\d+[.)][ \t]*)*"
+    r"\[?Image[ \t]*#?(?P<number>\d+)\]?[ \t]*[*_]{0,2}[ \t]*"
+    r"(?P<sep>[:.)\-\u2013\u2014])?[ \t]*[*_]{0,2}(?P<inline>[^\n]*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Cadangan bila tidak ada header "Image N": baris berisi nomor saja ("2.", "**3.**")
+# atau heading bernomor ("## 4. Chart"); daftar bernomor di dalam deskripsi tidak cocok
+NUMBERED_HEADER_PATTERN = re.compile(
+    r"^[ \t]*(?:(?:[*_]{1,2})?(?P<number>\d+)[.):]?(?:[*_]{1,2})?[ \t]*"
+    r"|#{1,6}[ \t]*(?P<heading>\d+)[.):]?[ \t]*(?P<inline>[^\n]*))$",
+    re.MULTILINE,
+)
+
+
+def parse_batch_descriptions(text: str, count: int) -> List[Optional[str]]:
+    """Pisahkan jawaban batch per gambar; gambar yang tidak ditemukan bernilai None."""
+    text = text or ""
+    headers = [
+        (match.start(), match.end(), int(match.group("number")), match.group("inline"))
+        for match in IMAGE_HEADER_PATTERN.finditer(text)
+        if match.group("decor") or match.group("sep")
+    ]
+    if not headers:
+        headers = [
+            (
+                match.start(),
+                match.end(),
+                int(match.group("number") or match.group("heading")),
+                match.group("inline") or "",
+            )
+            for match in NUMBERED_HEADER_PATTERN.finditer(text)
+        ]
+
+    descriptions: List[Optional[str]] = [None] * count
+    for i, (_, end, number, inline) in enumerate(headers):
+        next_start = headers[i + 1][0] if i + 1 < len(headers) else len(text)
+        # Teks di baris header (mis. "## Image 2: chart ...") termasuk deskripsi
+        description = "\n".join(part for part in (inline.strip(), text[end:next_start].strip()) if part)
+        index = number - 1
+        if 0 <= index < count and description and descriptions[index] is None:
+            descriptions[index] = description
+    return descriptions
+
+####################
+# Page description results
+####################
+
+@dataclass
+class PageDescription:
+    page_number: int
+    description: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    source: str = "vision"
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class DescriptionReport:
+    pages: List[PageDescription] = field(default_factory=list)
+    # Statistik payload gambar yang dikirim ke vision model (lihat ImagePrepStats)
+    image_stats: Optional[dict] = None
+
+    @property
+    def failed_pages(self) -> List[int]:
+        return [page.page_number for page in self.pages if not page.ok]
+
+    @property
+    def vision_pages(self) -> int:
+        return sum(1 for page in self.pages if page.source == "vision")
+
+    @property
+    def text_layer_pages(self) -> int:
+        return sum(1 for page in self.pages if page.source == "text_layer")
+
+    @property
+    def text(self) -> str:
+        return "\n".join(
+            f"Page {page.page_number} {'content' if page.source == 'text_layer' else 'description'}:\n{page.description}\n"
+            for page in self.pages
+            if page.ok
+        )
+
+
+@dataclass
+class _BatchState:
+    """Ukuran batch untuk satu dokumen; turun ke 1 bila jawaban batch berulang kali tak terbaca."""
+
+    batch_size: int
+    unparsed: int = 0
+
+
+####################
+# PageDescriber
+####################
+
+class PageDescriber:
+    """Deskripsikan halaman secara paralel dengan batas konkurensi, timeout, dan retry.
+
+    Jika `batch_fn` diberikan, beberapa halaman dikemas dalam satu request
+    (dibatasi `batch_size` gambar dan `batch_max_bytes` payload base64). Halaman
+    yang gagal dipisahkan dari jawaban batch dideskripsikan ulang satu per satu.
+    Setelah `max_unparsed_batches` batch berturut-turut tidak bisa diparse sama
+    sekali, sisa dokumen dideskripsikan per halaman (tanpa biaya N+1 request).
+    """
+
+    def __init__(
+        self,
+        describe_fn: Callable[[str], Awaitable[str]],
+        concurrency: int = 4,
+        timeout: float = 60.0,
+        retries: int = 2,
+        retry_backoff: float = 1.0,
+        batch_fn: Optional[Callable[[List[str]], Awaitable[List[Optional[str]]]]] = None,
+        batch_size: int = 1,
+        batch_max_bytes: int = 4 * 1024 * 1024,
+        max_unparsed_batches: int = 2,
+    ) -> None:
+        self.describe_fn = describe_fn
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.retry_backoff = retry_backoff
+        self.batch_fn = batch_fn
+        self.batch_size = max(1, batch_size) if batch_fn is not None else 1
+        self.batch_max_bytes = batch_max_bytes
+        self.max_unparsed_batches = max(1, max_unparsed_batches)
+
+    @property
+    def max_in_flight_pages(self) -> int:
+        # `concurrency` batch yang berjalan + satu batch yang sedang dikumpulkan
+        return (self.concurrency + 1) * self.batch_size
+
+    async def describe(self, pages: PageSource) -> DescriptionReport:
+        results = [page async for page in self.stream(pages)]
+
+        report = DescriptionReport(sorted(results, key=lambda page: page.page_number))
+        if report.failed_pages:
+            log.warning(
+                f"{len(report.failed_pages)} of {len(report.pages)} pages failed: {report.failed_pages}"
+            )
+        return report
+
+    async def stream(self, pages: PageSource) -> AsyncIterator[PageDescription]:
+        """Yield deskripsi sesuai urutan sumber begitu tersedia, tanpa menunggu seluruh dokumen."""
+        # Semaphore diambil sebelum batch berikutnya dijadwalkan, sehingga hanya
+        # `concurrency` batch (masing-masing maks. `batch_size` halaman) berada di memori.
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending: asyncio.Queue = asyncio.Queue()
+        state = _BatchState(self.batch_size)
+
+        async def schedule(batch: List[Tuple[int, str]]) -> None:
+            await semaphore.acquire()
+            pending.put_nowait(asyncio.create_task(self._describe_batch(semaphore, batch, state)))
+
+        async def produce() -> None:
+            try:
+                batch: List[Tuple[int, str]] = []
+                batch_bytes = 0
+                async for page_number, base64_image in _iterate(pages):
+                    if batch and (
+                        len(batch) >= state.batch_size
+                        or batch_bytes + len(base64_image) > self.batch_max_bytes
+                    ):
+                        await schedule(batch)
+                        batch, batch_bytes = [], 0
+                    batch.append((page_number, base64_image))
+                    batch_bytes += len(base64_image)
+                if batch:
+                    await schedule(batch)
+            finally:
+                pending.put_nowait(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                task = await pending.get()
+                if task is None:
+                    break
+                for result in await task:
+                    yield result
+            # Teruskan error dari sumber halaman (mis. rasterisasi gagal)
+            await producer
+        finally:
+            producer.cancel()
+            while not pending.empty():
+                task = pending.get_nowait()
+                if task is not None:
+                    task.cancel()
+
+    async def _describe_batch(
+        self,
+        semaphore: asyncio.Semaphore,
+        batch: List[Tuple[int, str]],
+        state: Optional[_BatchState] = None,
+    ) -> List[PageDescription]:
+        try:
+            if len(batch) == 1:
+                return [await self._describe_page(*batch[0])]
+
+            try:
+                descriptions = await asyncio.wait_for(
+                    self.batch_fn([base64_image for _, base64_image in batch]),
+                    timeout=self.timeout * len(batch),
+                )
+            except Exception as e:
+                log.warning(f"Batch of {len(batch)} pages failed ({e}), describing one by one")
+                descriptions = [None] * len(batch)
+            else:
+                if state is not None:
+                    self._track_parsing(state, descriptions)
+
+            results: List[Optional[PageDescription]] = [
+                PageDescription(page_number=page_number, description=description, attempts=1)
+                if description
+                else None
+                for (page_number, _), description in zip(batch, descriptions)
+            ]
+
+            # Halaman yang tidak bisa dipisahkan dari jawaban batch diulang satu per satu
+            missing = [i for i, result in enumerate(results) if result is None]
+            if missing:
+                fallbacks = await asyncio.gather(
+                    *[self._describe_page(*batch[i]) for i in missing]
+                )
+                for i, result in zip(missing, fallbacks):
+                    results[i] = result
+            return results
+        finally:
+            semaphore.release()
+
+    def _track_parsing(self, state: _BatchState, descriptions: List[Optional[str]]) -> None:
+        if any(descriptions):
+            state.unparsed = 0
+            return
+        state.unparsed += 1
+        if state.unparsed >= self.max_unparsed_batches and state.batch_size > 1:
+            log.warning(
+                f"{state.unparsed} batch responses could not be split per image, "
+                f"describing the rest of the document one page at a time"
+            )
+            state.batch_size = 1
+
+    async def _describe_page(self, page_number: int, base64_image: str) -> PageDescription:
+        result = PageDescription(page_number=page_number)
+        for attempt in range(self.retries + 1):
+            result.attempts = attempt + 1
+            try:
+                result.description = await asyncio.wait_for(
+                    self.describe_fn(base64_image), timeout=self.timeout
+                )
+                result.error = None
+                return result
+            except asyncio.TimeoutError:
+                result.error = f"Timed out after {self.timeout}s"
+            except Exception as e:
+                result.error = str(e)
+
+            log.warning(
+                f"Page {page_number} attempt {result.attempts} failed: {result.error}"
+            )
+            if attempt < self.retries:
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+        return result
+
+
+async def _iterate(pages: PageSource):
+    if hasattr(pages, "__aiter__"):
+        async for page in pages:
+            yield page
+    else:
+        for page in pages:
+            yield page
@@ -0,0 +1,209 @@
+import time
+import asyncio
+import logging
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.schema import BaseNode, MetadataMode
+
+from Backend.VICA.apps.RAG.cache import PersistentLRUCache, TTLCache
+from Backend.VICA.apps.RAG.model_metadata import ModelMetadataStore
+
+log = logging.getLogger(__name__)
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(data: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).casefold()
+
+
+# Metadata pencatatan per upload: disimpan di payload Qdrant, tetapi tidak ikut di-embed
+# atau dikirim ke LLM, sehingga upload ulang file yang sama tetap kena cache embedding
+FILE_METADATA_KEYS = ("collection_id", "file_id", "user_id", "chat_id")
+
+
+def attach_file_metadata(node: BaseNode, metadata: Dict[str, Any]) -> BaseNode:
+    node.metadata.update(metadata)
+    for excluded in (node.excluded_embed_metadata_keys, node.excluded_llm_metadata_keys):
+        excluded.extend(key for key in FILE_METADATA_KEYS if key in metadata and key not in excluded)
+    return node
+
+
+####################
+# EmbeddingService
+####################
+
+class EmbeddingService:
+    """Embedding berbatch dan paralel dengan retry serta cache vektor float32 di disk."""
+
+    def __init__(
+        self,
+        embed_model,
+        batch_size: int = 32,
+        max_in_flight: int = 4,
+        retries: int = 3,
+        retry_backoff: float = 1.0,
+        cache: Optional[PersistentLRUCache] = None,
+        metadata: Optional[ModelMetadataStore] = None,
+        query_cache: Optional[TTLCache] = None,
+        persist_queries: bool = False,
+    ) -> None:
+        self.embed_model = embed_model
+        self.model_name = getattr(embed_model, "model_name", type(embed_model).__name__)
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.retries = max(0, retries)
+        self.retry_backoff = retry_backoff
+        self.cache = cache
+        self.metadata = metadata
+        # Vektor pertanyaan di memori (LRU+TTL); opsional juga disimpan di cache disk
+        self.query_cache = query_cache
+        self.persist_queries = persist_queries
+        self._dimension: Optional[int] = None
+
+    async def aembed_texts(self, texts: List[str]) -> List[List[float]]:
+        # Teks identik (header berulang, upload ulang) hanya di-embed sekali
+        unique = list(dict.fromkeys(texts))
+        # Cache SQLite bersifat sinkron: satu lookup untuk semua teks, di thread terpisah
+        vectors = await asyncio.to_thread(self._cache_get_many, "text", unique)
+        missing = [text for text in unique if text not in vectors]
+
+        if missing:
+            semaphore = asyncio.Semaphore(self.max_in_flight)
+            batches = [
+                missing[i : i + self.batch_size]
+                for i in range(0, len(missing), self.batch_size)
+            ]
+            results = await asyncio.gather(
+                *[self._embed_batch(semaphore, batch) for batch in batches]
+            )
+            embedded = {
+                text: embedding
+                for batch, embeddings in zip(batches, results)
+                for text, embedding in zip(batch, embeddings)
+            }
+            vectors.update(embedded)
+            await asyncio.to_thread(self._cache_set_many, "text", embedded)
+
+        log.debug(f"Embedded {len(missing)} of {len(texts)} texts, rest served from cache")
+        return [vectors[text] for text in texts]
+
+    async def aembed_nodes(self, nodes: List[BaseNode]) -> List[BaseNode]:
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        for node, embedding in zip(nodes, await self.aembed_texts(texts)):
+            node.embedding = embedding
+        return nodes
+
+    async def aembed_query(self, query: str) -> List[float]:
+        # Cache disk hanya dipakai jika persist_queries; cache memori cukup dibaca langsung
+        if self.persist_queries:
+            key, embedding = await asyncio.to_thread(self._query_cache_get, query)
+        else:
+            key, embedding = self._query_cache_get(query)
+        if embedding is None:
+            embedding = await self._with_retries(self.embed_model.aget_query_embedding, query)
+            if self.persist_queries:
+                await asyncio.to_thread(self._query_cache_set, key, embedding)
+            else:
+                self._query_cache_set(key, embedding)
+        return embedding
+
+    def embed_query(self, query: str) -> List[float]:
+        key, embedding = self._query_cache_get(query)
+        if embedding is None:
+            embedding = self._with_retries_sync(self.embed_model.get_query_embedding, query)
+            self._query_cache_set(key, embedding)
+        return embedding
+
+    def dimension(self) -> int:
+        """Dimensi vektor dari metadata tersimpan; panggilan embedding hanya jika belum dikenal."""
+        if self._dimension is None:
+            probe = lambda: len(self.embed_model.get_query_embedding("sample"))
+            if self.metadata is None:
+                self._dimension = probe()
+            else:
+                self._dimension = self.metadata.get_embedding_dimension(self.model_name, probe)
+        return self._dimension
+
+    def stats(self) -> Optional[dict]:
+        return self.cache.stats() if self.cache else None
+
+    def query_stats(self) -> Optional[dict]:
+        return self.query_cache.stats() if self.query_cache else None
+
+    async def _embed_batch(self, semaphore: asyncio.Semaphore, batch: List[str]) -> List[List[float]]:
+        async with semaphore:
+            return await self._with_retries(self.embed_model.aget_text_embedding_batch, batch)
+
+    async def _with_retries(self, fn, *args):
+        for attempt in range(self.retries + 1):
+            try:
+                return await fn(*args)
+            except Exception as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                log.warning(f"Embedding call failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _with_retries_sync(self, fn, *args):
+        for attempt in range(self.retries + 1):
+            try:
+                return fn(*args)
+            except Exception as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                log.warning(f"Embedding call failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _cache_key(self, kind: str, text: str) -> str:
+        return PersistentLRUCache.make_key(self.model_name, kind, text)
+
+    def _cache_get(self, kind: str, text: str) -> Optional[List[float]]:
+        if self.cache is None:
+            return None
+        data = self.cache.get(self._cache_key(kind, text))
+        return unpack_vector(data) if data is not None else None
+
+    def _cache_set(self, kind: str, text: str, embedding: List[float]) -> None:
+        if self.cache is not None:
+            self.cache.set(self._cache_key(kind, text), pack_vector(embedding))
+
+    def _cache_get_many(self, kind: str, texts: List[str]) -> Dict[str, List[float]]:
+        if self.cache is None or not texts:
+            return {}
+        keys = {self._cache_key(kind, text): text for text in texts}
+        found = self.cache.get_many(list(keys))
+        return {keys[key]: unpack_vector(data) for key, data in found.items()}
+
+    def _cache_set_many(self, kind: str, embeddings: Dict[str, List[float]]) -> None:
+        if self.cache is not None and embeddings:
+            self.cache.set_many(
+                {self._cache_key(kind, text): pack_vector(embedding) for text, embedding in embeddings.items()}
+            )
+
+    def _query_cache_get(self, query: str) -> Tuple[str, Optional[List[float]]]:
+        # Spasi dan huruf besar/kecil tidak mengubah key, sehingga retry/refresh ikut kena cache
+        key = normalize_query(query)
+        embedding = self.query_cache.get((self.model_name, key)) if self.query_cache else None
+        if embedding is None and self.persist_queries:
+            embedding = self._cache_get("query", key)
+            if embedding is not None and self.query_cache is not None:
+                self.query_cache.set((self.model_name, key), embedding)
+        return key, embedding
+
+    def _query_cache_set(self, key: str, embedding: List[float]) -> None:
+        if self.query_cache is not None:
+            self.query_cache.set((self.model_name, key), embedding)
+        if self.persist_queries:
+            self._cache_set("query", key, embedding)
@@ -0,0 +1,152 @@
+import os
+import math
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from PIL import Image
+
+log = logging.getLogger(__name__)
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """Difference hash 64-bit: tahan terhadap perubahan skala dan kompresi."""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | int(left > right)
+    return value
+
+
+def entropy(image: Image.Image) -> float:
+    """Shannon entropy histogram grayscale (0-8 bit); ikon polos/garis mendekati 0."""
+    histogram = image.convert("L").histogram()
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    return -sum((count / total) * math.log2(count / total) for count in histogram if count)
+
+
+####################
+# ImageFilterStats
+####################
+
+@dataclass
+class ImageFilterStats:
+    total: int = 0
+    kept: int = 0
+    too_small: int = 0
+    low_entropy: int = 0
+    duplicates: int = 0
+    unreadable: int = 0
+
+    @property
+    def vision_calls_avoided(self) -> int:
+        return self.total - self.kept
+
+    def merge(self, other: "ImageFilterStats") -> None:
+        self.total += other.total
+        self.kept += other.kept
+        self.too_small += other.too_small
+        self.low_entropy += other.low_entropy
+        self.duplicates += other.duplicates
+        self.unreadable += other.unreadable
+
+    def to_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "kept": self.kept,
+            "too_small": self.too_small,
+            "low_entropy": self.low_entropy,
+            "duplicates": self.duplicates,
+            "unreadable": self.unreadable,
+            "vision_calls_avoided": self.vision_calls_avoided,
+        }
+
+
+@dataclass
+class FilteredImage:
+    filename: str
+    # File lain yang merupakan duplikat gambar ini (tidak dideskripsikan ulang)
+    duplicates: List[str] = field(default_factory=list)
+
+
+####################
+# DecorativeImageFilter
+####################
+
+class DecorativeImageFilter:
+    """Saring gambar hasil ekstraksi PDF sebelum dikirim ke vision model.
+
+    Gambar terlalu kecil atau hampir polos (logo, ikon, garis footer) dibuang,
+    dan gambar yang mirip secara perseptual (dHash) hanya dideskripsikan sekali.
+    """
+
+    def __init__(
+        self,
+        min_side: int = 64,
+        min_area: int = 128 * 128,
+        min_entropy: float = 2.5,
+        max_hash_distance: int = 4,
+    ) -> None:
+        self.min_side = min_side
+        self.min_area = min_area
+        self.min_entropy = min_entropy
+        self.max_hash_distance = max_hash_distance
+
+    def filter_files(
+        self, image_dir: str, image_files: List[str]
+    ) -> Tuple[List[FilteredImage], ImageFilterStats]:
+        stats = ImageFilterStats(total=len(image_files))
+        kept: List[FilteredImage] = []
+        hashes: List[Tuple[int, FilteredImage]] = []
+
+        for image_file in image_files:
+            try:
+                with Image.open(os.path.join(image_dir, image_file)) as image:
+                    reason = self._reject_reason(image)
+                    image_hash = dhash(image) if reason is None else None
+            except Exception as e:
+                log.debug(f"Skipping unreadable image '{image_file}': {e}")
+                stats.unreadable += 1
+                continue
+
+            if reason == "too_small":
+                stats.too_small += 1
+                continue
+            if reason == "low_entropy":
+                stats.low_entropy += 1
+                continue
+
+            original = self._find_duplicate(hashes, image_hash)
+            if original is not None:
+                original.duplicates.append(image_file)
+                stats.duplicates += 1
+                continue
+
+            filtered = FilteredImage(image_file)
+            hashes.append((image_hash, filtered))
+            kept.append(filtered)
+
+        stats.kept = len(kept)
+        return kept, stats
+
+    def _reject_reason(self, image: Image.Image) -> Optional[str]:
+        width, height = image.size
+        if min(width, height) < self.min_side or width * height < self.min_area:
+            return "too_small"
+        if entropy(image) < self.min_entropy:
+            return "low_entropy"
+        return None
+
+    def _find_duplicate(
+        self, hashes: List[Tuple[int, FilteredImage]], image_hash: int
+    ) -> Optional[FilteredImage]:
+        for known_hash, filtered in hashes:
+            if (known_hash ^ image_hash).bit_count() <= self.max_hash_distance:
+                return filtered
+        return None
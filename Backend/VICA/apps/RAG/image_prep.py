@@ -0,0 +1,206 @@
+import base64
+import logging
+from io import BytesIO
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps, ImageStat
+
+log = logging.getLogger(__name__)
+
+
+# Semua gambar yang disiapkan dikirim sebagai JPEG (asli atau hasil encode ulang)
+PREPARED_MIME_TYPE = "image/jpeg"
+
+
+class UnsupportedImageError(ValueError):
+    """Gambar tidak bisa dibaca PIL (mis. SVG) atau terlalu besar untuk didekode dengan aman."""
+
+
+def base64_size(byte_count: int) -> int:
+    return 4 * ((byte_count + 2) // 3)
+
+
+####################
+# ImagePrepStats
+####################
+
+@dataclass
+class ImagePrepStats:
+    """Statistik payload vision per job."""
+
+    images: int = 0
+    original_bytes: int = 0
+    prepared_bytes: int = 0
+    resized: int = 0
+    grayscale: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return max(0, self.original_bytes - self.prepared_bytes)
+
+    def add(self, image: "PreparedImage") -> None:
+        self.images += 1
+        # Halaman hasil rasterisasi tidak punya file asli; ukurannya dianggap sama
+        self.original_bytes += image.original_bytes or image.prepared_bytes
+        self.prepared_bytes += image.prepared_bytes
+        self.resized += int(image.resized)
+        self.grayscale += int(image.grayscale)
+
+    def to_dict(self) -> dict:
+        return {
+            "images": self.images,
+            "original_bytes": self.original_bytes,
+            "prepared_bytes": self.prepared_bytes,
+            "bytes_saved": self.bytes_saved,
+            "resized": self.resized,
+            "grayscale": self.grayscale,
+        }
+
+
+@dataclass
+class PreparedImage:
+    base64: str
+    prepared_bytes: int
+    original_bytes: Optional[int] = None
+    size: Tuple[int, int] = (0, 0)
+    quality: Optional[int] = None
+    resized: bool = False
+    grayscale: bool = False
+    mime_type: str = PREPARED_MIME_TYPE
+
+
+####################
+# VisionImagePreparer
+####################
+
+class VisionImagePreparer:
+    """Siapkan gambar sebelum dikirim ke vision model.
+
+    Sisi terpanjang dibatasi ke resolusi yang benar-benar dipakai model, halaman
+    tanpa warna dikirim grayscale, dan kualitas JPEG dipilih setinggi mungkin
+    selama payload base64 masih di bawah `max_payload_bytes`.
+    """
+
+    def __init__(
+        self,
+        max_side: int = 1120,
+        max_payload_bytes: int = 1024 * 1024,
+        min_quality: int = 40,
+        max_quality: int = 85,
+        grayscale_saturation: float = 12.0,
+        min_dpi: int = 72,
+        max_dpi: int = 200,
+    ) -> None:
+        self.max_side = max_side
+        self.max_payload_bytes = max_payload_bytes
+        self.min_quality = min_quality
+        self.max_quality = max(min_quality, max_quality)
+        self.grayscale_saturation = grayscale_saturation
+        self.min_dpi = min_dpi
+        self.max_dpi = max_dpi
+
+    def target_dpi(self, page_size_pts: Tuple[float, float]) -> int:
+        """DPI yang menghasilkan sisi terpanjang halaman sekitar `max_side` piksel."""
+        longest_inches = max(page_size_pts) / 72
+        if longest_inches <= 0:
+            return self.max_dpi
+        return max(self.min_dpi, min(self.max_dpi, int(self.max_side / longest_inches)))
+
+    def prepare_bytes(self, data: bytes) -> PreparedImage:
+        """Siapkan gambar dari file upload/ekstraksi; JPEG yang sudah optimal dikirim apa adanya."""
+        try:
+            with Image.open(BytesIO(data)) as image:
+                image.load()
+                if (
+                    image.format == "JPEG"
+                    and max(image.size) <= self.max_side
+                    and base64_size(len(data)) <= self.max_payload_bytes
+                ):
+                    return PreparedImage(
+                        base64=base64.b64encode(data).decode("utf-8"),
+                        prepared_bytes=len(data),
+                        original_bytes=len(data),
+                        size=image.size,
+                    )
+                prepared = self.prepare_image(image)
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+            # Format lain tidak dikirim dengan MIME type JPEG yang salah
+            raise UnsupportedImageError(f"Unsupported or unreadable image: {e}") from e
+
+        prepared.original_bytes = len(data)
+        return prepared
+
+    def prepare_image(self, image: Image.Image) -> PreparedImage:
+        image = ImageOps.exif_transpose(image)
+        image = self._flatten(image)
+
+        resized = False
+        if max(image.size) > self.max_side:
+            image = image.copy()
+            image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+            resized = True
+
+        grayscale = image.mode == "L" or self._is_grayscale(image)
+        if grayscale and image.mode != "L":
+            image = image.convert("L")
+
+        while True:
+            data, quality = self._encode_within_budget(image)
+            if base64_size(len(data)) <= self.max_payload_bytes or max(image.size) <= 256:
+                break
+            # Kualitas minimum pun masih terlalu besar: perkecil gambar
+            image = image.resize(
+                (max(1, int(image.width * 0.75)), max(1, int(image.height * 0.75))), Image.LANCZOS
+            )
+            resized = True
+
+        return PreparedImage(
+            base64=base64.b64encode(data).decode("utf-8"),
+            prepared_bytes=len(data),
+            size=image.size,
+            quality=quality,
+            resized=resized,
+            grayscale=grayscale,
+        )
+
+    def _encode_within_budget(self, image: Image.Image) -> Tuple[bytes, int]:
+        # Binary search kualitas tertinggi yang payload-nya masih muat
+        best = None
+        low, high = self.min_quality, self.max_quality
+        while low <= high:
+            quality = (low + high) // 2
+            data = self._encode(image, quality)
+            if base64_size(len(data)) <= self.max_payload_bytes:
+                best = (data, quality)
+                low = quality + 1
+            else:
+                high = quality - 1
+
+        if best is None:
+            return self._encode(image, self.min_quality), self.min_quality
+        return best
+
+    @staticmethod
+    def _encode(image: Image.Image, quality: int) -> bytes:
+        buffered = BytesIO()
+        image.save(buffered, format="JPEG", quality=quality, optimize=True)
+        return buffered.getvalue()
+
+    def _is_grayscale(self, image: Image.Image) -> bool:
+        # Halaman teks/scan hitam-putih hampir tidak punya saturasi warna
+        thumbnail = image.copy()
+        thumbnail.thumbnail((128, 128))
+        saturation = ImageStat.Stat(thumbnail.convert("HSV").getchannel("S")).mean[0]
+        return saturation < self.grayscale_saturation
+
+    @staticmethod
+    def _flatten(image: Image.Image) -> Image.Image:
+        if image.mode in ("RGB", "L"):
+            return image
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            rgba = image.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            return background
+        return image.convert("RGB")
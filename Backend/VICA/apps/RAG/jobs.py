@@ -0,0 +1,159 @@
+import os
+import sys
+import uuid
+import shutil
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, List, Optional
+
+from fastapi import UploadFile
+
+from Backend.VICA.apps.RAG.upload_source import UploadSource
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from VICA.apps.VICA.models.ingestion_job import IngestionJobs, IngestionJobModel
+
+log = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[str, float], Awaitable[None]]
+
+
+async def report_progress(progress: Optional[ProgressCallback], stage: str, value: float) -> None:
+    if progress is not None:
+        await progress(stage, value)
+
+
+####################
+# IngestionJobQueue
+####################
+
+class IngestionJobQueue:
+    """Antrian ingestion yang tahan restart, disimpan di tabel `ingestion_job`."""
+
+    def __init__(
+        self,
+        get_rag_service: Callable[[], Any],
+        upload_dir: str,
+        workers: int = 2,
+        poll_interval: float = 2.0,
+        heartbeat_interval: float = 15.0,
+        stale_after: float = 120.0,
+        max_attempts: int = 3,
+    ) -> None:
+        # Service diambil lewat callable agar model/client baru dibuat saat job pertama
+        self.get_rag_service = get_rag_service
+        self.upload_dir = upload_dir
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = timedelta(seconds=stale_after)
+        self.max_attempts = max_attempts
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+
+        os.makedirs(self.upload_dir, exist_ok=True)
+        requeued = await asyncio.to_thread(
+            IngestionJobs.requeue_stale_jobs, self.stale_after, self.max_attempts
+        )
+        if requeued:
+            log.info(f"Requeued {requeued} interrupted ingestion jobs")
+
+        self._tasks = [
+            asyncio.create_task(self._worker(n)) for n in range(self.workers)
+        ]
+        log.info(f"Started {self.workers} ingestion workers")
+
+    async def stop(self) -> None:
+        # Job yang sedang berjalan tetap `running` dan akan diambil ulang setelah restart
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, user_id: str, chat_id: str, file: UploadFile) -> IngestionJobModel:
+        job_id = str(uuid.uuid4())
+        file_path = os.path.join(self.upload_dir, job_id)
+        await asyncio.to_thread(self._save_upload, file, file_path)
+
+        job = await asyncio.to_thread(
+            IngestionJobs.insert_new_job,
+            user_id,
+            chat_id,
+            file.filename,
+            file.content_type,
+            file_path,
+            job_id,
+        )
+        self._wakeup.set()
+        return job
+
+    async def _worker(self, worker_number: int) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(IngestionJobs.claim_next_job)
+                if job is None:
+                    await asyncio.to_thread(
+                        IngestionJobs.requeue_stale_jobs, self.stale_after, self.max_attempts
+                    )
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                log.info(f"Worker {worker_number} picked up ingestion job '{job.id}'")
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"Ingestion worker {worker_number} error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _run(self, job: IngestionJobModel) -> None:
+        async def progress(stage: str, value: float) -> None:
+            await asyncio.to_thread(IngestionJobs.update_job_progress, job.id, stage, value)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            # File antrian sudah di disk, dibaca lewat mmap tanpa salinan tambahan
+            rag_service = await asyncio.to_thread(self.get_rag_service)
+            with UploadSource.from_path(job.file_path, job.filename, job.content_type) as source:
+                outcome = await rag_service.create_knowledge_base(
+                    job.user_id, job.chat_id, source, progress=progress
+                )
+
+            await asyncio.to_thread(
+                IngestionJobs.mark_job_completed, job.id, outcome or "completed"
+            )
+            self._remove_upload(job.file_path)
+            log.info(f"Ingestion job '{job.id}' completed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error(f"Ingestion job '{job.id}' failed: {e}")
+            await asyncio.to_thread(IngestionJobs.mark_job_failed, job.id, str(e))
+            self._remove_upload(job.file_path)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await asyncio.to_thread(IngestionJobs.touch_job, job_id)
+
+    @staticmethod
+    def _save_upload(file: UploadFile, file_path: str) -> None:
+        file.file.seek(0)
+        with open(file_path, "wb") as stored_file:
+            shutil.copyfileobj(file.file, stored_file)
+
+    @staticmethod
+    def _remove_upload(file_path: str) -> None:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
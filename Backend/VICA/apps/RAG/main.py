@@ -5,11 +5,9 @@ import uuid
 import datetime
 import logging
 
-from groq import Groq
-import cohere
 
 from typing import Optional
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
@@ -18,25 +16,20 @@ from datetime import datetime
 from fastapi import FastAPI, UploadFile, File, Form
 from fastapi.responses import Response
 
-from llama_index.core import Settings
-from llama_index.embeddings.ollama import OllamaEmbedding
-from llama_index.llms.ollama import Ollama
-from llama_index.llms.groq import Groq as llama_Groq
-from llama_index.embeddings.jinaai import JinaEmbedding
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from VICA.apps.VICA.models.user import Users
 
-from VICA.apps.RAG.rag import RAGService
-from VICA.apps.RAG.pdf import PDFService
-from VICA.apps.RAG.multi_modal_rag import MultiModalRAGService
+from VICA.apps.RAG.container import RAGServices
+from VICA.apps.RAG.workers import CPUWorkerPool, ClientDisconnected, run_until_disconnected
+from VICA.apps.RAG.jobs import IngestionJobQueue
+from VICA.apps.VICA.models.ingestion_job import IngestionJobs, IngestionJobResponse
 
 from Backend.VICA.config import (
-    LLM_MODEL_NAME,
-    EMBED_MODEL_NAME,
-    COHERE_API_KEY,
-    GROQ_API_KEY,
-    JINA_API_KEY,
+    RAG_CPU_WORKERS,
+    RAG_INGEST_WORKERS,
+    RAG_UPLOAD_DIR,
+    RAG_JOB_MAX_ATTEMPTS,
 )
 
 from VICA.apps.VICA.utils.constanta import ERROR_MESSAGES
@@ -64,26 +57,71 @@ log.setLevel(logging.DEBUG)
 class AskQuestionDTO(BaseModel):
     question: str
 
+
+def format_sse(event: str, data) -> str:
+    # Data selalu JSON agar token yang berisi baris baru tidak memecah frame SSE
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
 class RAGRouter:
-    def __init__(self, app: FastAPI, rag_service: RAGService) -> None:
+    def __init__(self, app: FastAPI, services: RAGServices, job_queue: IngestionJobQueue) -> None:
         self.app = app
-        self.rag_service = rag_service
+        self.services = services
+        self.job_queue = job_queue
         self.register_routes()
 
     def register_routes(self):
         @self.app.post("/pdf/describe")
-        async def describe_pdf(file: UploadFile) -> JSONResponse:
-            description = await self.rag_service.pdf_service.describe_pdf(file)
+        async def describe_pdf(request: Request, file: UploadFile) -> JSONResponse:
+            try:
+                pdf_service = await self.services.aget("pdf_service")
+                report = await run_until_disconnected(
+                    request, pdf_service.describe_pdf_pages(file)
+                )
+            except ClientDisconnected as e:
+                log.info(f"PDF description cancelled: {e}")
+                return JSONResponse(status_code=499, content={"status": "cancelled", "message": str(e)})
 
             return JSONResponse(
                 status_code=200,
                 content={
                     "status": "success",
                     "message": "PDF description retrieved successfully",
-                    "description": description,
+                    "description": report.text,
+                    "failed_pages": report.failed_pages,
+                    "vision_pages": report.vision_pages,
+                    "text_layer_pages": report.text_layer_pages,
+                    "image_stats": report.image_stats,
                 },
             )
 
+        @self.app.get("/cache/stats")
+        async def get_cache_stats(user = Depends(get_admin_user)) -> JSONResponse:
+            # Cache dibaca langsung, tanpa membangun model/client hanya untuk statistik
+            description_cache = await self.services.aget("description_cache")
+            embedding_cache = await self.services.aget("embedding_cache")
+            collection_handles = await self.services.aget("collection_handles")
+            query_embedding_cache = await self.services.aget("query_embedding_cache")
+            answer_cache = await self.services.aget("answer_cache")
+
+            return JSONResponse(
+                status_code=200,
+                content={
+                    "status": "success",
+                    "vision_descriptions": description_cache.stats(),
+                    "embeddings": embedding_cache.stats(),
+                    "vector_store_handles": collection_handles.stats(),
+                    "query_embeddings": query_embedding_cache.stats(),
+                    "answers": answer_cache.stats() if answer_cache else None,
+                },
+            )
+
+        @self.app.get("/services/status")
+        async def get_services_status(user = Depends(get_admin_user)) -> JSONResponse:
+            return JSONResponse(
+                status_code=200,
+                content={"status": "success", "services": self.services.status()},
+            )
+
         @self.app.post("/knowledge/create")
         async def create_knowledge_base(
                 user = Depends(get_verified_user),
@@ -93,14 +131,15 @@ class RAGRouter:
             try:
                 user_id = user.id
                 
-                await self.rag_service.create_knowledge_base(user_id, chat_id, file)
+                job = await self.job_queue.enqueue(user_id, chat_id, file)
 
                 return JSONResponse(
-                    status_code=201,
+                    status_code=202,
                     content={
-                        "status": "success",
-                        "message": "Knowledge base created successfully for chat",
+                        "status": "queued",
+                        "message": "Knowledge base creation queued for chat",
                         "chat_id": chat_id,
+                        "job_id": job.id,
                     },
                 )
             except Exception as e:
@@ -112,18 +151,32 @@ class RAGRouter:
                     },
                 )
 
+        @self.app.get("/knowledge/jobs/{job_id}", response_model=IngestionJobResponse)
+        def get_ingestion_job(job_id: str, user = Depends(get_verified_user)):
+            # Sync: FastAPI menjalankannya di threadpool, query DB tidak menahan event loop
+            job = IngestionJobs.get_job_by_id_and_user_id(job_id, user.id)
+            if job is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=ERROR_MESSAGES.NOT_FOUND,
+                )
+
+            return IngestionJobResponse(**job.model_dump())
+
         @self.app.post("/knowledge/query/{chat_id}")
-        def ask_question(body: AskQuestionDTO, chat_id : str, user = Depends(get_verified_user)) -> JSONResponse:
+        async def ask_question(body: AskQuestionDTO, chat_id : str, user = Depends(get_verified_user)) -> JSONResponse:
             try:
-                result = self.rag_service.execute_query(
-                    user.id , chat_id, body.question
-                )
+                service = await self.services.aget("multi_modal_rag")
+                result = await service.aexecute_query(user.id, chat_id, body.question)
                 return JSONResponse(
                     status_code=200,
                     content={
                         "status": "success",
                         "message": "Query executed successfully",
                         "result": result.response,
+                        "route": (result.metadata or {}).get("route", "vector"),
+                        "sql": (result.metadata or {}).get("sql"),
+                        "cache_hit": (result.metadata or {}).get("cache_hit", False),
                     },
                 )
 
@@ -136,25 +189,78 @@ class RAGRouter:
                     },
                 )
 
+        @self.app.post("/knowledge/query/{chat_id}/stream")
+        async def ask_question_stream(body: AskQuestionDTO, chat_id: str, user = Depends(get_verified_user)):
+            try:
+                service = await self.services.aget("multi_modal_rag")
+                events = service.astream_query(user.id, chat_id, body.question)
+                # Event pertama diambil dulu agar error awal (mis. knowledge base tidak ada)
+                # tetap dikembalikan sebagai JSON biasa
+                first_event = await events.__anext__()
+            except Exception as e:
+                return JSONResponse(
+                    status_code=500,
+                    content={
+                        "status": "Failed to execute query",
+                        "message": str(e),
+                    },
+                )
 
-ollama_llm = Ollama(model=LLM_MODEL_NAME, request_timeout=120)
-groq_llm = llama_Groq(model="llama3-8b-8192", api_key=GROQ_API_KEY)
+            async def stream():
+                yield format_sse(*first_event)
+                try:
+                    async for event in events:
+                        yield format_sse(*event)
+                except Exception as e:
+                    log.exception(e)
+                    yield format_sse("error", {"message": str(e)})
 
-ollama_embed_model = OllamaEmbedding(model_name=EMBED_MODEL_NAME)
-jina_embed_model = JinaEmbedding(
-    api_key = JINA_API_KEY,
-    model = "jina-embeddings-v3",
-)
+            return StreamingResponse(
+                stream(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
+        @self.app.delete("/knowledge/{chat_id}")
+        async def delete_knowledge_base(chat_id: str, user = Depends(get_verified_user)) -> JSONResponse:
+            try:
+                service = await self.services.aget("multi_modal_rag")
+                deleted = await service.delete_knowledge_base(user.id, chat_id)
+                if not deleted:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail=ERROR_MESSAGES.NOT_FOUND,
+                    )
+                return JSONResponse(
+                    status_code=200,
+                    content={
+                        "status": "success",
+                        "message": "Knowledge base deleted",
+                        "chat_id": chat_id,
+                    },
+                )
+            except HTTPException:
+                raise
+            except Exception as e:
+                return JSONResponse(
+                    status_code=500,
+                    content={
+                        "status": "Failed to delete knowledge base",
+                        "message": str(e),
+                    },
+                )
 
-co = cohere.Client(COHERE_API_KEY)
 
-Settings.llm = groq_llm
-# Settings.llm = ollama_llm
-Settings.embed_model = jina_embed_model
+cpu_pool = CPUWorkerPool(max_workers=RAG_CPU_WORKERS)
+# Model, client, dan service dibuat saat pertama dipakai atau oleh warm-up di background
+rag_services = RAGServices(cpu_pool)
 
-pdf_service = PDFService(Groq(api_key=GROQ_API_KEY))
-rag_service = RAGService(groq_llm, jina_embed_model, co, pdf_service)
-MultiModalRAGService = MultiModalRAGService(groq_llm, jina_embed_model, co, pdf_service)
+job_queue = IngestionJobQueue(
+    lambda: rag_services.multi_modal_rag,
+    upload_dir=RAG_UPLOAD_DIR,
+    workers=RAG_INGEST_WORKERS,
+    max_attempts=RAG_JOB_MAX_ATTEMPTS,
+)
 
 # Instansiasi RAGRouter dan daftarkan rute ke FastAPI
-RAGRouter(app, MultiModalRAGService)
\ No newline at end of file
+RAGRouter(app, rag_services, job_queue)
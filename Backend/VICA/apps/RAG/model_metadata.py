@@ -0,0 +1,83 @@
+import os
+import json
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+# Dimensi embedding model yang umum dipakai, agar tidak perlu memanggil API saat startup
+KNOWN_EMBEDDING_DIMENSIONS: Dict[str, int] = {
+    "jina-embeddings-v3": 1024,
+    "jina-embeddings-v2-base-en": 768,
+    "jina-embeddings-v2-small-en": 512,
+    "jina-clip-v1": 768,
+    "nomic-embed-text": 768,
+    "mxbai-embed-large": 1024,
+    "all-minilm": 384,
+    "bge-m3": 1024,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+####################
+# ModelMetadataStore
+####################
+
+class ModelMetadataStore:
+    """Metadata model (mis. dimensi embedding) yang disimpan di file JSON lokal."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Optional[dict] = None
+
+    def get_embedding_dimension(
+        self, model_name: str, probe: Optional[Callable[[], int]] = None
+    ) -> int:
+        """Urutan: file metadata -> tabel dimensi yang dikenal -> probe (satu panggilan embedding)."""
+        with self._lock:
+            dimension = self._load().get("embedding_dimensions", {}).get(model_name)
+        if dimension:
+            return dimension
+
+        dimension = KNOWN_EMBEDDING_DIMENSIONS.get(_base_name(model_name))
+        if dimension is None:
+            if probe is None:
+                raise ValueError(f"Unknown embedding dimension for model '{model_name}'.")
+            log.info(f"Probing embedding dimension for '{model_name}'")
+            dimension = probe()
+
+        self.set_embedding_dimension(model_name, dimension)
+        return dimension
+
+    def set_embedding_dimension(self, model_name: str, dimension: int) -> None:
+        with self._lock:
+            data = self._load()
+            data.setdefault("embedding_dimensions", {})[model_name] = dimension
+            self._save(data)
+
+    def _load(self) -> dict:
+        if self._data is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as metadata_file:
+                    self._data = json.load(metadata_file)
+            except FileNotFoundError:
+                self._data = {}
+            except (OSError, ValueError) as e:
+                log.warning(f"Ignoring unreadable model metadata at {self.path}: {e}")
+                self._data = {}
+        return self._data
+
+    def _save(self, data: dict) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as metadata_file:
+            json.dump(data, metadata_file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def _base_name(model_name: str) -> str:
+    # "jinaai/jina-embeddings-v3" atau "nomic-embed-text:latest" -> nama dasar
+    return model_name.rsplit("/", 1)[-1].split(":", 1)[0]
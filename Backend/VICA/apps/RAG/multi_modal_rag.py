@@ -1,41 +1,62 @@
 import os
 import sys
 import uuid
-import base64
 import tempfile
 import shutil
-from typing import List, Any, Dict
+from typing import List, Any, AsyncIterator, Dict, Optional, Tuple, Union
 
 import asyncio
 from fastapi import UploadFile, HTTPException, status
 from pydantic import BaseModel
-from unstructured.partition.pdf import partition_pdf
-
-import nltk
-nltk.download("punkt_tab")
-nltk.download('averaged_perceptron_tagger_eng')
-
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import VectorParams
-from llama_index.core import (
-    VectorStoreIndex,
-    Settings,
-    StorageContext,
-    get_response_synthesizer,
-)
+
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.models import PayloadSchemaType, VectorParams
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core.retrievers import VectorIndexRetriever
 from llama_index.vector_stores.qdrant import QdrantVectorStore
-from llama_index.core.query_engine import RetrieverQueryEngine
-from llama_index.core.schema import Document
+from llama_index.core.schema import BaseNode, Document, TextNode
 from llama_index.core.base.response.schema import Response
 
 from Backend.VICA.apps.RAG.pdf import PDFService
-from Backend.VICA.config import QDRANT_URL, QDRANT_API_KEY
+from Backend.VICA.apps.RAG.embedding import EmbeddingService, attach_file_metadata
+from Backend.VICA.apps.RAG.vector_writer import QdrantBulkWriter
+from Backend.VICA.apps.RAG.query_pipeline import EMPTY_RESPONSE, QueryPipeline
+from Backend.VICA.apps.RAG.rerankers import build_reranker
+from Backend.VICA.apps.RAG.bm25 import BM25Index
+from Backend.VICA.apps.RAG.cache import TTLCache
+from Backend.VICA.apps.RAG.answer_cache import SemanticAnswerCache
+from Backend.VICA.apps.RAG.workers import CPUWorkerPool, partition_pdf_elements, run_cpu_bound
+from Backend.VICA.apps.RAG.jobs import ProgressCallback, report_progress
+from Backend.VICA.apps.RAG.pipeline import batched, buffered
+from Backend.VICA.apps.RAG.upload_source import UploadSource
+from Backend.VICA.apps.RAG.csv_ingest import CSVChunker
+from Backend.VICA.apps.RAG.image_prep import ImagePrepStats, UnsupportedImageError
+from Backend.VICA.apps.RAG.image_filter import DecorativeImageFilter, FilteredImage, ImageFilterStats
+from Backend.VICA.apps.RAG.tabular import TableInfo, TabularStore, TextToSQLEngine, is_tabular_question
+from Backend.VICA.config import (
+    QDRANT_URL,
+    QDRANT_API_KEY,
+    RAG_PIPELINE_QUEUE_SIZE,
+    RAG_EMBED_BATCH_SIZE,
+    RAG_EMBED_MAX_IN_FLIGHT,
+    RAG_UPLOAD_SPOOL_THRESHOLD,
+    RAG_CSV_CHUNK_TOKENS,
+    RAG_CSV_EMBED_MAX_ROWS,
+    RAG_SQL_MAX_ROWS,
+    RAG_SQL_TIMEOUT,
+    RAG_RETRIEVE_TOP_K,
+    RAG_RERANK_TOP_N,
+    RAG_RERANK_MODEL,
+    RAG_RERANKER,
+    RAG_FUSION_CONFIDENCE,
+    RAG_RRF_K,
+    RAG_HANDLE_CACHE_SIZE,
+    RAG_HANDLE_CACHE_TTL,
+)
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from VICA.apps.VICA.models.user import Users
 from VICA.apps.VICA.models.chat import Chats
+from VICA.apps.VICA.models.file import Files
 
 ####################
 # MultiModalRAGService
@@ -50,83 +71,452 @@ class MultiModalRAGService:
         embed_model,
         rerank_service,
         pdf_service: PDFService,
+        cpu_pool: Optional[CPUWorkerPool] = None,
+        embedding_service: Optional[EmbeddingService] = None,
+        vector_writer: Optional[QdrantBulkWriter] = None,
+        tabular_store: Optional[TabularStore] = None,
+        image_filter: Optional[DecorativeImageFilter] = None,
+        qdrant_client: Optional[QdrantClient] = None,
+        nltk_data_dir: Optional[str] = None,
+        handle_cache: Optional[TTLCache] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        async_qdrant_client: Optional[AsyncQdrantClient] = None,
+        async_rerank_service=None,
+        sparse_index: Optional[BM25Index] = None,
     ) -> None:
         self.llm = llm
         self.embed_model = embed_model
         self.rerank_service = rerank_service
         self.pdf_service = pdf_service
-        self.embedding_size = self._get_embedding_size()
-        self.qdrant_client = self._get_qdrant_client()
+        self.cpu_pool = cpu_pool
+        self.embedding_service = embedding_service or EmbeddingService(embed_model)
+        self.qdrant_client = qdrant_client or self._get_qdrant_client()
+        # Client async untuk jalur query async; tanpa client ini aexecute_query memakai thread
+        self.async_qdrant_client = async_qdrant_client
+        self.vector_writer = vector_writer or QdrantBulkWriter(self.qdrant_client)
+        self.tabular_store = tabular_store
+        self.image_filter = image_filter
+        self.nltk_data_dir = nltk_data_dir
+        # Handle vector store per collection; dibuang saat ingestion atau penghapusan
+        self.handle_cache = handle_cache or TTLCache(
+            RAG_HANDLE_CACHE_SIZE, RAG_HANDLE_CACHE_TTL, name="vector_store_handles"
+        )
+        self.answer_cache = answer_cache
+        self.sparse_index = sparse_index
+        self.query_pipeline = QueryPipeline(
+            llm,
+            self.embedding_service,
+            build_reranker(
+                RAG_RERANKER,
+                rerank_service,
+                async_rerank_service,
+                model=RAG_RERANK_MODEL,
+                min_confidence=RAG_FUSION_CONFIDENCE,
+            ),
+            retrieve_top_k=RAG_RETRIEVE_TOP_K,
+            rerank_top_n=RAG_RERANK_TOP_N,
+            sparse_index=sparse_index,
+            rrf_k=RAG_RRF_K,
+        )
+        self.sql_engine = (
+            TextToSQLEngine(tabular_store, llm, max_rows=RAG_SQL_MAX_ROWS, timeout=RAG_SQL_TIMEOUT)
+            if tabular_store is not None
+            else None
+        )
 
         # Configure logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    async def create_knowledge_base(self, user_id: str, chat_id: str, file: UploadFile) -> None:
+    async def create_knowledge_base(
+        self,
+        user_id: str,
+        chat_id: str,
+        file: Union[UploadSource, UploadFile],
+        progress: Optional[ProgressCallback] = None,
+    ) -> str:
+        """Tambahkan file ke knowledge base; kembalikan 'created', 'replaced' atau 'duplicate'."""
+        if isinstance(file, UploadSource):
+            return await self._create_knowledge_base(user_id, chat_id, file, progress)
+
+        with await UploadSource.from_upload(file, RAG_UPLOAD_SPOOL_THRESHOLD) as source:
+            return await self._create_knowledge_base(user_id, chat_id, source, progress)
+
+    async def _create_knowledge_base(
+        self,
+        user_id: str,
+        chat_id: str,
+        file: UploadSource,
+        progress: Optional[ProgressCallback],
+    ) -> str:
         self.logger.info(f"Starting knowledge base creation or update for chat_id '{chat_id}'.")
         collection_id = self._get_chat_collection_id(user_id, chat_id)
-        
-        # Periksa apakah collection sudah ada
-        if self.qdrant_client.collection_exists(collection_id):
-            self.logger.info(f"File '{file.filename}' is new. Adding to existing collection '{collection_id}'.")
-        else:
-            # Buat collection baru jika belum ada
-            self.logger.info(f"Collection '{collection_id}' does not exist. Creating a new collection.")
-            self.qdrant_client.create_collection(
-                collection_name=collection_id,
-                vectors_config=VectorParams(
-                    size=self.embedding_size, distance="Cosine"
-                ),
-            )
-            self.logger.info(f"Collection '{collection_id}' created.")
 
-        # Proses dokumen
-        documents = await self._load_and_process_files(file)
-        vector_store = QdrantVectorStore(
-            client=self.qdrant_client, collection_name=collection_id
+        # File identik yang sudah ada di collection tidak diproses ulang
+        content_hash, size = file.sha256, file.size
+        duplicate = await asyncio.to_thread(
+            Files.get_file_by_collection_id_and_hash, user_id, collection_id, content_hash
         )
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
+        if duplicate is not None:
+            self.logger.info(
+                f"File '{file.filename}' already ingested as '{duplicate.id}', skipping."
+            )
+            return "duplicate"
+        previous_files = await asyncio.to_thread(
+            Files.get_files_by_collection_id_and_filename, user_id, collection_id, file.filename
+        )
+        
+        # Qdrant client dan dimensi embedding bersifat sinkron, jalankan di thread
+        if await asyncio.to_thread(self._ensure_collection, collection_id):
+            self.logger.info(f"Collection '{collection_id}' created.")
+        else:
+            self.logger.info(f"File '{file.filename}' is new. Adding to existing collection '{collection_id}'.")
 
         # Tambahkan metadata unik
         file_id = str(uuid.uuid4())  # ID unik untuk file baru
-        for document in documents:
-            document.metadata = {
+        metadata = {
+            "collection_id": collection_id,
+            "file_id": file_id,
+            "filename": file.filename,
+            "user_id": user_id,
+            "chat_id": chat_id,
+        }
+        writer = self.vector_writer.session(collection_id, file_id)
+
+        # Pipeline: parse/describe -> split -> embed -> upsert, tiap tahap berjalan
+        # bersamaan dan dihubungkan dengan antrian terbatas
+        await report_progress(progress, "parsing", 0.1)
+        image_stats = ImagePrepStats()
+        filter_stats = ImageFilterStats()
+        documents = buffered(
+            self._load_and_process_files(file, metadata, image_stats, filter_stats),
+            RAG_PIPELINE_QUEUE_SIZE,
+        )
+        nodes = buffered(self._split_documents(documents), RAG_PIPELINE_QUEUE_SIZE)
+        # Satu potongan berisi beberapa batch agar EmbeddingService bisa mengirimnya paralel
+        embedded_batches = buffered(
+            self._embed_nodes(batched(nodes, RAG_EMBED_BATCH_SIZE * RAG_EMBED_MAX_IN_FLIGHT)),
+            RAG_PIPELINE_QUEUE_SIZE,
+        )
+
+        node_count = 0
+        try:
+            async for batch in embedded_batches:
+                await writer.add(batch)
+                await self._index_sparse(collection_id, file_id, batch)
+                if node_count == 0:
+                    await report_progress(progress, "indexing", 0.5)
+                node_count += len(batch)
+            await writer.close()
+        except BaseException:
+            writer.abort()
+            await self._drop_points(collection_id, file_id)
+            await self._drop_tables(collection_id, file_id)
+            await self._drop_sparse(collection_id, file_id)
+            self._invalidate_collection(collection_id)
+            raise
+
+        await asyncio.to_thread(
+            Files.insert_new_file,
+            file_id,
+            user_id,
+            file.filename,
+            {
                 "collection_id": collection_id,
-                "file_id": file_id,
-                "filename": file.filename,
-                "user_id": user_id,
                 "chat_id": chat_id,
-            }
-
-        # Tambahkan dokumen sebagai node baru
-        storage_context.docstore.add_documents(documents)
-        VectorStoreIndex(
-            nodes=documents, storage_context=storage_context, show_progress=True
+                "content_hash": content_hash,
+                "size": size,
+                "chunks": node_count,
+                "vision_payload": image_stats.to_dict() if image_stats.images else None,
+                "image_filter": filter_stats.to_dict() if filter_stats.total else None,
+            },
         )
 
+        # Versi lama file yang sama diganti: point baru sudah terlihat, baru point lama dihapus
+        for previous_file in previous_files:
+            await self.vector_writer.delete_file(collection_id, previous_file.id)
+            await self._drop_tables(collection_id, previous_file.id)
+            await self._drop_sparse(collection_id, previous_file.id)
+            await asyncio.to_thread(Files.delete_file_by_id, previous_file.id)
+            self.logger.info(f"Replaced previous version '{previous_file.id}' of '{file.filename}'.")
+        self._invalidate_collection(collection_id)
+
         self.logger.info(
-            f"Knowledge base updated for chat_id '{chat_id}' in collection '{collection_id}'."
+            f"Knowledge base updated for chat_id '{chat_id}' in collection '{collection_id}' "
+            f"with {node_count} chunks."
         )
+        if filter_stats.total:
+            self.logger.info(
+                f"Image filter for '{file.filename}': {filter_stats.kept} of {filter_stats.total} "
+                f"images described, {filter_stats.vision_calls_avoided} vision calls avoided."
+            )
+        if image_stats.images:
+            self.logger.info(
+                f"Vision payload for '{file.filename}': {image_stats.images} images, "
+                f"{image_stats.bytes_saved} of {image_stats.original_bytes} bytes saved."
+            )
+        return "replaced" if previous_files else "created"
 
+    def _ensure_collection(self, collection_id: str) -> bool:
+        """Buat collection beserta index payload jika belum ada; True jika baru dibuat."""
+        if self.qdrant_client.collection_exists(collection_id):
+            return False
+
+        self.logger.info(f"Collection '{collection_id}' does not exist. Creating a new collection.")
+        self.qdrant_client.create_collection(
+            collection_name=collection_id,
+            vectors_config=VectorParams(
+                size=self.embedding_size, distance="Cosine"
+            ),
+        )
+        # Index payload file_id dipakai barrier konsistensi dan penghapusan per file
+        self.qdrant_client.create_payload_index(
+            collection_name=collection_id,
+            field_name="file_id",
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
+        return True
+
+    async def delete_knowledge_base(self, user_id: str, chat_id: str) -> bool:
+        """Hapus collection, tabel SQLite, dan catatan file milik chat; False jika tidak ada."""
+        collection_id = self._get_chat_collection_id(user_id, chat_id)
+        self._invalidate_collection(collection_id)
+
+        try:
+            exists = await asyncio.to_thread(self.qdrant_client.collection_exists, collection_id)
+            if exists:
+                await asyncio.to_thread(self.qdrant_client.delete_collection, collection_id)
+            if self.tabular_store is not None:
+                await asyncio.to_thread(self.tabular_store.drop_collection, collection_id)
+            if self.sparse_index is not None:
+                await asyncio.to_thread(self.sparse_index.drop_collection, collection_id)
+            await asyncio.to_thread(Files.delete_files_by_collection_id, user_id, collection_id)
+        finally:
+            # Query yang berjalan selama penghapusan bisa menyimpan ulang handle/jawaban lama
+            self._invalidate_collection(collection_id)
+
+        self.logger.info(f"Knowledge base '{collection_id}' deleted for chat_id '{chat_id}'.")
+        return exists
+
+    def _invalidate_collection(self, collection_id: str) -> None:
+        self.handle_cache.delete(collection_id)
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(collection_id)
+
+    async def _drop_points(self, collection_id: str, file_id: str) -> None:
+        # Point yang sudah ter-upsert dari ingestion yang gagal; versi lama tetap utuh
+        try:
+            await self.vector_writer.delete_file(collection_id, file_id)
+        except Exception as e:
+            self.logger.warning(f"Failed to remove partial points of '{file_id}': {e}")
+
+    async def _drop_tables(self, collection_id: str, file_id: str) -> None:
+        if self.tabular_store is not None:
+            await asyncio.to_thread(self.tabular_store.drop_file, collection_id, file_id)
+
+    async def _index_sparse(self, collection_id: str, file_id: str, nodes: List[BaseNode]) -> None:
+        if self.sparse_index is not None:
+            await asyncio.to_thread(self.sparse_index.add_nodes, collection_id, file_id, nodes)
+
+    async def _drop_sparse(self, collection_id: str, file_id: str) -> None:
+        if self.sparse_index is not None:
+            await asyncio.to_thread(self.sparse_index.drop_file, collection_id, file_id)
+
+    async def _split_documents(self, documents: AsyncIterator[Document]) -> AsyncIterator[BaseNode]:
+        splitter = SentenceSplitter(chunk_size=1000, chunk_overlap=50)
+        async for document in documents:
+            if not isinstance(document, Document):
+                # Node yang sudah di-chunk sendiri (mis. CSV) diteruskan apa adanya
+                yield document
+                continue
+            for node in splitter.get_nodes_from_documents([document]):
+                yield node
+
+    async def _embed_nodes(self, batches: AsyncIterator[List[BaseNode]]) -> AsyncIterator[List[BaseNode]]:
+        async for batch in batches:
+            yield await self.embedding_service.aembed_nodes(batch)
 
     def execute_query(
-        self, user_id: str, chat_id: str, question: str, top_k: int = 3
+        self, user_id: str, chat_id: str, question: str, top_k: int = RAG_RERANK_TOP_N
     ) -> Response:
         self.logger.info(f"Executing query for chat_id '{chat_id}': {question}")
         collection_id = self._get_chat_collection_id(user_id, chat_id)
 
-        if self.qdrant_client.collection_exists(collection_id):
-            vector_index = self._get_vector_index(collection_id)
+        vector_store = self._get_vector_store(collection_id)
+        if vector_store is None:
+            raise ValueError(f"No knowledge base found for chat_id '{chat_id}'.")
 
-            top_reranked_texts = self._retrieve_top_texts(vector_index, question)
-            return self._synthesize_answer(
-                vector_index, top_reranked_texts, question, top_k
+        # Pertanyaan yang hampir sama di collection ini dijawab dari cache
+        query_embedding, version = None, None
+        if self.answer_cache is not None:
+            version = Files.get_collection_version(user_id, collection_id)
+            query_embedding = self.embedding_service.embed_query(question)
+            cached_response = self._answer_from_cache(collection_id, query_embedding, version)
+            if cached_response is not None:
+                return cached_response
+
+        # Pertanyaan agregat/filter atas data tabular dijawab lewat SQL
+        response = self._answer_with_sql(collection_id, question)
+        if response is None:
+            response = self.query_pipeline.query(
+                vector_store, question, top_k, query_embedding=query_embedding
             )
-        else:
+        return self._remember_answer(collection_id, question, query_embedding, version, response)
+
+    async def aexecute_query(
+        self, user_id: str, chat_id: str, question: str, top_k: int = RAG_RERANK_TOP_N
+    ) -> Response:
+        """Versi async `execute_query`: embed, search, rerank, dan LLM tidak menahan thread."""
+        self.logger.info(f"Executing async query for chat_id '{chat_id}': {question}")
+        collection_id = await asyncio.to_thread(self._get_chat_collection_id, user_id, chat_id)
+
+        vector_store = await self._aget_vector_store(collection_id)
+        if vector_store is None:
             raise ValueError(f"No knowledge base found for chat_id '{chat_id}'.")
 
-    def _get_embedding_size(self) -> int:
-        return len(self.embed_model.get_query_embedding("sample"))
+        query_embedding, version = None, None
+        if self.answer_cache is not None:
+            version, query_embedding = await asyncio.gather(
+                asyncio.to_thread(Files.get_collection_version, user_id, collection_id),
+                self.embedding_service.aembed_query(question),
+            )
+            # Scan cache memakai lock dan loop Python, jangan jalankan di event loop
+            cached_response = await asyncio.to_thread(
+                self._answer_from_cache, collection_id, query_embedding, version
+            )
+            if cached_response is not None:
+                return cached_response
+
+        response = None
+        if self.sql_engine is not None and is_tabular_question(question):
+            # SQLite dan text-to-SQL tetap sync; hanya pertanyaan tabular yang memakai thread
+            response = await asyncio.to_thread(self._answer_with_sql, collection_id, question)
+        if response is None:
+            response = await self.query_pipeline.aquery(
+                vector_store, question, top_k, query_embedding=query_embedding
+            )
+        return await asyncio.to_thread(
+            self._remember_answer, collection_id, question, query_embedding, version, response
+        )
+
+    async def astream_query(
+        self, user_id: str, chat_id: str, question: str, top_k: int = RAG_RERANK_TOP_N
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Seperti `aexecute_query`, tetapi menghasilkan event (nama, data) untuk streaming SSE."""
+        self.logger.info(f"Streaming query for chat_id '{chat_id}': {question}")
+        collection_id = await asyncio.to_thread(self._get_chat_collection_id, user_id, chat_id)
+
+        vector_store = await self._aget_vector_store(collection_id)
+        if vector_store is None:
+            raise ValueError(f"No knowledge base found for chat_id '{chat_id}'.")
+
+        query_embedding, version = None, None
+        if self.answer_cache is not None:
+            version, query_embedding = await asyncio.gather(
+                asyncio.to_thread(Files.get_collection_version, user_id, collection_id),
+                self.embedding_service.aembed_query(question),
+            )
+            cached_response = await asyncio.to_thread(
+                self._answer_from_cache, collection_id, query_embedding, version
+            )
+            if cached_response is not None:
+                async for event in self._stream_response(cached_response):
+                    yield event
+                return
+
+        if self.sql_engine is not None and is_tabular_question(question):
+            response = await asyncio.to_thread(self._answer_with_sql, collection_id, question)
+            if response is not None:
+                response = await asyncio.to_thread(
+                    self._remember_answer, collection_id, question, query_embedding, version, response
+                )
+                async for event in self._stream_response(response):
+                    yield event
+                return
+
+        async for name, data in self.query_pipeline.astream(
+            vector_store, question, top_k, query_embedding=query_embedding
+        ):
+            if name == "done":
+                response = Response(
+                    response=data["response"],
+                    metadata={"route": data["route"], "timings": data["timings"]},
+                )
+                response = await asyncio.to_thread(
+                    self._remember_answer, collection_id, question, query_embedding, version, response
+                )
+                data = {**response.metadata, "response": response.response}
+            yield name, data
+
+    @staticmethod
+    async def _stream_response(response: Response) -> AsyncIterator[Tuple[str, Any]]:
+        # Jawaban yang sudah jadi (cache/SQL) dikirim sebagai satu token
+        yield "token", response.response
+        yield "done", {**(response.metadata or {}), "response": response.response}
+
+    def _remember_answer(
+        self,
+        collection_id: str,
+        question: str,
+        query_embedding: Optional[List[float]],
+        version: Optional[str],
+        response: Response,
+    ) -> Response:
+        # Jawaban kosong (tidak ada node relevan) tidak disimpan agar tidak menutupi data baru
+        if self.answer_cache is not None and response.response not in (None, "", EMPTY_RESPONSE):
+            metadata = {k: v for k, v in (response.metadata or {}).items() if k != "timings"}
+            self.answer_cache.store(
+                collection_id, question, query_embedding, response.response, metadata, version
+            )
+        response.metadata = {**(response.metadata or {}), "cache_hit": False}
+        return response
+
+    def _answer_from_cache(
+        self, collection_id: str, query_embedding: List[float], version: Optional[str] = None
+    ) -> Optional[Response]:
+        match = self.answer_cache.lookup(collection_id, query_embedding, version)
+        if match is None:
+            return None
+
+        cached, similarity = match
+        self.logger.info(f"Answered from cache (similarity {similarity:.3f}): {cached.question}")
+        return Response(
+            response=cached.response,
+            metadata={
+                **cached.metadata,
+                "cache_hit": True,
+                "similarity": similarity,
+                "cached_question": cached.question,
+            },
+        )
+
+    def _answer_with_sql(self, collection_id: str, question: str) -> Optional[Response]:
+        if self.sql_engine is None or not is_tabular_question(question):
+            return None
+
+        try:
+            result = self.sql_engine.answer(collection_id, question)
+        except Exception as e:
+            self.logger.warning(f"Text-to-SQL failed, falling back to vector search: {e}")
+            return None
+        if result is None:
+            return None
+
+        self.logger.info(f"Answered with SQL: {result.sql}")
+        return Response(
+            response=result.answer,
+            metadata={
+                "route": "sql",
+                "sql": result.sql,
+                "columns": result.columns,
+                "rows": [list(row) for row in result.rows],
+                "truncated": result.truncated,
+            },
+        )
+
+    @property
+    def embedding_size(self) -> int:
+        return self.embedding_service.dimension()
 
     def _get_qdrant_client(self) -> QdrantClient:
         return QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
@@ -145,212 +535,215 @@ class MultiModalRAGService:
 
         return f"{user_id}_{chat_id}"
 
-    async def _load_and_process_files(self, file: UploadFile) -> List[Document]:
+    async def _load_and_process_files(
+        self,
+        file: UploadSource,
+        metadata: Dict[str, Any],
+        image_stats: Optional[ImagePrepStats] = None,
+        filter_stats: Optional[ImageFilterStats] = None,
+    ) -> AsyncIterator[Document]:
 
         file_extension = os.path.splitext(file.filename.lower())[1]
 
-        if file_extension in ['.jpg', '.jpeg', '.png', '.svg']:
-            return await self._process_image(file)
+        if file_extension in ['.jpg', '.jpeg', '.png']:
+            documents = self._process_image(file, image_stats)
         elif file_extension in ['.pdf']:
-            return await self._process_pdf(file)
+            documents = self._process_pdf(file, metadata, image_stats, filter_stats)
         elif file_extension in ['.docx']:
-            return await self._process_docx(file)
+            documents = self._process_docx(file)
         elif file_extension in ['.txt']:
-            return await self._process_txt(file)
+            documents = self._process_txt(file)
         elif file_extension in ['.csv']:
-            return await self._process_csv(file)
+            documents = self._process_csv(file, metadata)
         else:
             raise ValueError(f"Unsupported file type: {file_extension}")
 
-    async def _process_image(self, file: UploadFile) -> List[Document]:
-
-        try:
-            # Simpan gambar sementara
-            temp_dir = tempfile.mkdtemp()
-            file_path = os.path.join(temp_dir, file.filename)
-
-            with open(file_path, "wb") as tmp_file:
-                tmp_file.write(await file.read())
-
-            self.logger.info(f"Image file saved temporarily at {file_path}")
+        async for document in documents:
+            yield attach_file_metadata(document, metadata)
 
-            with open(file_path, "rb") as img_file:
-                base64_image = base64.b64encode(img_file.read()).decode("utf-8")
+    async def _process_image(
+        self, file: UploadSource, image_stats: Optional[ImagePrepStats] = None
+    ) -> AsyncIterator[Document]:
+        # Gambar diperkecil/dikompres ulang sesuai kebutuhan vision model
+        base64_image = await self.pdf_service.prepare_image_bytes(bytes(file.view()), image_stats)
 
-            # Dapatkan deskripsi gambar
-            description = await self.pdf_service._describe_image(base64_image, page_number=1)
-            self.logger.info(f"Description generated for image '{file.filename}'")
-
-            return [Document(text=f"Description of {file.filename}: {description}")]
-        finally:
-            # Hapus file sementara
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
+        # Dapatkan deskripsi gambar
+        description = await self.pdf_service._describe_image(base64_image, page_number=1)
+        self.logger.info(f"Description generated for image '{file.filename}'")
 
-    async def _process_pdf(self, file: UploadFile) -> List[Document]:
+        yield Document(text=f"Description of {file.filename}: {description}")
 
+    async def _process_pdf(
+        self,
+        file: UploadSource,
+        metadata: Dict[str, Any],
+        image_stats: Optional[ImagePrepStats] = None,
+        filter_stats: Optional[ImageFilterStats] = None,
+    ) -> AsyncIterator[Document]:
+        # partition_pdf butuh path; hanya direktori gambar hasil ekstraksi yang sementara
+        image_root = tempfile.mkdtemp()
+        image_dir = os.path.join(image_root, "images")
         try:
-            temp_dir = tempfile.mkdtemp()
-            file_path = os.path.join(temp_dir, file.filename)
-            image_dir = os.path.join(temp_dir, "images")
-
-            # Simpan file sementara
-            with open(file_path, "wb") as tmp_file:
-                tmp_file.write(await file.read())
-
-            self.logger.info(f"PDF file saved temporarily at {file_path}")
-
-            # Proses PDF
-            raw_pdf_elements = partition_pdf(
-                filename=file_path,
-                extract_images_in_pdf=True,
-                infer_table_structure=True,
-                chunking_strategy="by_title",
-                extract_image_block_output_dir=image_dir,
-            )
+            with file.as_path() as file_path:
+                # Proses PDF di worker process, partition_pdf sangat CPU-bound
+                raw_pdf_elements, tables = await run_cpu_bound(
+                    self.cpu_pool, partition_pdf_elements, file_path, image_dir, self.nltk_data_dir
+                )
 
             self.logger.info("PDF partitioned successfully.")
 
-            # Proses gambar yang diekstrak
-            image_descriptions = []
-            if os.path.exists(image_dir):
-                for image_number, image_file in enumerate(sorted(os.listdir(image_dir)), start=1):
-                    if image_file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                        image_path = os.path.join(image_dir, image_file)
-
-                        with open(image_path, "rb") as img_file:
-                            base64_image = base64.b64encode(img_file.read()).decode("utf-8")
-
-                        description = await self.pdf_service._describe_image(base64_image, image_number)
-                        image_descriptions.append(f"Image {image_file}: {description}")
+            # Tabel hasil ekstraksi juga disimpan ke SQLite untuk pertanyaan agregat;
+            # teksnya tetap ikut di-embed bersama isi PDF
+            if self.tabular_store is not None and tables:
+                await asyncio.to_thread(self._load_pdf_tables, file, metadata, tables)
 
-            # Gabungkan teks dan deskripsi gambar
-            splitter = SentenceSplitter(chunk_size=1000, chunk_overlap=50)
-            text_descriptions = " ".join([str(element) for element in raw_pdf_elements])
-            combined_content = text_descriptions + "\n" + "\n".join(image_descriptions)
+            # Teks langsung diteruskan ke tahap berikutnya selagi gambar dideskripsikan
+            yield Document(text=" ".join(raw_pdf_elements))
 
-            return [Document(text=text) for text in splitter.split_text(combined_content)]
+            # Proses gambar yang diekstrak secara paralel, hasil tetap berurutan
+            image_files = []
+            if os.path.exists(image_dir):
+                image_files = [
+                    image_file
+                    for image_file in sorted(os.listdir(image_dir))
+                    if image_file.lower().endswith(('.jpg', '.jpeg', '.png'))
+                ]
+
+            images = await self._filter_images(image_dir, image_files, filter_stats)
+
+            async for result in self.pdf_service.describer.stream(
+                self._iter_image_files(image_dir, [image.filename for image in images], image_stats)
+            ):
+                if result.ok:
+                    image = images[result.page_number - 1]
+                    repeated = (
+                        f" (also appears as {', '.join(image.duplicates)})" if image.duplicates else ""
+                    )
+                    yield Document(
+                        text=f"Image {image.filename}{repeated}: Page {result.page_number} description:\n{result.description}\n"
+                    )
         finally:
-            # Hapus file sementara
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
+            shutil.rmtree(image_root, ignore_errors=True)
 
-    async def _process_docx(self, file: UploadFile) -> List[Document]:
-        """Proses file DOCX."""
-        try:
-            # Simpan file sementara
-            temp_dir = tempfile.mkdtemp()
-            file_path = os.path.join(temp_dir, file.filename)
-
-            with open(file_path, "wb") as tmp_file:
-                tmp_file.write(await file.read())
+    async def _filter_images(
+        self, image_dir: str, image_files: List[str], filter_stats: Optional[ImageFilterStats] = None
+    ) -> List[FilteredImage]:
+        if self.image_filter is None or not image_files:
+            return [FilteredImage(image_file) for image_file in image_files]
 
-            self.logger.info(f"DOCX file saved temporarily at {file_path}")
+        # Logo, ikon, dan gambar berulang tidak perlu dikirim ke vision model
+        images, stats = await run_cpu_bound(
+            self.cpu_pool, self.image_filter.filter_files, image_dir, image_files
+        )
+        if filter_stats is not None:
+            filter_stats.merge(stats)
+        return images
+
+    async def _iter_image_files(
+        self, image_dir: str, image_files: List[str], image_stats: Optional[ImagePrepStats] = None
+    ):
+        for image_number, image_file in enumerate(image_files, start=1):
+            image_path = os.path.join(image_dir, image_file)
+            with open(image_path, "rb") as img_file:
+                data = img_file.read()
+            try:
+                base64_image = await self.pdf_service.prepare_image_bytes(data, image_stats)
+            except UnsupportedImageError as e:
+                self.logger.warning(f"Skipping extracted image '{image_file}': {e}")
+                continue
+            yield image_number, base64_image
+
+    async def _process_docx(self, file: UploadSource) -> AsyncIterator[Document]:
+        """Proses file DOCX."""
+        import docx
 
-            # Baca konten DOCX
-            doc = docx.Document(file_path)
-            text_content = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+        # python-docx menerima file-like, dibaca langsung dari buffer
+        with file.open() as docx_file:
+            doc = docx.Document(docx_file)
+        text_content = "\n".join([paragraph.text for paragraph in doc.paragraphs])
 
-            # Split menjadi dokumen kecil untuk indexing
-            splitter = SentenceSplitter(chunk_size=1000, chunk_overlap=50)
-            return [Document(text=text) for text in splitter.split_text(text_content)]
-        finally:
-            # Hapus file sementara
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
+        yield Document(text=text_content)
 
-    async def _process_txt(self, file: UploadFile) -> List[Document]:
+    async def _process_txt(self, file: UploadSource) -> AsyncIterator[Document]:
         """Proses file TXT."""
-        try:
-            # Simpan file sementara
-            temp_dir = tempfile.mkdtemp()
-            file_path = os.path.join(temp_dir, file.filename)
-
-            with open(file_path, "wb") as tmp_file:
-                tmp_file.write(await file.read())
-
-            self.logger.info(f"TXT file saved temporarily at {file_path}")
-
-            # Baca konten TXT
-            with open(file_path, "r", encoding="utf-8") as txt_file:
-                text_content = txt_file.read()
-
-            # Split menjadi dokumen kecil untuk indexing
-            splitter = SentenceSplitter(chunk_size=1000, chunk_overlap=50)
-            return [Document(text=text) for text in splitter.split_text(text_content)]
-        finally:
-            # Hapus file sementara
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-
-    async def _process_csv(self, file: UploadFile) -> List[Document]:
-        """Proses file CSV."""
-        try:
-            # Simpan file sementara
-            temp_dir = tempfile.mkdtemp()
-            file_path = os.path.join(temp_dir, file.filename)
-
-            with open(file_path, "wb") as tmp_file:
-                tmp_file.write(await file.read())
-
-            self.logger.info(f"CSV file saved temporarily at {file_path}")
-
-            # Baca konten CSV
-            with open(file_path, "r", encoding="utf-8") as csv_file:
-                reader = csv.reader(csv_file)
-                rows = ["\t".join(row) for row in reader]
-
-            text_content = "\n".join(rows)
-
-            # Split menjadi dokumen kecil untuk indexing
-            splitter = SentenceSplitter(chunk_size=1000, chunk_overlap=50)
-            return [Document(text=text) for text in splitter.split_text(text_content)]
-        finally:
-            # Hapus file sementara
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-
-
-    def _get_vector_index(self, collection_id: uuid) -> VectorStoreIndex:
-        vector_store = QdrantVectorStore(
-            client=self.qdrant_client, collection_name=collection_id
-        )
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-        return VectorStoreIndex.from_vector_store(
-            vector_store=vector_store, storage_context=storage_context
-        )
+        text_content = str(file.view(), "utf-8")
+
+        yield Document(text=text_content)
+
+    async def _process_csv(
+        self, file: UploadSource, metadata: Dict[str, Any]
+    ) -> AsyncIterator[BaseNode]:
+        """Proses file CSV: muat ke SQLite, lalu embed baris atau ringkasan tabel saja."""
+        if self.tabular_store is not None:
+            table = await asyncio.to_thread(self._load_csv_table, file, metadata)
+            # CSV besar cukup diwakili ringkasannya; baris-barisnya dijawab lewat SQL
+            if table is not None and table.row_count > RAG_CSV_EMBED_MAX_ROWS:
+                self.logger.info(
+                    f"CSV file '{file.filename}' has {table.row_count} rows, "
+                    f"embedding table summary only."
+                )
+                yield Document(text=table.summary())
+                return
+
+        chunker = CSVChunker(max_tokens=RAG_CSV_CHUNK_TOKENS)
+        chunk_count = 0
+        with file.text_stream() as csv_file:
+            chunks = chunker.iter_chunks(csv_file)
+            # Parsing CSV dijalankan di thread agar event loop tetap bebas
+            while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                chunk_count += 1
+                yield chunk.to_node()
+
+        self.logger.info(f"CSV file '{file.filename}' packed into {chunk_count} row chunks.")
+
+    def _load_csv_table(self, file: UploadSource, metadata: Dict[str, Any]) -> Optional[TableInfo]:
+        with file.text_stream() as csv_file:
+            return self.tabular_store.load_csv(
+                metadata["collection_id"], metadata["file_id"], file.filename, csv_file
+            )
 
-    def _retrieve_top_texts(
-        self, vector_index: VectorStoreIndex, question: str
-    ) -> List[str]:
-        retriever = VectorIndexRetriever(index=vector_index, similarity_top_k=10)
-        relevant_texts = [doc.text for doc in retriever.retrieve(question)]
+    def _load_pdf_tables(self, file: UploadSource, metadata: Dict[str, Any], tables: List[str]) -> None:
+        for table_number, html in enumerate(tables, start=1):
+            try:
+                self.tabular_store.load_html_table(
+                    metadata["collection_id"], metadata["file_id"], file.filename, html, table_number
+                )
+            except Exception as e:
+                self.logger.warning(f"Skipping table {table_number} of '{file.filename}': {e}")
 
-        if not relevant_texts:
-            self.logger.warning("No relevant texts found.")
-            return []
 
-        reranked_results = self.rerank_service.rerank(
-            model="rerank-english-v3.0", query=question, documents=relevant_texts
+    def _get_vector_store(self, collection_id: str) -> Optional[QdrantVectorStore]:
+        # collection_exists dan pembuatan handle hanya dilakukan saat cache miss
+        return self.handle_cache.get_or_create(
+            collection_id, lambda: self._build_vector_store(collection_id)
         )
 
-        return [relevant_texts[result.index] for result in reranked_results.results[:3]]
+    async def _aget_vector_store(self, collection_id: str) -> Optional[QdrantVectorStore]:
+        vector_store = self.handle_cache.get(collection_id)
+        if vector_store is not None:
+            return vector_store
 
-    def _synthesize_answer(
-        self,
-        vector_index: VectorStoreIndex,
-        top_reranked_texts: List[str],
-        question: str,
-        top_k: int,
-    ) -> Response:
-        query_engine = RetrieverQueryEngine(
-            retriever=VectorIndexRetriever(index=vector_index, similarity_top_k=top_k),
-            response_synthesizer=get_response_synthesizer(llm=self.llm),
-        )
-        refined_query = (
-            "Based on these documents: "
-            f"{top_reranked_texts}, please refine the search for the question: {question}."
+        if self.async_qdrant_client is not None:
+            if not await self.async_qdrant_client.collection_exists(collection_id):
+                return None
+            # Konstruktor QdrantVectorStore melakukan I/O sync, jadi dibuat di thread
+            vector_store = await asyncio.to_thread(self._new_vector_store, collection_id)
+        else:
+            vector_store = await asyncio.to_thread(self._build_vector_store, collection_id)
+
+        if vector_store is not None:
+            self.handle_cache.set(collection_id, vector_store)
+        return vector_store
+
+    def _build_vector_store(self, collection_id: str) -> Optional[QdrantVectorStore]:
+        if not self.qdrant_client.collection_exists(collection_id):
+            return None
+        return self._new_vector_store(collection_id)
+
+    def _new_vector_store(self, collection_id: str) -> QdrantVectorStore:
+        # Handle dipakai jalur sync dan async, jadi keduanya mendapat client
+        return QdrantVectorStore(
+            client=self.qdrant_client,
+            aclient=self.async_qdrant_client,
+            collection_name=collection_id,
         )
-        self.logger.info("Generating response.")
-        return query_engine.query(refined_query)
\ No newline at end of file
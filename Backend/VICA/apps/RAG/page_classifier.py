@@ -0,0 +1,143 @@
+import logging
+from dataclasses import dataclass
+from typing import List, Optional
+
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import (
+    LAParams,
+    LTChar,
+    LTCurve,
+    LTFigure,
+    LTImage,
+    LTLayoutContainer,
+    LTTextContainer,
+)
+
+log = logging.getLogger(__name__)
+
+####################
+# PageLayout
+####################
+
+@dataclass
+class PageLayout:
+    page_number: int
+    text: str
+    text_chars: int
+    image_ratio: float
+    figure_ratio: float
+    vector_objects: int
+    needs_vision: bool
+    reason: str
+
+
+####################
+# PageClassifier
+####################
+
+class PageClassifier:
+    """Tentukan halaman mana yang cukup dibaca dari text layer dan mana yang butuh vision model."""
+
+    def __init__(
+        self,
+        min_text_chars: int = 100,
+        max_image_ratio: float = 0.5,
+        max_figure_ratio: float = 0.2,
+        max_vector_objects: int = 50,
+    ) -> None:
+        self.min_text_chars = min_text_chars
+        self.max_image_ratio = max_image_ratio
+        self.max_figure_ratio = max_figure_ratio
+        self.max_vector_objects = max_vector_objects
+
+    def classify(self, pdf_path: str) -> List[PageLayout]:
+        layouts = []
+        for page_number, page in enumerate(
+            extract_pages(pdf_path, laparams=LAParams()), start=1
+        ):
+            layouts.append(self._classify_page(page_number, page))
+        return layouts
+
+    def _classify_page(self, page_number: int, page: LTLayoutContainer) -> PageLayout:
+        page_area = max(page.width * page.height, 1.0)
+        texts = []
+        image_area = 0.0
+        figure_area = 0.0
+
+        for element in page:
+            if isinstance(element, LTTextContainer):
+                texts.append(element.get_text())
+            elif isinstance(element, LTImage):
+                image_area += _area(element)
+            elif isinstance(element, LTFigure):
+                # Figure yang hanya membungkus gambar dihitung sebagai gambar
+                if _contains_image(element):
+                    image_area += _area(element)
+                else:
+                    figure_area += _area(element)
+                texts.extend(_figure_text(element))
+
+        text = "".join(texts).strip()
+        text_chars = len("".join(text.split()))
+        image_ratio = min(image_area / page_area, 1.0)
+        figure_ratio = min(figure_area / page_area, 1.0)
+        vector_objects = _count_vector_objects(page)
+
+        reason = self._vision_reason(text_chars, image_ratio, figure_ratio, vector_objects)
+        return PageLayout(
+            page_number=page_number,
+            text=text,
+            text_chars=text_chars,
+            image_ratio=image_ratio,
+            figure_ratio=figure_ratio,
+            vector_objects=vector_objects,
+            needs_vision=reason is not None,
+            reason=reason or "text_layer",
+        )
+
+    def _vision_reason(
+        self, text_chars: int, image_ratio: float, figure_ratio: float, vector_objects: int
+    ) -> Optional[str]:
+        if text_chars < self.min_text_chars:
+            return "no_text"
+        if image_ratio >= self.max_image_ratio:
+            return "mostly_image"
+        if figure_ratio >= self.max_figure_ratio:
+            return "figures"
+        if vector_objects >= self.max_vector_objects:
+            return "tables_or_charts"
+        return None
+
+
+def _area(element) -> float:
+    return max(element.width, 0.0) * max(element.height, 0.0)
+
+
+def _contains_image(figure: LTFigure) -> bool:
+    for child in figure:
+        if isinstance(child, LTImage):
+            return True
+        if isinstance(child, LTFigure) and _contains_image(child):
+            return True
+    return False
+
+
+def _figure_text(figure: LTFigure) -> List[str]:
+    texts = []
+    for child in figure:
+        if isinstance(child, (LTTextContainer, LTChar)):
+            texts.append(child.get_text())
+        elif isinstance(child, LTFigure):
+            texts.extend(_figure_text(child))
+    return texts
+
+
+def _count_vector_objects(container) -> int:
+    # LTRect dan LTLine adalah turunan LTCurve: garis tabel, batang chart, dll.
+    count = 0
+    for element in container:
+        if isinstance(element, LTCurve):
+            count += 1
+        elif isinstance(element, LTFigure):
+            count += _count_vector_objects(element)
+    return count
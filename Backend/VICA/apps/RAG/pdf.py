@@ -1,79 +1,331 @@
+import asyncio
+import logging
 from groq import Groq
-from pdf2image import convert_from_bytes
 import base64
+from typing import Dict, List, Optional, Tuple
 from fastapi import UploadFile
-from io import BytesIO
 from PIL import Image
 
+from Backend.VICA.apps.RAG.cache import PersistentLRUCache
+from Backend.VICA.apps.RAG.describer import (
+    DescriptionReport,
+    PageDescriber,
+    PageDescription,
+    parse_batch_descriptions,
+)
+from Backend.VICA.apps.RAG.page_classifier import PageClassifier
+from Backend.VICA.apps.RAG.rasterizer import PDFRasterizer
+from Backend.VICA.apps.RAG.workers import CPUWorkerPool, run_cpu_bound
+from Backend.VICA.apps.RAG.upload_source import UploadSource
+from Backend.VICA.apps.RAG.image_prep import (
+    PREPARED_MIME_TYPE,
+    ImagePrepStats,
+    VisionImagePreparer,
+)
+from Backend.VICA.config import (
+    VISION_MODEL_NAME,
+    PDF_DESCRIBE_CONCURRENCY,
+    PDF_DESCRIBE_TIMEOUT,
+    PDF_DESCRIBE_RETRIES,
+    PDF_RASTER_DPI,
+    PDF_RASTER_WINDOW,
+    PDF_RASTER_MAX_JOB_MEMORY,
+    PDF_TEXT_LAYER_ENABLED,
+    PDF_TEXT_MIN_CHARS,
+    PDF_MAX_IMAGE_RATIO,
+    PDF_MAX_FIGURE_RATIO,
+    PDF_MAX_VECTOR_OBJECTS,
+    VISION_MAX_IMAGE_SIDE,
+    VISION_MAX_PAYLOAD_BYTES,
+    VISION_JPEG_MIN_QUALITY,
+    VISION_JPEG_MAX_QUALITY,
+    VISION_GRAYSCALE_SATURATION,
+    VISION_BATCH_MAX_IMAGES,
+    VISION_BATCH_MAX_BYTES,
+    VISION_BATCH_MAX_TOKENS,
+)
+
+log = logging.getLogger(__name__)
+
+DESCRIBE_IMAGE_PROMPT = """
+                                This image may contain visual data like tables, charts, or graphs, as well as textual descriptions. Please follow these steps:
+                                1. **Analyze** the visual data for any significant trends, patterns, or key takeaways.
+                                2. **Summarize** important insights, such as how the data changes over time or across categories. Note any spikes, drops, or shifts in the data.
+                                3. Identify **anomalies**, **outliers**, or unusual data points and mention their potential significance.
+                                4. **Ignore** irrelevant elements (e.g., images of people) unless they directly contribute to understanding the data.
+                                5. Focus on **describing the data** in terms of key trends and insights, rather than just explaining what is visible.
+                                6. Provide a **comprehensive overview** that includes an analysis of both the visual content and the article’s text (if applicable).
+                                7. Only provide answers based on available information.
+                                8. Do not explicitly provide the answer step by step.
+                            """
+
+BATCH_DESCRIBE_PROMPT = """
+You will receive {count} images, numbered 1 to {count} in the order they are attached.
+Describe EACH image separately, following these instructions for every image:
+{instructions}
+Format your answer exactly like this, with one section per image and nothing before the first section:
+### Image 1
+<description of image 1>
+### Image 2
+<description of image 2>
+...
+### Image {count}
+<description of image {count}>
+"""
+
+# Prompt yang menjadi bagian key cache deskripsi, per jenis request
+SINGLE_PROMPTS = (DESCRIBE_IMAGE_PROMPT,)
+BATCH_PROMPTS = (BATCH_DESCRIBE_PROMPT, DESCRIBE_IMAGE_PROMPT)
 
 class PDFService:
-    def __init__(self, groq: Groq) -> None:
+    def __init__(
+        self,
+        groq: Groq,
+        describer: Optional[PageDescriber] = None,
+        cache: Optional[PersistentLRUCache] = None,
+        rasterizer: Optional[PDFRasterizer] = None,
+        classifier: Optional[PageClassifier] = None,
+        cpu_pool: Optional[CPUWorkerPool] = None,
+        preparer: Optional[VisionImagePreparer] = None,
+    ) -> None:
         self._client = groq
         self._client.base_url = "https://api.groq.com/"
-        
+        self.cache = cache
+        self.cpu_pool = cpu_pool
+        self.preparer = preparer or VisionImagePreparer(
+            max_side=VISION_MAX_IMAGE_SIDE,
+            max_payload_bytes=VISION_MAX_PAYLOAD_BYTES,
+            min_quality=VISION_JPEG_MIN_QUALITY,
+            max_quality=VISION_JPEG_MAX_QUALITY,
+            grayscale_saturation=VISION_GRAYSCALE_SATURATION,
+            max_dpi=PDF_RASTER_DPI,
+        )
+        self.describer = describer or PageDescriber(
+            self._request_description,
+            concurrency=PDF_DESCRIBE_CONCURRENCY,
+            timeout=PDF_DESCRIBE_TIMEOUT,
+            retries=PDF_DESCRIBE_RETRIES,
+            batch_fn=self._request_descriptions,
+            batch_size=VISION_BATCH_MAX_IMAGES,
+            batch_max_bytes=VISION_BATCH_MAX_BYTES,
+        )
+        self.rasterizer = rasterizer or PDFRasterizer(
+            dpi=PDF_RASTER_DPI,
+            window_size=PDF_RASTER_WINDOW,
+            max_job_memory=PDF_RASTER_MAX_JOB_MEMORY,
+            cpu_pool=cpu_pool,
+            preparer=self.preparer,
+            in_flight_pages=self.describer.max_in_flight_pages,
+        )
+        if classifier is None and PDF_TEXT_LAYER_ENABLED:
+            classifier = PageClassifier(
+                min_text_chars=PDF_TEXT_MIN_CHARS,
+                max_image_ratio=PDF_MAX_IMAGE_RATIO,
+                max_figure_ratio=PDF_MAX_FIGURE_RATIO,
+                max_vector_objects=PDF_MAX_VECTOR_OBJECTS,
+            )
+        self.classifier = classifier
 
     async def describe_pdf(self, file: UploadFile) -> str:
+        report = await self.describe_pdf_pages(file)
+        return report.text
+
+    async def describe_pdf_pages(self, file: UploadFile) -> DescriptionReport:
         if file.content_type != "application/pdf":
             raise ValueError("File must be a PDF.")
 
-        print(self._client.base_url)
+        with await UploadSource.from_upload(file) as source:
+            return await self.describe_source(source)
+
+    async def describe_source(self, source: UploadSource) -> DescriptionReport:
+        # Rasterizer dan classifier sama-sama membaca dari path; file kecil ditulis sekali
+        with source.as_path() as pdf_path:
+            text_pages, vision_page_numbers = await self._split_text_layer_pages(pdf_path)
+
+            report = DescriptionReport(text_pages)
+            stats = ImagePrepStats()
+            if vision_page_numbers is None or vision_page_numbers:
+                vision_report = await self.describer.describe(
+                    self.rasterizer.iter_pages(pdf_path, vision_page_numbers, stats)
+                )
+                report.pages.extend(vision_report.pages)
+        report.pages.sort(key=lambda page: page.page_number)
+        report.image_stats = stats.to_dict()
+
+        log.info(
+            f"Described '{source.filename}': {report.vision_pages} pages via vision model, "
+            f"{report.text_layer_pages} pages from text layer, "
+            f"{stats.prepared_bytes} bytes of image payload"
+        )
+        return report
 
-        pdf_data = await file.read()
-        pil_images = convert_from_bytes(pdf_data)
-        base64_images = [self._convert_image_to_base64(image) for image in pil_images]
+    async def _split_text_layer_pages(self, pdf_path: str):
+        """Kembalikan halaman yang dibaca dari text layer dan nomor halaman untuk vision model."""
+        if self.classifier is None:
+            return [], None
 
-        descriptions = [
-            self._describe_image(base64_image, page_number=i + 1)
-            for i, base64_image in enumerate(base64_images)
+        try:
+            layouts = await run_cpu_bound(self.cpu_pool, self.classifier.classify, pdf_path)
+        except Exception as e:
+            log.warning(f"Text layer classification failed, sending all pages to vision: {e}")
+            return [], None
+
+        text_pages = [
+            PageDescription(
+                page_number=layout.page_number,
+                description=layout.text,
+                source="text_layer",
+            )
+            for layout in layouts
+            if not layout.needs_vision
         ]
+        vision_page_numbers = [layout.page_number for layout in layouts if layout.needs_vision]
+        return text_pages, vision_page_numbers
 
-        return "\n".join(descriptions)
+    async def prepare_image_bytes(
+        self, data: bytes, stats: Optional[ImagePrepStats] = None
+    ) -> str:
+        """Perkecil/kompres ulang gambar upload atau hasil ekstraksi sebelum dideskripsikan."""
+        prepared = await run_cpu_bound(self.cpu_pool, self.preparer.prepare_bytes, data)
+        if stats is not None:
+            stats.add(prepared)
+        return prepared.base64
 
     def _convert_image_to_base64(self, pil_image: Image.Image) -> str:
-        buffered = BytesIO()
-        pil_image.save(buffered, format="JPEG")
-        return base64.b64encode(buffered.getvalue()).decode("utf-8")
+        return self.preparer.prepare_image(pil_image).base64
 
     async def _describe_image(self, base64_image: str, page_number: int) -> str:
+        # Kegagalan diteruskan ke pemanggil agar pesan error tidak ikut di-embed
         try:
-            messages = [
+            image_description = await self._request_description(base64_image)
+        except Exception as e:
+            log.warning(f"Failed to describe image on page {page_number}: {e}")
+            raise
+        return f"Page {page_number} description:\n{image_description}\n"
+
+    async def _request_descriptions(self, base64_images: List[str]) -> List[Optional[str]]:
+        """Deskripsikan beberapa gambar dalam satu request; None untuk gambar yang gagal diparse."""
+        # Deskripsi dari prompt tunggal juga dipakai; hasil batch disimpan dengan key sendiri
+        descriptions = await asyncio.to_thread(self._cache_get_many, base64_images)
+        missing = [i for i, description in enumerate(descriptions) if description is None]
+        if not missing:
+            return descriptions
+        if len(missing) == 1:
+            descriptions[missing[0]] = await self._request_description(base64_images[missing[0]])
+            return descriptions
+
+        prompt = BATCH_DESCRIBE_PROMPT.format(
+            count=len(missing), instructions=DESCRIBE_IMAGE_PROMPT
+        )
+        content = [{"type": "text", "text": prompt}] + [
+            {
+                "type": "image_url",
+                "image_url": {"url": f"data:{PREPARED_MIME_TYPE};base64,{base64_images[i]}"},
+            }
+            for i in missing
+        ]
+        completion = await asyncio.to_thread(
+            self._client.chat.completions.create,
+            model=VISION_MODEL_NAME,
+            messages=[{"role": "user", "content": content}],
+            temperature=1,
+            max_tokens=min(VISION_BATCH_MAX_TOKENS, 1024 * len(missing)),
+            top_p=1,
+            stream=False,
+        )
+
+        parsed = parse_batch_descriptions(completion.choices[0].message.content, len(missing))
+        described = {}
+        for i, description in zip(missing, parsed):
+            if description is not None:
+                descriptions[i] = description
+                described[base64_images[i]] = description
+        await asyncio.to_thread(self._cache_set_many, described, BATCH_PROMPTS)
+
+        log.info(
+            f"Batch vision request described {sum(d is not None for d in parsed)} of {len(missing)} images"
+        )
+        return descriptions
+
+    def _cache_key(self, base64_image: str, prompts: Tuple[str, ...] = SINGLE_PROMPTS) -> str:
+        # Key memuat prompt yang benar-benar dikirim agar hasil batch tidak tercampur hasil tunggal
+        return PersistentLRUCache.make_key(
+            VISION_MODEL_NAME, *prompts, base64.b64decode(base64_image)
+        )
+
+    def _cache_get(
+        self, base64_image: str, prompts: Tuple[str, ...] = SINGLE_PROMPTS
+    ) -> Optional[str]:
+        if self.cache is None:
+            return None
+        cached = self.cache.get(self._cache_key(base64_image, prompts))
+        return cached.decode("utf-8") if cached is not None else None
+
+    def _cache_set(
+        self, base64_image: str, description: str, prompts: Tuple[str, ...] = SINGLE_PROMPTS
+    ) -> None:
+        self._cache_set_many({base64_image: description}, prompts)
+
+    def _cache_get_many(self, base64_images: List[str]) -> List[Optional[str]]:
+        """Cari deskripsi dari prompt tunggal maupun batch untuk semua gambar sekaligus."""
+        if self.cache is None:
+            return [None] * len(base64_images)
+        keys = [
+            (self._cache_key(base64_image), self._cache_key(base64_image, BATCH_PROMPTS))
+            for base64_image in base64_images
+        ]
+        found = self.cache.get_many([key for pair in keys for key in pair])
+        descriptions = []
+        for single_key, batch_key in keys:
+            cached = found.get(single_key) or found.get(batch_key)
+            descriptions.append(cached.decode("utf-8") if cached is not None else None)
+        return descriptions
+
+    def _cache_set_many(
+        self, descriptions: Dict[str, str], prompts: Tuple[str, ...] = SINGLE_PROMPTS
+    ) -> None:
+        if self.cache is not None and descriptions:
+            self.cache.set_many(
                 {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": """
-                                This image may contain visual data like tables, charts, or graphs, as well as textual descriptions. Please follow these steps:
-                                1. **Analyze** the visual data for any significant trends, patterns, or key takeaways.
-                                2. **Summarize** important insights, such as how the data changes over time or across categories. Note any spikes, drops, or shifts in the data.
-                                3. Identify **anomalies**, **outliers**, or unusual data points and mention their potential significance.
-                                4. **Ignore** irrelevant elements (e.g., images of people) unless they directly contribute to understanding the data.
-                                5. Focus on **describing the data** in terms of key trends and insights, rather than just explaining what is visible.
-                                6. Provide a **comprehensive overview** that includes an analysis of both the visual content and the article’s text (if applicable).
-                                7. Only provide answers based on available information.
-                                8. Do not explicitly provide the answer step by step.
-                            """,
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                        },
-                    ],
+                    self._cache_key(base64_image, prompts): description.encode("utf-8")
+                    for base64_image, description in descriptions.items()
                 }
-            ]
-            
-            completion = self._client.chat.completions.create(
-                model="llama-3.2-90b-vision-preview",
-                messages=messages,
-                temperature=1,
-                max_tokens=1024,
-                top_p=1,
-                stream=False,
             )
 
-            image_description = completion.choices[0].message.content
-            return f"Page {page_number} description:\n{image_description}\n"
+    async def _request_description(self, base64_image: str) -> str:
+        # Key cache menghash seluruh gambar dan SQLite bersifat sinkron: jalankan di thread
+        cached = await asyncio.to_thread(self._cache_get, base64_image)
+        if cached is not None:
+            return cached
 
-        except Exception as e:
-            print(f"Error while describing image: {e}")
-            return f"Error while describing image: {e}"
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": DESCRIBE_IMAGE_PROMPT,
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:{PREPARED_MIME_TYPE};base64,{base64_image}"},
+                    },
+                ],
+            }
+        ]
+
+        # Groq client bersifat sinkron, jalankan di thread agar event loop tidak terblokir
+        completion = await asyncio.to_thread(
+            self._client.chat.completions.create,
+            model=VISION_MODEL_NAME,
+            messages=messages,
+            temperature=1,
+            max_tokens=1024,
+            top_p=1,
+            stream=False,
+        )
+
+        description = completion.choices[0].message.content
+        await asyncio.to_thread(self._cache_set, base64_image, description)
+
+        return description
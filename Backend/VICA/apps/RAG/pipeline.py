@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from contextlib import suppress
+from typing import AsyncIterator, List, TypeVar
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DONE = object()
+
+####################
+# Streaming pipeline helpers
+####################
+
+async def buffered(source: AsyncIterator[T], maxsize: int = 8) -> AsyncIterator[T]:
+    """Jalankan `source` di task sendiri dengan antrian terbatas.
+
+    Tahap sebelumnya terus berjalan selama antrian belum penuh, sehingga
+    tahap-tahap yang terikat jaringan saling tumpang tindih.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, maxsize))
+
+    async def produce() -> None:
+        try:
+            async for item in source:
+                await queue.put((item, None))
+            await queue.put((_DONE, None))
+        except Exception as e:
+            await queue.put((_DONE, e))
+        finally:
+            if hasattr(source, "aclose"):
+                await source.aclose()
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        producer.cancel()
+        with suppress(asyncio.CancelledError):
+            await producer
+
+
+async def batched(source: AsyncIterator[T], size: int) -> AsyncIterator[List[T]]:
+    batch: List[T] = []
+    async for item in source:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
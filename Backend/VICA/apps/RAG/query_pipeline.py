@@ -0,0 +1,272 @@
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from llama_index.core import get_response_synthesizer
+from llama_index.core.base.response.schema import Response
+from llama_index.core.prompts.default_prompts import DEFAULT_TEXT_QA_PROMPT
+from llama_index.core.schema import MetadataMode, NodeWithScore
+from llama_index.core.vector_stores.types import BasePydanticVectorStore, VectorStoreQuery
+
+from Backend.VICA.apps.RAG.bm25 import BM25Index
+from Backend.VICA.apps.RAG.embedding import EmbeddingService
+from Backend.VICA.apps.RAG.rerankers import Reranker, ranking_agreement, reciprocal_rank_fusion
+
+log = logging.getLogger(__name__)
+
+# Jawaban synthesizer llama_index bila tidak ada node yang relevan
+EMPTY_RESPONSE = "Empty Response"
+
+
+@dataclass
+class RetrievalResult:
+    nodes: List[NodeWithScore]
+    # Durasi tiap tahap dalam detik (embed, search, sparse, rerank)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class _Candidates:
+    nodes: List[NodeWithScore]
+    # Kesepakatan dense vs sparse (0-1); dipakai reranker untuk melewati rerank remote
+    confidence: float = 0.0
+
+
+def source_to_dict(node: NodeWithScore, preview_chars: int = 300) -> dict:
+    text = node.node.get_content()
+    return {
+        "id": node.node.node_id,
+        "score": node.score,
+        "filename": node.node.metadata.get("filename"),
+        "file_id": node.node.metadata.get("file_id"),
+        "text": text[:preview_chars],
+    }
+
+
+####################
+# QueryPipeline
+####################
+
+class QueryPipeline:
+    """Embed pertanyaan sekali -> vector search (+ BM25, digabung RRF) -> rerank -> synthesize.
+
+    Node hasil rerank langsung diteruskan ke response synthesizer, tanpa
+    query kedua ke vector store. `aquery` menjalankan tahap yang sama secara
+    async (vector store perlu `aclient`).
+    """
+
+    def __init__(
+        self,
+        llm,
+        embedding_service: EmbeddingService,
+        reranker: Optional[Reranker] = None,
+        retrieve_top_k: int = 10,
+        rerank_top_n: int = 3,
+        sparse_index: Optional[BM25Index] = None,
+        rrf_k: int = 60,
+    ) -> None:
+        self.embedding_service = embedding_service
+        self.reranker = reranker or Reranker()
+        self.retrieve_top_k = max(1, retrieve_top_k)
+        self.rerank_top_n = max(1, rerank_top_n)
+        self.sparse_index = sparse_index
+        self.rrf_k = rrf_k
+        self.llm = llm
+        self.synthesizer = get_response_synthesizer(llm=llm)
+
+    def query(
+        self,
+        vector_store: BasePydanticVectorStore,
+        question: str,
+        top_n: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> Response:
+        retrieval = self.retrieve(vector_store, question, top_n, query_embedding)
+
+        started = time.perf_counter()
+        response = self.synthesizer.synthesize(question, nodes=retrieval.nodes)
+        retrieval.timings["synthesize"] = time.perf_counter() - started
+        return self._finish(response, retrieval)
+
+    async def aquery(
+        self,
+        vector_store: BasePydanticVectorStore,
+        question: str,
+        top_n: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> Response:
+        retrieval = await self.aretrieve(vector_store, question, top_n, query_embedding)
+
+        started = time.perf_counter()
+        response = await self.synthesizer.asynthesize(question, nodes=retrieval.nodes)
+        retrieval.timings["synthesize"] = time.perf_counter() - started
+        return self._finish(response, retrieval)
+
+    async def astream(
+        self,
+        vector_store: BasePydanticVectorStore,
+        question: str,
+        top_n: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Hasilkan event (nama, data): retrieval, sources, token..., lalu done."""
+        timings: Dict[str, float] = {}
+        candidates = await self._asearch(vector_store, question, query_embedding, timings, top_n)
+        yield "retrieval", {"candidates": len(candidates.nodes), "timings": dict(timings)}
+
+        nodes = await self._arerank(question, candidates, top_n, timings)
+        yield "sources", [source_to_dict(node) for node in nodes]
+
+        started = time.perf_counter()
+        first_token = None
+        answer = []
+        if nodes:
+            context = "\n\n".join(node.node.get_content(metadata_mode=MetadataMode.LLM) for node in nodes)
+            prompt = DEFAULT_TEXT_QA_PROMPT.format(context_str=context, query_str=question)
+            async for chunk in await self.llm.astream_complete(prompt):
+                if not chunk.delta:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                answer.append(chunk.delta)
+                yield "token", chunk.delta
+        else:
+            # Sama dengan perilaku synthesizer bila tidak ada node
+            answer.append(EMPTY_RESPONSE)
+            yield "token", answer[0]
+        timings["synthesize"] = time.perf_counter() - started
+        if first_token is not None:
+            timings["first_token"] = first_token
+
+        yield "done", {"response": "".join(answer), "route": "vector", "timings": timings}
+
+    def retrieve(
+        self,
+        vector_store: BasePydanticVectorStore,
+        question: str,
+        top_n: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> RetrievalResult:
+        timings: Dict[str, float] = {}
+
+        if query_embedding is None:
+            started = time.perf_counter()
+            query_embedding = self.embedding_service.embed_query(question)
+            timings["embed"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        dense = self._dense_candidates(vector_store.query(self._vector_query(query_embedding)))
+        timings["search"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        sparse = self._sparse_search(vector_store, question)
+        timings["sparse"] = time.perf_counter() - started
+        candidates = self._fuse(dense, sparse, top_n)
+
+        if not candidates.nodes:
+            log.warning("No relevant texts found.")
+            return RetrievalResult([], timings)
+
+        started = time.perf_counter()
+        nodes = self.reranker.rerank(
+            question, candidates.nodes, top_n or self.rerank_top_n, candidates.confidence
+        )
+        timings["rerank"] = time.perf_counter() - started
+        return RetrievalResult(nodes, timings)
+
+    async def aretrieve(
+        self,
+        vector_store: BasePydanticVectorStore,
+        question: str,
+        top_n: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> RetrievalResult:
+        timings: Dict[str, float] = {}
+        candidates = await self._asearch(vector_store, question, query_embedding, timings, top_n)
+        nodes = await self._arerank(question, candidates, top_n, timings)
+        return RetrievalResult(nodes, timings)
+
+    async def _asearch(
+        self,
+        vector_store: BasePydanticVectorStore,
+        question: str,
+        query_embedding: Optional[List[float]],
+        timings: Dict[str, float],
+        top_n: Optional[int] = None,
+    ) -> _Candidates:
+        if query_embedding is None:
+            started = time.perf_counter()
+            query_embedding = await self.embedding_service.aembed_query(question)
+            timings["embed"] = time.perf_counter() - started
+
+        # Dense (Qdrant) dan sparse (BM25 lokal) berjalan bersamaan
+        started = time.perf_counter()
+        result, sparse = await asyncio.gather(
+            vector_store.aquery(self._vector_query(query_embedding)),
+            asyncio.to_thread(self._sparse_search, vector_store, question),
+        )
+        timings["search"] = time.perf_counter() - started
+        return self._fuse(self._dense_candidates(result), sparse, top_n)
+
+    async def _arerank(
+        self,
+        question: str,
+        candidates: _Candidates,
+        top_n: Optional[int],
+        timings: Dict[str, float],
+    ) -> List[NodeWithScore]:
+        if not candidates.nodes:
+            log.warning("No relevant texts found.")
+            return []
+
+        started = time.perf_counter()
+        nodes = await self.reranker.arerank(
+            question, candidates.nodes, top_n or self.rerank_top_n, candidates.confidence
+        )
+        timings["rerank"] = time.perf_counter() - started
+        return nodes
+
+    def _sparse_search(self, vector_store: BasePydanticVectorStore, question: str) -> List[NodeWithScore]:
+        if self.sparse_index is None:
+            return []
+        try:
+            return self.sparse_index.search(vector_store.collection_name, question, self.retrieve_top_k)
+        except Exception as e:
+            # Index BM25 hanya pelengkap; tanpa itu retrieval tetap dense saja
+            log.warning(f"BM25 search failed, using dense results only: {e}")
+            return []
+
+    def _fuse(
+        self, dense: List[NodeWithScore], sparse: List[NodeWithScore], top_n: Optional[int] = None
+    ) -> _Candidates:
+        if not sparse:
+            return _Candidates(dense)
+        fused = reciprocal_rank_fusion([dense, sparse], k=self.rrf_k)[: self.retrieve_top_k]
+        confidence = ranking_agreement(dense, sparse, top_n or self.rerank_top_n)
+        return _Candidates(fused, confidence)
+
+    def _vector_query(self, query_embedding: List[float]) -> VectorStoreQuery:
+        return VectorStoreQuery(query_embedding=query_embedding, similarity_top_k=self.retrieve_top_k)
+
+    @staticmethod
+    def _dense_candidates(result) -> List[NodeWithScore]:
+        similarities = result.similarities or [None] * len(result.nodes or [])
+        return [
+            NodeWithScore(node=node, score=score)
+            for node, score in zip(result.nodes or [], similarities)
+        ]
+
+    @staticmethod
+    def _finish(response: Response, retrieval: RetrievalResult) -> Response:
+        response.metadata = {
+            **(response.metadata or {}),
+            "route": "vector",
+            "timings": retrieval.timings,
+        }
+        log.info(
+            "Query pipeline: "
+            + ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in retrieval.timings.items())
+        )
+        return response
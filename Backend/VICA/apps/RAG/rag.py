@@ -1,25 +1,36 @@
 import os
 import sys
-from typing import List
+import asyncio
+from typing import List, Optional
 import uuid
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import VectorParams
-from llama_index.core import (
-    VectorStoreIndex,
-    Settings,
-    StorageContext,
-    get_response_synthesizer,
-)
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.models import PayloadSchemaType, VectorParams
+from llama_index.core import Settings
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core.retrievers import VectorIndexRetriever
 from llama_index.vector_stores.qdrant import QdrantVectorStore
-from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.schema import Document
 from llama_index.core.base.response.schema import Response
 from fastapi import UploadFile
 
 from Backend.VICA.apps.RAG.pdf import PDFService
-from Backend.VICA.config import QDRANT_URL, QDRANT_API_KEY
+from Backend.VICA.apps.RAG.embedding import EmbeddingService
+from Backend.VICA.apps.RAG.vector_writer import QdrantBulkWriter
+from Backend.VICA.apps.RAG.query_pipeline import QueryPipeline
+from Backend.VICA.apps.RAG.rerankers import build_reranker
+from Backend.VICA.apps.RAG.bm25 import BM25Index
+from Backend.VICA.apps.RAG.cache import TTLCache
+from Backend.VICA.config import (
+    QDRANT_URL,
+    QDRANT_API_KEY,
+    RAG_RETRIEVE_TOP_K,
+    RAG_RERANK_TOP_N,
+    RAG_RERANK_MODEL,
+    RAG_RERANKER,
+    RAG_FUSION_CONFIDENCE,
+    RAG_RRF_K,
+    RAG_HANDLE_CACHE_SIZE,
+    RAG_HANDLE_CACHE_TTL,
+)
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from VICA.apps.VICA.models.user import Users
@@ -33,13 +44,39 @@ class RAGService:
         embed_model,
         rerank_service,
         pdf_service: PDFService,
+        embedding_service: Optional[EmbeddingService] = None,
+        vector_writer: Optional[QdrantBulkWriter] = None,
+        qdrant_client: Optional[QdrantClient] = None,
+        handle_cache: Optional[TTLCache] = None,
+        sparse_index: Optional[BM25Index] = None,
+        async_qdrant_client: Optional[AsyncQdrantClient] = None,
     ) -> None:
         self.llm = llm
         self.embed_model = embed_model
         self.rerank_service = rerank_service
         self.pdf_service = pdf_service
-        self.embedding_size = self._get_embedding_size()
-        self.qdrant_client = self._get_qdrant_client()
+        self.embedding_service = embedding_service or EmbeddingService(embed_model)
+        self.qdrant_client = qdrant_client or self._get_qdrant_client()
+        self.async_qdrant_client = async_qdrant_client
+        self.vector_writer = vector_writer or QdrantBulkWriter(self.qdrant_client)
+        self.handle_cache = handle_cache or TTLCache(
+            RAG_HANDLE_CACHE_SIZE, RAG_HANDLE_CACHE_TTL, name="vector_store_handles"
+        )
+        self.query_pipeline = QueryPipeline(
+            llm,
+            self.embedding_service,
+            build_reranker(
+                RAG_RERANKER,
+                rerank_service,
+                model=RAG_RERANK_MODEL,
+                min_confidence=RAG_FUSION_CONFIDENCE,
+            ),
+            retrieve_top_k=RAG_RETRIEVE_TOP_K,
+            rerank_top_n=RAG_RERANK_TOP_N,
+            sparse_index=sparse_index,
+            rrf_k=RAG_RRF_K,
+        )
+        self.sparse_index = sparse_index
 
     async def create_knowledge_base(
         self, user_id: str, chat_id: str, file: UploadFile
@@ -59,34 +96,35 @@ class RAGService:
                 ),
             )
 
-            vector_store = QdrantVectorStore(
-                client=self.qdrant_client, collection_name=collection_id
+            self.qdrant_client.create_payload_index(
+                collection_name=collection_id,
+                field_name="file_id",
+                field_schema=PayloadSchemaType.KEYWORD,
             )
-            storage_context = StorageContext.from_defaults(vector_store=vector_store)
 
+            file_id = str(uuid.uuid4())
             nodes = Settings.node_parser.get_nodes_from_documents(documents)
-            storage_context.docstore.add_documents(nodes)
+            for node in nodes:
+                node.metadata["file_id"] = file_id
 
-            VectorStoreIndex(
-                nodes=nodes, storage_context=storage_context, show_progress=True
-            )
+            await self.embedding_service.aembed_nodes(nodes)
+            await self.vector_writer.write(collection_id, nodes, file_id)
+            if self.sparse_index is not None:
+                await asyncio.to_thread(self.sparse_index.add_nodes, collection_id, file_id, nodes)
+            self.handle_cache.delete(collection_id)
 
     def execute_query(
-        self, user_id: str, chat_id: str, question: str, top_k: int = 3
+        self, user_id: str, chat_id: str, question: str, top_k: int = RAG_RERANK_TOP_N
     ) -> Response:
         collection_id = self._get_chat_collection_id(user_id, chat_id)
-        if self.qdrant_client.collection_exists(collection_id):
-            vector_index = self._get_vector_index(collection_id)
-
-            top_reranked_texts = self._retrieve_top_texts(vector_index, question)
-            return self._synthesize_answer(
-                vector_index, top_reranked_texts, question, top_k
-            )
-        else:
+        vector_store = self._get_vector_store(collection_id)
+        if vector_store is None:
             raise ValueError(f"No knowledge base found for chat_id '{chat_id}'.")
+        return self.query_pipeline.query(vector_store, question, top_k)
 
-    def _get_embedding_size(self) -> int:
-        return len(self.embed_model.get_query_embedding("sample"))
+    @property
+    def embedding_size(self) -> int:
+        return self.embedding_service.dimension()
 
     def _get_qdrant_client(self) -> QdrantClient:
         return QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
@@ -112,45 +150,17 @@ class RAGService:
 
         return [Document(text=text) for text in splitter.split_text(descriptions)]
 
-    def _get_vector_index(self, collection_id: uuid) -> VectorStoreIndex:
-        vector_store = QdrantVectorStore(
-            client=self.qdrant_client, collection_name=collection_id
+    def _get_vector_store(self, collection_id: str) -> Optional[QdrantVectorStore]:
+        return self.handle_cache.get_or_create(
+            collection_id, lambda: self._build_vector_store(collection_id)
         )
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
 
-        return VectorStoreIndex.from_vector_store(
-            vector_store=vector_store, storage_context=storage_context
+    def _build_vector_store(self, collection_id: str) -> Optional[QdrantVectorStore]:
+        if not self.qdrant_client.collection_exists(collection_id):
+            return None
+        # Cache handle dibagi dengan MultiModalRAGService yang memakai aquery, jadi aclient ikut diisi
+        return QdrantVectorStore(
+            client=self.qdrant_client,
+            aclient=self.async_qdrant_client,
+            collection_name=collection_id,
         )
-
-    def _retrieve_top_texts(
-        self, vector_index: VectorStoreIndex, question: str
-    ) -> List[str]:
-        retriever = VectorIndexRetriever(index=vector_index, similarity_top_k=10)
-        relevant_texts = [doc.text for doc in retriever.retrieve(question)]
-
-        if not relevant_texts:
-            return []
-
-        reranked_results = self.rerank_service.rerank(
-            model="rerank-english-v3.0", query=question, documents=relevant_texts
-        )
-
-        return [relevant_texts[result.index] for result in reranked_results.results[:3]]
-
-    def _synthesize_answer(
-        self,
-        vector_index: VectorStoreIndex,
-        top_reranked_texts: List[str],
-        question: str,
-        top_k: int,
-    ) -> Response:
-        query_engine = RetrieverQueryEngine(
-            retriever=VectorIndexRetriever(index=vector_index, similarity_top_k=top_k),
-            response_synthesizer=get_response_synthesizer(llm=self.llm),
-        )
-        refined_query = (
-            "Based on these documents: "
-            f"{top_reranked_texts}, please refine the search for the question: {question}."
-        )
-
-        return query_engine.query(refined_query)
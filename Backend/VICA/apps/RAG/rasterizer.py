@@ -0,0 +1,175 @@
+import re
+import math
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from Backend.VICA.apps.RAG.workers import CPUWorkerPool, run_cpu_bound
+from Backend.VICA.apps.RAG.image_prep import ImagePrepStats, PreparedImage, VisionImagePreparer
+
+log = logging.getLogger(__name__)
+
+# Ukuran default jika pdfinfo tidak melaporkan "Page size" (A4 dalam points)
+DEFAULT_PAGE_SIZE_PTS = (595.0, 842.0)
+
+# Kunci per halaman dari `pdfinfo -f -l`, mis. "Page    3 size"
+PAGE_SIZE_KEY = re.compile(r"Page\s+(\d+)\s+size")
+
+
+def render_window(
+    pdf_path: str, first_page: int, last_page: int, dpi: int, preparer: VisionImagePreparer
+) -> List[Tuple[int, PreparedImage]]:
+    """Render satu jendela halaman lalu langsung siapkan payload dan bebaskan bitmap-nya."""
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
+    pages = []
+    for page_number, image in enumerate(images, start=first_page):
+        pages.append((page_number, preparer.prepare_image(image)))
+        image.close()
+    images.clear()
+    return pages
+
+
+####################
+# PDFRasterizer
+####################
+
+class PDFRasterizer:
+    """Rasterisasi PDF per jendela halaman dengan batas memori per job."""
+
+    def __init__(
+        self,
+        dpi: int = 200,
+        window_size: int = 4,
+        max_job_memory: int = 256 * 1024 * 1024,
+        cpu_pool: Optional[CPUWorkerPool] = None,
+        preparer: Optional[VisionImagePreparer] = None,
+        in_flight_pages: int = 0,
+    ) -> None:
+        self.dpi = dpi
+        self.window_size = max(1, window_size)
+        self.max_job_memory = max_job_memory
+        self.cpu_pool = cpu_pool
+        self.preparer = preparer or VisionImagePreparer()
+        # Halaman yang masih dipegang describer (payload base64) ikut dihitung ke budget
+        self.in_flight_pages = max(0, in_flight_pages)
+
+    async def iter_pages(
+        self,
+        pdf_path: str,
+        page_numbers: Optional[Sequence[int]] = None,
+        stats: Optional[ImagePrepStats] = None,
+    ) -> AsyncIterator[Tuple[int, str]]:
+        # Setiap jendela hanya mengirim path ke worker, bukan isi PDF
+        info = await asyncio.to_thread(pdfinfo_from_path, pdf_path)
+        page_count = int(info["Pages"])
+
+        if page_numbers is None:
+            page_numbers = range(1, page_count + 1)
+        page_numbers = sorted(n for n in set(page_numbers) if 1 <= n <= page_count)
+        if not page_numbers:
+            return
+
+        page_sizes = await asyncio.to_thread(
+            self._page_sizes, pdf_path, page_numbers, self._parse_page_size(info.get("Page size"))
+        )
+        windows = self._plan(page_numbers, page_sizes)
+        log.info(
+            f"Rasterizing {len(page_numbers)} pages in {len(windows)} windows at "
+            f"{sorted({dpi for _, _, dpi in windows})} DPI "
+            f"(render budget {self._render_budget() // (1024 * 1024)} MB)"
+        )
+
+        for first_page, last_page, dpi in windows:
+            pages = await run_cpu_bound(
+                self.cpu_pool, render_window, pdf_path, first_page, last_page, dpi, self.preparer
+            )
+            while pages:
+                # Lepas referensi ke base64 segera setelah diserahkan ke konsumen
+                page_number, prepared = pages.pop(0)
+                if stats is not None:
+                    stats.add(prepared)
+                yield page_number, prepared.base64
+
+    def _page_sizes(
+        self, pdf_path: str, page_numbers: Sequence[int], default: Tuple[float, float]
+    ) -> Dict[int, Tuple[float, float]]:
+        # `pdfinfo` tanpa -f/-l hanya melaporkan ukuran halaman pertama
+        info = pdfinfo_from_path(pdf_path, first_page=page_numbers[0], last_page=page_numbers[-1])
+        sizes = {}
+        for key, value in info.items():
+            match = PAGE_SIZE_KEY.match(key)
+            if match:
+                sizes[int(match.group(1))] = self._parse_page_size(value, default)
+        return {page_number: sizes.get(page_number, default) for page_number in page_numbers}
+
+    def _render_budget(self) -> int:
+        reserved = self.in_flight_pages * self.preparer.max_payload_bytes
+        # Sisakan minimal seperempat budget untuk render agar job tetap berjalan
+        return max(self.max_job_memory - reserved, self.max_job_memory // 4)
+
+    def _plan(
+        self, page_numbers: Sequence[int], page_sizes: Dict[int, Tuple[float, float]]
+    ) -> List[Tuple[int, int, int]]:
+        """Jendela render (halaman pertama, terakhir, DPI); DPI ditentukan per halaman."""
+        budget = self._render_budget()
+        page_dpis = {
+            page_number: self._page_dpi(page_sizes[page_number], budget)
+            for page_number in page_numbers
+        }
+        return self._windows(page_numbers, page_sizes, page_dpis, budget)
+
+    def _page_dpi(self, page_size: Tuple[float, float], budget: int) -> int:
+        # Tidak perlu render lebih tajam dari resolusi yang dipakai vision model
+        dpi = min(self.dpi, self.preparer.target_dpi(page_size))
+        page_bytes = self._bitmap_bytes(page_size, dpi)
+
+        # Halaman ini sendiri melebihi batas: turunkan DPI-nya saja agar muat
+        if page_bytes > budget:
+            dpi = max(72, int(dpi * math.sqrt(budget / page_bytes)))
+        return dpi
+
+    def _windows(
+        self,
+        page_numbers: Sequence[int],
+        page_sizes: Dict[int, Tuple[float, float]],
+        page_dpis: Dict[int, int],
+        budget: int,
+    ) -> List[Tuple[int, int, int]]:
+        # Satu jendela = halaman berurutan dengan DPI sama, total bitmap masih di bawah budget
+        windows: List[Tuple[int, int, int]] = []
+        window_bytes = 0
+        for page_number in page_numbers:
+            dpi = page_dpis[page_number]
+            page_bytes = self._bitmap_bytes(page_sizes[page_number], dpi)
+            if windows:
+                first_page, last_page, window_dpi = windows[-1]
+                if (
+                    page_number == last_page + 1
+                    and dpi == window_dpi
+                    and last_page - first_page + 1 < self.window_size
+                    and window_bytes + page_bytes <= budget
+                ):
+                    windows[-1] = (first_page, page_number, dpi)
+                    window_bytes += page_bytes
+                    continue
+            windows.append((page_number, page_number, dpi))
+            window_bytes = page_bytes
+        return windows
+
+    @staticmethod
+    def _bitmap_bytes(page_size: Tuple[float, float], dpi: int) -> int:
+        width_pts, height_pts = page_size
+        # RGB bitmap + perkiraan buffer JPEG/base64 (~1/3 ukuran bitmap)
+        pixels = (width_pts / 72 * dpi) * (height_pts / 72 * dpi)
+        return int(pixels * 3 * 4 / 3)
+
+    @staticmethod
+    def _parse_page_size(
+        value, default: Tuple[float, float] = DEFAULT_PAGE_SIZE_PTS
+    ) -> Tuple[float, float]:
+        match = re.match(r"\s*([\d.]+)\s*x\s*([\d.]+)", value or "")
+        if not match:
+            return default
+        return float(match.group(1)), float(match.group(2))
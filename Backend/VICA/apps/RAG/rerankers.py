@@ -0,0 +1,210 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from llama_index.core.schema import NodeWithScore
+
+from Backend.VICA.apps.RAG.bm25 import STOPWORDS, tokenize
+
+log = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[NodeWithScore]], k: int = 60
+) -> List[NodeWithScore]:
+    """Gabungkan beberapa ranking dengan RRF: skor = sum(1 / (k + rank))."""
+    scores: Dict[str, float] = {}
+    nodes: Dict[str, NodeWithScore] = {}
+    for ranking in rankings:
+        for rank, candidate in enumerate(ranking, start=1):
+            node_id = candidate.node.node_id
+            scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (k + rank)
+            # Node dari ranking pertama (dense, payload Qdrant lengkap) diutamakan
+            nodes.setdefault(node_id, candidate)
+
+    return [
+        NodeWithScore(node=nodes[node_id].node, score=score)
+        for node_id, score in sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    ]
+
+
+def ranking_agreement(
+    dense: Sequence[NodeWithScore], sparse: Sequence[NodeWithScore], top_n: int
+) -> float:
+    """Porsi top-n dense yang juga ada di top-n sparse; 1.0 berarti kedua retriever sepakat."""
+    if not dense or not sparse or top_n <= 0:
+        return 0.0
+    dense_ids = {candidate.node.node_id for candidate in dense[:top_n]}
+    sparse_ids = {candidate.node.node_id for candidate in sparse[:top_n]}
+    return len(dense_ids & sparse_ids) / min(top_n, len(dense_ids))
+
+
+def _content_terms(text: str) -> List[str]:
+    return [token for token in tokenize(text) if token not in STOPWORDS]
+
+
+####################
+# Reranker
+####################
+
+class Reranker:
+    """Antarmuka reranker: urutkan ulang kandidat dan kembalikan top-n."""
+
+    name = "none"
+
+    def rerank(
+        self, question: str, candidates: List[NodeWithScore], top_n: int, confidence: float = 0.0
+    ) -> List[NodeWithScore]:
+        return candidates[:top_n]
+
+    async def arerank(
+        self, question: str, candidates: List[NodeWithScore], top_n: int, confidence: float = 0.0
+    ) -> List[NodeWithScore]:
+        return await asyncio.to_thread(self.rerank, question, candidates, top_n, confidence)
+
+
+class LexicalReranker(Reranker):
+    """Reranker lokal: cakupan term dan bigram pertanyaan di teks, ditambah urutan awal kandidat."""
+
+    name = "lexical"
+
+    def __init__(self, prior_weight: float = 0.3) -> None:
+        self.prior_weight = prior_weight
+
+    def rerank(
+        self, question: str, candidates: List[NodeWithScore], top_n: int, confidence: float = 0.0
+    ) -> List[NodeWithScore]:
+        terms = _content_terms(question)
+        if not terms:
+            return candidates[:top_n]
+        query_terms = set(terms)
+        query_bigrams = set(zip(terms, terms[1:]))
+
+        scored = []
+        for position, candidate in enumerate(candidates):
+            tokens = _content_terms(candidate.node.get_content())
+            coverage = len(query_terms.intersection(tokens)) / len(query_terms)
+            bigrams = (
+                len(query_bigrams.intersection(zip(tokens, tokens[1:]))) / len(query_bigrams)
+                if query_bigrams
+                else 0.0
+            )
+            prior = 1.0 / (1 + position)
+            score = (1 - self.prior_weight) * (0.7 * coverage + 0.3 * bigrams) + self.prior_weight * prior
+            scored.append(NodeWithScore(node=candidate.node, score=score))
+
+        scored.sort(key=lambda candidate: candidate.score, reverse=True)
+        return scored[:top_n]
+
+    async def arerank(
+        self, question: str, candidates: List[NodeWithScore], top_n: int, confidence: float = 0.0
+    ) -> List[NodeWithScore]:
+        # Cukup cepat untuk dijalankan langsung di event loop
+        return self.rerank(question, candidates, top_n, confidence)
+
+
+class CohereReranker(Reranker):
+    name = "cohere"
+
+    def __init__(self, client, async_client=None, model: str = "rerank-english-v3.0") -> None:
+        self.client = client
+        self.async_client = async_client
+        self.model = model
+
+    def rerank(
+        self, question: str, candidates: List[NodeWithScore], top_n: int, confidence: float = 0.0
+    ) -> List[NodeWithScore]:
+        if len(candidates) <= 1:
+            return candidates[:top_n]
+        response = self.client.rerank(
+            model=self.model, query=question, documents=self._documents(candidates), top_n=top_n
+        )
+        return self._results(candidates, response, top_n)
+
+    async def arerank(
+        self, question: str, candidates: List[NodeWithScore], top_n: int, confidence: float = 0.0
+    ) -> List[NodeWithScore]:
+        if self.async_client is None:
+            return await super().arerank(question, candidates, top_n, confidence)
+        if len(candidates) <= 1:
+            return candidates[:top_n]
+        response = await self.async_client.rerank(
+            model=self.model, query=question, documents=self._documents(candidates), top_n=top_n
+        )
+        return self._results(candidates, response, top_n)
+
+    @staticmethod
+    def _documents(candidates: List[NodeWithScore]) -> List[str]:
+        return [candidate.node.get_content() for candidate in candidates]
+
+    @staticmethod
+    def _results(candidates: List[NodeWithScore], response, top_n: int) -> List[NodeWithScore]:
+        return [
+            NodeWithScore(node=candidates[result.index].node, score=result.relevance_score)
+            for result in response.results[:top_n]
+        ]
+
+
+class FallbackReranker(Reranker):
+    """Pakai reranker remote, kecuali fusion sudah yakin (agreement >= min_confidence)
+    atau panggilan remote gagal; keduanya dilayani reranker lokal."""
+
+    def __init__(
+        self, primary: Reranker, fallback: Reranker, min_confidence: Optional[float] = None
+    ) -> None:
+        self.primary = primary
+        self.fallback = fallback
+        self.min_confidence = min_confidence
+        self.name = f"{primary.name}+{fallback.name}"
+
+    def rerank(
+        self, question: str, candidates: List[NodeWithScore], top_n: int, confidence: float = 0.0
+    ) -> List[NodeWithScore]:
+        if self._confident(confidence):
+            return self.fallback.rerank(question, candidates, top_n, confidence)
+        try:
+            return self.primary.rerank(question, candidates, top_n, confidence)
+        except Exception as e:
+            log.warning(f"{self.primary.name} rerank failed, using {self.fallback.name}: {e}")
+            return self.fallback.rerank(question, candidates, top_n, confidence)
+
+    async def arerank(
+        self, question: str, candidates: List[NodeWithScore], top_n: int, confidence: float = 0.0
+    ) -> List[NodeWithScore]:
+        if self._confident(confidence):
+            return await self.fallback.arerank(question, candidates, top_n, confidence)
+        try:
+            return await self.primary.arerank(question, candidates, top_n, confidence)
+        except Exception as e:
+            log.warning(f"{self.primary.name} rerank failed, using {self.fallback.name}: {e}")
+            return await self.fallback.arerank(question, candidates, top_n, confidence)
+
+    def _confident(self, confidence: float) -> bool:
+        if self.min_confidence is not None and confidence >= self.min_confidence:
+            log.debug(f"Fusion agreement {confidence:.2f}, skipping {self.primary.name} rerank")
+            return True
+        return False
+
+
+def build_reranker(
+    mode: str,
+    rerank_client=None,
+    async_rerank_client=None,
+    model: str = "rerank-english-v3.0",
+    min_confidence: float = 0.66,
+) -> Reranker:
+    """mode: cohere | local | auto | none. Tanpa client Cohere, cohere/auto menjadi local."""
+    mode = mode.lower()
+    if mode == "none":
+        return Reranker()
+
+    local = LexicalReranker()
+    if mode == "local" or rerank_client is None:
+        return local
+
+    cohere = CohereReranker(rerank_client, async_rerank_client, model)
+    if mode == "cohere":
+        return FallbackReranker(cohere, local)
+    if mode == "auto":
+        return FallbackReranker(cohere, local, min_confidence)
+    raise ValueError(f"Unknown reranker mode '{mode}'.")
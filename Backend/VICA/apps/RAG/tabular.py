@@ -0,0 +1,570 @@
+import os
+import re
+import csv
+import json
+import time
+import sqlite3
+import logging
+import threading
+from itertools import chain, islice
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+log = logging.getLogger(__name__)
+
+CATALOG_TABLE = "_tables"
+
+# Pertanyaan agregat/filter (EN + ID) yang lebih cocok dijawab dengan SQL
+AGGREGATE_PATTERN = re.compile(
+    r"\b("
+    r"sum|total|average|avg|median|count|how many|how much|maximum|minimum|max|min|"
+    r"highest|lowest|largest|smallest|top \d+|bottom \d+|group(ed)? by|"
+    r"greater than|less than|more than|fewer than|sort(ed)? by|"
+    r"jumlah|berapa|rata-rata|rerata|tertinggi|terendah|terbesar|terkecil|"
+    r"lebih dari|kurang dari|urutkan"
+    r")\b",
+    re.IGNORECASE,
+)
+
+SCHEMA_TERM_PATTERN = re.compile(r"[0-9a-z]+")
+
+# Potongan nama tabel/kolom yang terlalu umum untuk menandai pertanyaan tentang tabel
+GENERIC_SCHEMA_TERMS = frozenset({"column", "table", "csv", "pdf", "data", "file"})
+
+
+def is_tabular_question(question: str, tables: Optional[Sequence["TableInfo"]] = None) -> bool:
+    """Pertanyaan agregat/filter; jika `tables` diberikan, juga harus menyebut tabel atau kolomnya."""
+    if AGGREGATE_PATTERN.search(question) is None:
+        return False
+    return tables is None or mentions_schema(question, tables)
+
+
+def mentions_schema(question: str, tables: Sequence["TableInfo"]) -> bool:
+    words = {_singular(word) for word in SCHEMA_TERM_PATTERN.findall(question.casefold())}
+    return not words.isdisjoint(_schema_terms(tables))
+
+
+def _schema_terms(tables: Sequence["TableInfo"]) -> set:
+    terms = set()
+    for table in tables:
+        names = [os.path.splitext(table.filename)[0], *(name for name, _ in table.columns)]
+        for name in names:
+            for term in SCHEMA_TERM_PATTERN.findall(name.casefold()):
+                if len(term) >= 3 and not term.isdigit() and term not in GENERIC_SCHEMA_TERMS:
+                    terms.add(_singular(term))
+    return terms
+
+
+def _singular(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+####################
+# HTML table parsing (tabel hasil partition_pdf)
+####################
+
+class _HTMLTableParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.rows: List[List[str]] = []
+        self._row: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag == "tr":
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag) -> None:
+        if tag in ("td", "th") and self._row is not None and self._cell is not None:
+            self._row.append(" ".join("".join(self._cell).split()))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            if any(self._row):
+                self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data) -> None:
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def parse_html_table(html: str) -> List[List[str]]:
+    parser = _HTMLTableParser()
+    parser.feed(html)
+    return parser.rows
+
+
+####################
+# TabularStore
+####################
+
+@dataclass
+class TableInfo:
+    table_name: str
+    file_id: str
+    filename: str
+    source: str
+    columns: List[Tuple[str, str]]
+    row_count: int
+    sample_rows: List[List[Any]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        """Ringkasan tabel yang di-embed menggantikan baris-barisnya."""
+        lines = [
+            f"Table '{self.table_name}' from {self.filename} ({self.source}) "
+            f"with {self.row_count} rows.",
+            "Columns: " + ", ".join(f"{name} ({type_})" for name, type_ in self.columns),
+        ]
+        if self.sample_rows:
+            lines.append("Sample rows:")
+            writer_rows = [[name for name, _ in self.columns], *self.sample_rows]
+            lines.extend(",".join("" if v is None else str(v) for v in row) for row in writer_rows)
+        return "\n".join(lines)
+
+
+class TabularStore:
+    """Simpan data tabular tiap knowledge base di SQLite: satu file per collection.
+
+    Tipe kolom diinferensi dari sampel baris, baris dimasukkan dengan executemany
+    dalam satu transaksi, lalu kolom kategorikal dan integer diberi index.
+    """
+
+    def __init__(
+        self,
+        base_dir: str,
+        sample_rows: int = 1000,
+        insert_batch_size: int = 5000,
+        max_indexes: int = 8,
+    ) -> None:
+        self.base_dir = base_dir
+        self.sample_rows = max(1, sample_rows)
+        self.insert_batch_size = max(1, insert_batch_size)
+        self.max_indexes = max_indexes
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(base_dir, exist_ok=True)
+
+    def db_path(self, collection_id: str) -> str:
+        return os.path.join(self.base_dir, f"{collection_id}.db")
+
+    def has_tables(self, collection_id: str) -> bool:
+        return bool(self.list_tables(collection_id))
+
+    def load_csv(
+        self, collection_id: str, file_id: str, filename: str, stream: TextIO
+    ) -> Optional[TableInfo]:
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return None
+        return self.load_rows(collection_id, file_id, filename, header, reader, source="csv")
+
+    def load_html_table(
+        self, collection_id: str, file_id: str, filename: str, html: str, table_number: int
+    ) -> Optional[TableInfo]:
+        rows = parse_html_table(html)
+        if len(rows) < 2:
+            return None
+        return self.load_rows(
+            collection_id,
+            file_id,
+            filename,
+            rows[0],
+            rows[1:],
+            source=f"pdf table {table_number}",
+            suffix=str(table_number),
+        )
+
+    def load_rows(
+        self,
+        collection_id: str,
+        file_id: str,
+        filename: str,
+        header: Sequence[str],
+        rows: Iterable[Sequence[str]],
+        source: str,
+        suffix: str = "",
+    ) -> TableInfo:
+        rows = iter(rows)
+        column_names = _column_names(header)
+        sample = [_normalize_row(row, len(column_names)) for row in islice(rows, self.sample_rows)]
+        column_types = [_infer_type(sample, i) for i in range(len(column_names))]
+        columns = list(zip(column_names, column_types))
+        table_name = _table_name(filename, file_id, suffix)
+
+        with self._lock(collection_id), self._connect(collection_id) as conn:
+            conn.execute(
+                f"CREATE TABLE {_quote(table_name)} ("
+                + ", ".join(f"{_quote(name)} {type_}" for name, type_ in columns)
+                + ")"
+            )
+
+            insert = (
+                f"INSERT INTO {_quote(table_name)} VALUES ("
+                + ", ".join("?" for _ in columns)
+                + ")"
+            )
+            all_rows = chain(sample, (_normalize_row(row, len(columns)) for row in rows))
+            row_count = 0
+            while batch := [
+                _convert_row(row, column_types) for row in islice(all_rows, self.insert_batch_size)
+            ]:
+                conn.executemany(insert, batch)
+                row_count += len(batch)
+
+            # Index dibuat setelah bulk insert, jauh lebih cepat daripada sebaliknya
+            for name in self._index_columns(sample, columns):
+                conn.execute(
+                    f"CREATE INDEX {_quote(f'idx_{table_name}_{name}')} "
+                    f"ON {_quote(table_name)} ({_quote(name)})"
+                )
+
+            conn.execute(
+                f"INSERT INTO {CATALOG_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    table_name,
+                    file_id,
+                    filename,
+                    source,
+                    json.dumps(columns),
+                    row_count,
+                    datetime.utcnow().isoformat(),
+                ),
+            )
+
+        log.info(f"Loaded {row_count} rows into table '{table_name}' for '{collection_id}'")
+        return TableInfo(
+            table_name=table_name,
+            file_id=file_id,
+            filename=filename,
+            source=source,
+            columns=columns,
+            row_count=row_count,
+            sample_rows=[_convert_row(row, column_types) for row in sample[:5]],
+        )
+
+    def list_tables(self, collection_id: str) -> List[TableInfo]:
+        if not os.path.exists(self.db_path(collection_id)):
+            return []
+
+        with self._connect(collection_id, read_only=True) as conn:
+            rows = conn.execute(
+                f"SELECT table_name, file_id, filename, source, columns, row_count "
+                f"FROM {CATALOG_TABLE} ORDER BY created_at"
+            ).fetchall()
+        return [
+            TableInfo(
+                table_name=row[0],
+                file_id=row[1],
+                filename=row[2],
+                source=row[3],
+                columns=[tuple(column) for column in json.loads(row[4])],
+                row_count=row[5],
+            )
+            for row in rows
+        ]
+
+    def describe(self, collection_id: str, sample_size: int = 3) -> str:
+        """Skema tabel beserta beberapa baris contoh, untuk prompt text-to-SQL."""
+        tables = self.list_tables(collection_id)
+        if not tables:
+            return ""
+
+        parts = []
+        with self._connect(collection_id, read_only=True) as conn:
+            for table in tables:
+                columns = ",\n".join(f"  {_quote(name)} {type_}" for name, type_ in table.columns)
+                samples = conn.execute(
+                    f"SELECT * FROM {_quote(table.table_name)} LIMIT {int(sample_size)}"
+                ).fetchall()
+                parts.append(
+                    f"-- {table.filename} ({table.source}), {table.row_count} rows\n"
+                    f"CREATE TABLE {_quote(table.table_name)} (\n{columns}\n);\n"
+                    + "\n".join(f"-- sample: {row}" for row in samples)
+                )
+        return "\n\n".join(parts)
+
+    def query(
+        self, collection_id: str, sql: str, max_rows: int = 50, timeout: float = 5.0
+    ) -> Tuple[List[str], List[tuple], bool]:
+        """Jalankan satu SELECT di koneksi read-only; kembalikan (kolom, baris, terpotong)."""
+        sql = validate_select(sql)
+        deadline = time.monotonic() + timeout
+
+        with self._connect(collection_id, read_only=True) as conn:
+            conn.set_authorizer(_read_only_authorizer)
+            # Hentikan query yang terlalu lama (mis. cross join tak sengaja)
+            conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 10000)
+            cursor = conn.execute(sql)
+            columns = [description[0] for description in cursor.description or []]
+            rows = cursor.fetchmany(max_rows + 1)
+        return columns, rows[:max_rows], len(rows) > max_rows
+
+    def drop_file(self, collection_id: str, file_id: str) -> None:
+        if not os.path.exists(self.db_path(collection_id)):
+            return
+
+        with self._lock(collection_id), self._connect(collection_id) as conn:
+            table_names = [
+                row[0]
+                for row in conn.execute(
+                    f"SELECT table_name FROM {CATALOG_TABLE} WHERE file_id = ?", (file_id,)
+                )
+            ]
+            for table_name in table_names:
+                conn.execute(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+            conn.execute(f"DELETE FROM {CATALOG_TABLE} WHERE file_id = ?", (file_id,))
+
+        if table_names:
+            log.info(f"Dropped tables {table_names} of file '{file_id}' from '{collection_id}'")
+
+    def drop_collection(self, collection_id: str) -> None:
+        with self._lock(collection_id):
+            for suffix in ("", "-wal", "-shm"):
+                path = self.db_path(collection_id) + suffix
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _index_columns(self, sample: List[List[str]], columns: List[Tuple[str, str]]) -> List[str]:
+        selected = []
+        for i, (name, type_) in enumerate(columns):
+            values = [row[i] for row in sample if row[i] != ""]
+            if not values:
+                continue
+            # Kolom kategorikal (nilai banyak berulang) dan integer sering dipakai di WHERE/GROUP BY
+            if type_ == "INTEGER" or len(set(values)) <= len(values) // 2:
+                selected.append(name)
+        return selected[: self.max_indexes]
+
+    def _lock(self, collection_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(collection_id, threading.Lock())
+
+    @contextmanager
+    def _connect(self, collection_id: str, read_only: bool = False) -> Iterator[sqlite3.Connection]:
+        path = self.db_path(collection_id)
+        if read_only:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        else:
+            conn = sqlite3.connect(path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} ("
+                "table_name TEXT PRIMARY KEY, file_id TEXT, filename TEXT, source TEXT, "
+                "columns TEXT, row_count INTEGER, created_at TEXT)"
+            )
+
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+def validate_select(sql: str) -> str:
+    sql = sql.strip().rstrip(";").strip()
+    if not sql:
+        raise ValueError("Empty SQL query.")
+    if ";" in sql:
+        raise ValueError("Only a single SQL statement is allowed.")
+    if not re.match(r"^(select|with)\b", sql, re.IGNORECASE):
+        raise ValueError("Only SELECT queries are allowed.")
+    return sql
+
+
+_ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+
+def _read_only_authorizer(action, *args) -> int:
+    return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _slug(value: str) -> str:
+    slug = re.sub(r"[^0-9a-zA-Z]+", "_", value).strip("_").lower()
+    if not slug or slug[0].isdigit():
+        slug = f"t_{slug}"
+    return slug
+
+
+def _table_name(filename: str, file_id: str, suffix: str = "") -> str:
+    stem = _slug(os.path.splitext(filename)[0])[:40]
+    parts = [stem, file_id.replace("-", "")[:8]]
+    if suffix:
+        parts.append(suffix)
+    return "_".join(parts)
+
+
+def _column_names(header: Sequence[str]) -> List[str]:
+    names: List[str] = []
+    for i, column in enumerate(header, start=1):
+        name = _slug(column) if column.strip() else f"column_{i}"
+        candidate, n = name, 2
+        while candidate in names:
+            candidate, n = f"{name}_{n}", n + 1
+        names.append(candidate)
+    return names
+
+
+def _normalize_row(row: Sequence[str], width: int) -> List[str]:
+    row = [cell.strip() for cell in row[:width]]
+    return row + [""] * (width - len(row))
+
+
+def _infer_type(sample: List[List[str]], index: int) -> str:
+    values = [row[index] for row in sample if row[index] != ""]
+    if not values:
+        return "TEXT"
+    if all(_parse_int(value) is not None for value in values):
+        return "INTEGER"
+    if all(_parse_float(value) is not None for value in values):
+        return "REAL"
+    return "TEXT"
+
+
+def _parse_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _parse_float(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _convert_row(row: List[str], column_types: List[str]) -> List[Any]:
+    converted = []
+    for value, type_ in zip(row, column_types):
+        if value == "":
+            converted.append(None)
+        elif type_ == "INTEGER":
+            parsed = _parse_int(value)
+            converted.append(parsed if parsed is not None else value)
+        elif type_ == "REAL":
+            parsed = _parse_float(value)
+            converted.append(parsed if parsed is not None else value)
+        else:
+            converted.append(value)
+    return converted
+
+
+####################
+# TextToSQLEngine
+####################
+
+TEXT_TO_SQL_PROMPT = """You are an expert SQLite analyst. Given the tables below, write ONE SQLite SELECT query that answers the question.
+Use only the tables and columns listed. Quote identifiers with double quotes. Return only the SQL, without explanation.
+
+{schema}
+
+Question: {question}
+{error}SQL:"""
+
+SQL_ANSWER_PROMPT = """Answer the question using the SQL result below. Be concise and mention the numbers exactly as given.
+
+Question: {question}
+SQL: {sql}
+Result columns: {columns}
+Result rows{truncated}:
+{rows}
+
+Answer:"""
+
+
+@dataclass
+class TabularAnswer:
+    answer: str
+    sql: str
+    columns: List[str]
+    rows: List[tuple]
+    truncated: bool
+
+
+class TextToSQLEngine:
+    """Jawab pertanyaan agregat/filter dengan SQL di atas TabularStore."""
+
+    def __init__(
+        self, store: TabularStore, llm, max_rows: int = 50, timeout: float = 5.0, retries: int = 1
+    ) -> None:
+        self.store = store
+        self.llm = llm
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.retries = retries
+
+    def answer(self, collection_id: str, question: str) -> Optional[TabularAnswer]:
+        """None jika pertanyaan tidak menyebut tabel/kolom yang ada atau SQL tidak mengembalikan baris."""
+        tables = self.store.list_tables(collection_id)
+        if not tables or not is_tabular_question(question, tables):
+            return None
+        schema = self.store.describe(collection_id)
+
+        error = ""
+        for attempt in range(self.retries + 1):
+            sql = self._generate_sql(schema, question, error)
+            try:
+                columns, rows, truncated = self.store.query(
+                    collection_id, sql, self.max_rows, self.timeout
+                )
+                break
+            except (ValueError, sqlite3.Error) as e:
+                log.warning(f"Generated SQL failed ({e}): {sql}")
+                if attempt >= self.retries:
+                    raise
+                # Beri tahu LLM error sebelumnya agar bisa memperbaiki query
+                error = f"The previous query `{sql}` failed with: {e}\n"
+
+        if not rows:
+            # Filter yang salah tebak lebih baik dijawab lewat vector search daripada "tidak ada data"
+            log.info(f"SQL returned no rows, falling back: {sql}")
+            return None
+
+        response = self.llm.complete(
+            SQL_ANSWER_PROMPT.format(
+                question=question,
+                sql=sql,
+                columns=", ".join(columns),
+                truncated=f" (first {self.max_rows})" if truncated else "",
+                rows="\n".join(str(row) for row in rows),
+            )
+        )
+        return TabularAnswer(
+            answer=response.text.strip(),
+            sql=sql,
+            columns=columns,
+            rows=rows,
+            truncated=truncated,
+        )
+
+    def _generate_sql(self, schema: str, question: str, error: str) -> str:
+        response = self.llm.complete(
+            TEXT_TO_SQL_PROMPT.format(schema=schema, question=question, error=error)
+        )
+        return extract_sql(response.text)
+
+
+def extract_sql(text: str) -> str:
+    match = re.search(r"```(?:sql)?\s*(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    sql = match.group(1) if match else text
+    return sql.strip()
@@ -0,0 +1,177 @@
+import io
+import os
+import mmap
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional
+
+from fastapi import UploadFile
+
+####################
+# UploadSource
+####################
+
+class UploadSource:
+    """Isi file upload tanpa salinan berulang.
+
+    File kecil disimpan sebagai buffer di memori dan dibaca lewat memoryview;
+    file di atas `spool_threshold` ditulis sekali ke disk lalu dibaca lewat mmap.
+    Path hanya dibuat bila pemanggil benar-benar butuh (mis. partition_pdf).
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        content_type: Optional[str] = None,
+        buffer: Optional[bytearray] = None,
+        path: Optional[str] = None,
+        owns_path: bool = False,
+        sha256: Optional[str] = None,
+    ) -> None:
+        self.filename = filename
+        self.content_type = content_type
+        self._buffer = buffer
+        self._path = path
+        self._owns_path = owns_path
+        self._sha256 = sha256
+        self._mmap: Optional[mmap.mmap] = None
+        self._file: Optional[BinaryIO] = None
+
+    @classmethod
+    async def from_upload(
+        cls, file: UploadFile, spool_threshold: int = 8 * 1024 * 1024, chunk_size: int = 1024 * 1024
+    ) -> "UploadSource":
+        digest = hashlib.sha256()
+        buffer = bytearray()
+        spill = None
+
+        await file.seek(0)
+        try:
+            while chunk := await file.read(chunk_size):
+                digest.update(chunk)
+                if spill is None and len(buffer) + len(chunk) > spool_threshold:
+                    spill = tempfile.NamedTemporaryFile(delete=False, suffix=_suffix(file.filename))
+                    spill.write(buffer)
+                    buffer = bytearray()
+                if spill is not None:
+                    spill.write(chunk)
+                else:
+                    buffer += chunk
+        except BaseException:
+            if spill is not None:
+                spill.close()
+                os.remove(spill.name)
+            raise
+
+        if spill is not None:
+            spill.close()
+            return cls(file.filename, file.content_type, path=spill.name, owns_path=True, sha256=digest.hexdigest())
+        return cls(file.filename, file.content_type, buffer=buffer, sha256=digest.hexdigest())
+
+    @classmethod
+    def from_path(cls, path: str, filename: str, content_type: Optional[str] = None) -> "UploadSource":
+        return cls(filename, content_type, path=path)
+
+    @property
+    def size(self) -> int:
+        if self._buffer is not None:
+            return len(self._buffer)
+        return os.path.getsize(self._path)
+
+    @property
+    def sha256(self) -> str:
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.view()).hexdigest()
+        return self._sha256
+
+    def view(self) -> memoryview:
+        if self._buffer is not None:
+            return memoryview(self._buffer)
+        if self.size == 0:
+            return memoryview(b"")
+        if self._mmap is None:
+            self._file = open(self._path, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def open(self) -> BinaryIO:
+        if self._buffer is not None:
+            return io.BufferedReader(_MemoryViewReader(self.view()))
+        return open(self._path, "rb")
+
+    def text_stream(self, encoding: str = "utf-8") -> io.TextIOWrapper:
+        return io.TextIOWrapper(self.open(), encoding=encoding, newline="")
+
+    @contextmanager
+    def as_path(self) -> Iterator[str]:
+        if self._path is not None:
+            yield self._path
+            return
+
+        fd, path = tempfile.mkstemp(suffix=_suffix(self.filename))
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(self.view())
+            yield path
+        finally:
+            os.remove(path)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Masih ada memoryview yang dipakai; mmap dilepas oleh GC
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._owns_path and self._path and os.path.exists(self._path):
+            os.remove(self._path)
+        self._buffer = None
+
+    def __enter__(self) -> "UploadSource":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _MemoryViewReader(io.RawIOBase):
+    """Stream baca zero-copy di atas memoryview."""
+
+    def __init__(self, view: memoryview) -> None:
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        remaining = len(self._view) - self._position
+        count = min(len(target), remaining)
+        target[:count] = self._view[self._position : self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        else:
+            self._position = len(self._view) + offset
+        self._position = max(0, self._position)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+def _suffix(filename: Optional[str]) -> str:
+    return os.path.splitext(filename or "")[1]
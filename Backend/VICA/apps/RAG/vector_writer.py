@@ -0,0 +1,143 @@
+import time
+import asyncio
+import logging
+from typing import List, Optional
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    MatchValue,
+    PointStruct,
+)
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+log = logging.getLogger(__name__)
+
+####################
+# QdrantBulkWriter
+####################
+
+class QdrantBulkWriter:
+    """Upsert node ber-embedding langsung ke Qdrant: berbatch, paralel, opsional wait=false.
+
+    Payload mengikuti format QdrantVectorStore sehingga retrieval llama_index tetap bekerja.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        batch_size: int = 256,
+        parallelism: int = 4,
+        wait: bool = False,
+        barrier_timeout: float = 60.0,
+    ) -> None:
+        self.client = client
+        self.batch_size = max(1, batch_size)
+        self.parallelism = max(1, parallelism)
+        self.wait = wait
+        self.barrier_timeout = barrier_timeout
+
+    def session(self, collection_name: str, file_id: Optional[str] = None) -> "BulkWriteSession":
+        return BulkWriteSession(self, collection_name, file_id)
+
+    async def write(self, collection_name: str, nodes: List[BaseNode], file_id: Optional[str] = None) -> int:
+        session = self.session(collection_name, file_id)
+        await session.add(nodes)
+        return await session.close()
+
+    async def delete_file(self, collection_name: str, file_id: str) -> None:
+        await asyncio.to_thread(
+            self.client.delete,
+            collection_name=collection_name,
+            points_selector=FilterSelector(filter=_file_filter(file_id)),
+            wait=True,
+        )
+
+    @staticmethod
+    def build_points(nodes: List[BaseNode]) -> List[PointStruct]:
+        return [
+            PointStruct(
+                id=node.node_id,
+                vector=node.get_embedding(),
+                payload=node_to_metadata_dict(node, remove_text=False, flat_metadata=False),
+            )
+            for node in nodes
+        ]
+
+    def _upsert(self, collection_name: str, nodes: List[BaseNode]) -> None:
+        self.client.upsert(
+            collection_name=collection_name,
+            points=self.build_points(nodes),
+            wait=self.wait,
+        )
+
+    def _count(self, collection_name: str, file_id: str) -> int:
+        return self.client.count(
+            collection_name=collection_name,
+            count_filter=_file_filter(file_id),
+            exact=True,
+        ).count
+
+
+class BulkWriteSession:
+    def __init__(self, writer: QdrantBulkWriter, collection_name: str, file_id: Optional[str]) -> None:
+        self.writer = writer
+        self.collection_name = collection_name
+        self.file_id = file_id
+        self.written = 0
+        self._semaphore = asyncio.Semaphore(writer.parallelism)
+        self._tasks: List[asyncio.Task] = []
+
+    async def add(self, nodes: List[BaseNode]) -> None:
+        """Jadwalkan upsert; menunggu hanya jika batch paralel sudah penuh (backpressure)."""
+        for i in range(0, len(nodes), self.writer.batch_size):
+            batch = nodes[i : i + self.writer.batch_size]
+            await self._semaphore.acquire()
+            self._tasks.append(asyncio.create_task(self._upsert(batch)))
+
+    async def close(self) -> int:
+        """Tunggu semua upsert selesai; TimeoutError jika point belum terlihat dalam `barrier_timeout`."""
+        try:
+            await asyncio.gather(*self._tasks)
+        except BaseException:
+            self.abort()
+            raise
+
+        if not self.writer.wait and self.file_id is not None:
+            await self._barrier()
+        return self.written
+
+    def abort(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    async def _upsert(self, batch: List[BaseNode]) -> None:
+        try:
+            await asyncio.to_thread(self.writer._upsert, self.collection_name, batch)
+            self.written += len(batch)
+        finally:
+            self._semaphore.release()
+
+    async def _barrier(self) -> None:
+        # Dengan wait=false Qdrant baru menulis ke WAL; tunggu sampai semua point terlihat
+        deadline = time.monotonic() + self.writer.barrier_timeout
+        delay = 0.1
+        while True:
+            count = await asyncio.to_thread(self.writer._count, self.collection_name, self.file_id)
+            if count >= self.written:
+                return
+            if time.monotonic() >= deadline:
+                # Gagalkan job: versi lama file tidak boleh dihapus sebelum versi baru terlihat
+                raise TimeoutError(
+                    f"Consistency barrier timed out for '{self.collection_name}': "
+                    f"{count}/{self.written} points visible"
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 2.0)
+
+
+def _file_filter(file_id: str) -> Filter:
+    return Filter(must=[FieldCondition(key="file_id", match=MatchValue(value=file_id))])
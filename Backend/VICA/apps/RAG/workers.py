@@ -0,0 +1,174 @@
+import os
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from fastapi import Request
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+####################
+# CPU-bound stages (dijalankan di worker process)
+####################
+
+# Data NLTK yang dibutuhkan unstructured untuk tokenisasi dan POS tagging
+NLTK_PACKAGES = {
+    "punkt_tab": "tokenizers/punkt_tab",
+    "averaged_perceptron_tagger_eng": "taggers/averaged_perceptron_tagger_eng",
+}
+
+_nltk_ready = False
+
+
+def ensure_nltk_data(data_dir: Optional[str] = None) -> bool:
+    """Pakai data NLTK dari cache lokal; unduh hanya paket yang belum ada (sekali per proses)."""
+    global _nltk_ready
+    if _nltk_ready:
+        return True
+
+    import nltk
+
+    if data_dir:
+        os.makedirs(data_dir, exist_ok=True)
+        if data_dir not in nltk.data.path:
+            nltk.data.path.insert(0, data_dir)
+
+    ready = True
+    for package, resource in NLTK_PACKAGES.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            log.info(f"NLTK package '{package}' not found locally, downloading to {data_dir}")
+            try:
+                downloaded = nltk.download(package, download_dir=data_dir, quiet=True)
+            except Exception as e:
+                log.warning(f"NLTK download of '{package}' failed: {e}")
+                downloaded = False
+            if not downloaded:
+                log.warning(f"NLTK package '{package}' is unavailable (offline?)")
+                ready = False
+
+    _nltk_ready = ready
+    return ready
+
+
+def partition_pdf_elements(
+    file_path: str, image_dir: str, nltk_data_dir: Optional[str] = None
+) -> Tuple[List[str], List[str]]:
+    """Kembalikan teks tiap elemen dan HTML tabel yang terdeteksi."""
+    ensure_nltk_data(nltk_data_dir)
+
+    # Import di dalam worker agar proses utama tidak memuat unstructured
+    from unstructured.partition.pdf import partition_pdf
+
+    raw_pdf_elements = partition_pdf(
+        filename=file_path,
+        extract_images_in_pdf=True,
+        infer_table_structure=True,
+        chunking_strategy="by_title",
+        extract_image_block_output_dir=image_dir,
+    )
+    texts = [str(element) for element in raw_pdf_elements]
+    tables = [
+        element.metadata.text_as_html
+        for element in raw_pdf_elements
+        if element.category == "Table" and getattr(element.metadata, "text_as_html", None)
+    ]
+    return texts, tables
+
+
+####################
+# CPUWorkerPool
+####################
+
+class CPUWorkerPool:
+    """ProcessPoolExecutor terkelola untuk tahap ingestion yang CPU-bound."""
+
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                log.info(f"Starting CPU worker pool with {self.max_workers} processes")
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    async def warm_up(self) -> None:
+        """Spawn semua worker lebih awal agar upload pertama tidak menanggung biaya fork."""
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(
+            *[loop.run_in_executor(executor, _warm_up) for _ in range(self.max_workers)]
+        )
+        log.info(f"CPU worker pool ready: {sorted(set(pids))}")
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        # Membatalkan await akan membatalkan future yang belum dijalankan worker
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs)
+        try:
+            return await loop.run_in_executor(self._get_executor(), call)
+        except BrokenProcessPool:
+            log.error("CPU worker pool is broken, restarting it")
+            self._reset()
+            raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _reset(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_cpu_bound(pool: Optional[CPUWorkerPool], fn: Callable[..., T], *args: Any) -> T:
+    if pool is None:
+        return await asyncio.to_thread(fn, *args)
+    return await pool.run(fn, *args)
+
+
+async def run_until_disconnected(
+    request: Request, awaitable: Awaitable[T], poll_interval: float = 1.0
+) -> T:
+    """Jalankan `awaitable`, batalkan jika client memutus koneksi."""
+    task = asyncio.ensure_future(awaitable)
+
+    async def watch() -> None:
+        while not task.done():
+            if await request.is_disconnected():
+                task.cancel()
+                return
+            await asyncio.sleep(poll_interval)
+
+    watcher = asyncio.create_task(watch())
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if watcher.done() and not watcher.cancelled():
+            raise ClientDisconnected("Client disconnected before the request finished.")
+        raise
+    finally:
+        watcher.cancel()
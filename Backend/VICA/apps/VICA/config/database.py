@@ -1,5 +1,6 @@
 import os
 import sys
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 from typing import Any, Optional
@@ -0,0 +1,124 @@
+import os
+import sys
+import hashlib
+from typing import Optional
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import Column, String, Text, DateTime, Index
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from VICA.apps.VICA.config.database import Base, JSONField, get_db
+
+####################
+# File DB Schema
+####################
+
+class File(Base):
+    __tablename__ = "file"
+
+    id = Column(String, primary_key=True)
+    user_id = Column(String)
+    filename = Column(Text)
+    # Disalin dari meta agar filter per collection berjalan di SQL lewat index
+    collection_id = Column(String, nullable=True)
+    meta = Column(JSONField)  # collection_id, chat_id, content_hash, size
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_file_user_id_collection_id", "user_id", "collection_id"),)
+
+class FileModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    user_id: str
+    filename: str
+    meta: dict = {}
+
+    created_at: datetime
+
+class FileTable:
+    def insert_new_file(
+        self, id: str, user_id: str, filename: str, meta: dict
+    ) -> Optional[FileModel]:
+        with get_db() as db:
+            file = FileModel(
+                **{
+                    "id": id,
+                    "user_id": user_id,
+                    "filename": filename,
+                    "meta": meta,
+                    "created_at": datetime.utcnow(),
+                }
+            )
+
+            result = File(**file.model_dump(), collection_id=meta.get("collection_id"))
+            db.add(result)
+            db.commit()
+            db.refresh(result)
+            return FileModel.model_validate(result) if result else None
+
+    def get_files_by_collection_id(self, user_id: str, collection_id: str) -> list[FileModel]:
+        with get_db() as db:
+            files = (
+                db.query(File)
+                .filter_by(user_id=user_id, collection_id=collection_id)
+                .order_by(File.created_at)
+                .all()
+            )
+            return [FileModel.model_validate(file) for file in files]
+
+    def get_collection_version(self, user_id: str, collection_id: str) -> str:
+        """Sidik jari isi collection; berubah setiap file ditambah, diganti, atau dihapus."""
+        with get_db() as db:
+            rows = (
+                db.query(File.id)
+                .filter_by(user_id=user_id, collection_id=collection_id)
+                .order_by(File.created_at, File.id)
+                .all()
+            )
+        file_ids = [row.id for row in rows]
+        return hashlib.sha1(",".join(file_ids).encode("utf-8")).hexdigest()
+
+    def get_file_by_collection_id_and_hash(
+        self, user_id: str, collection_id: str, content_hash: str
+    ) -> Optional[FileModel]:
+        for file in self.get_files_by_collection_id(user_id, collection_id):
+            if file.meta.get("content_hash") == content_hash:
+                return file
+        return None
+
+    def get_files_by_collection_id_and_filename(
+        self, user_id: str, collection_id: str, filename: str
+    ) -> list[FileModel]:
+        with get_db() as db:
+            files = (
+                db.query(File)
+                .filter_by(user_id=user_id, collection_id=collection_id, filename=filename)
+                .order_by(File.created_at)
+                .all()
+            )
+            return [FileModel.model_validate(file) for file in files]
+
+    def delete_file_by_id(self, id: str) -> bool:
+        try:
+            with get_db() as db:
+                db.query(File).filter_by(id=id).delete()
+                db.commit()
+                return True
+        except Exception:
+            return False
+
+    def delete_files_by_collection_id(self, user_id: str, collection_id: str) -> bool:
+        try:
+            with get_db() as db:
+                db.query(File).filter_by(
+                    user_id=user_id, collection_id=collection_id
+                ).delete(synchronize_session=False)
+                db.commit()
+                return True
+        except Exception:
+            return False
+
+Files = FileTable()
@@ -0,0 +1,218 @@
+import uuid
+import os
+import sys
+from typing import Optional
+from datetime import datetime, timedelta
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import Column, String, Text, Float, Integer, DateTime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from VICA.apps.VICA.config.database import Base, get_db
+
+####################
+# IngestionJob DB Schema
+####################
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_job"
+
+    id = Column(String, primary_key=True)
+    user_id = Column(String)
+    chat_id = Column(String)
+    filename = Column(Text)
+    content_type = Column(String)
+    file_path = Column(Text)
+
+    status = Column(String, default="queued")  # queued | running | completed | failed
+    stage = Column(String, default="queued")
+    progress = Column(Float, default=0.0)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+class IngestionJobModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    user_id: str
+    chat_id: str
+    filename: str
+    content_type: Optional[str] = None
+    file_path: str
+
+    status: str
+    stage: str
+    progress: float = 0.0
+    error: Optional[str] = None
+    attempts: int = 0
+
+    created_at: datetime
+    updated_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+####################
+# Forms
+####################
+
+class IngestionJobResponse(BaseModel):
+    id: str
+    chat_id: str
+    filename: str
+    status: str
+    stage: str
+    progress: float
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime
+    updated_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+class IngestionJobTable:
+    def insert_new_job(
+        self,
+        user_id: str,
+        chat_id: str,
+        filename: str,
+        content_type: Optional[str],
+        file_path: str,
+        id: Optional[str] = None,
+    ) -> Optional[IngestionJobModel]:
+        with get_db() as db:
+            job = IngestionJobModel(
+                **{
+                    "id": id or str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "chat_id": chat_id,
+                    "filename": filename,
+                    "content_type": content_type,
+                    "file_path": file_path,
+                    "status": "queued",
+                    "stage": "queued",
+                    "created_at": datetime.utcnow(),
+                    "updated_at": datetime.utcnow(),
+                }
+            )
+
+            result = IngestionJob(**job.model_dump())
+            db.add(result)
+            db.commit()
+            db.refresh(result)
+            return IngestionJobModel.model_validate(result) if result else None
+
+    def get_job_by_id(self, id: str) -> Optional[IngestionJobModel]:
+        with get_db() as db:
+            job = db.get(IngestionJob, id)
+            return IngestionJobModel.model_validate(job) if job else None
+
+    def get_job_by_id_and_user_id(self, id: str, user_id: str) -> Optional[IngestionJobModel]:
+        with get_db() as db:
+            job = db.query(IngestionJob).filter_by(id=id, user_id=user_id).first()
+            return IngestionJobModel.model_validate(job) if job else None
+
+    def claim_next_job(self) -> Optional[IngestionJobModel]:
+        """Ambil job antrian tertua; update bersyarat mencegah dua worker mengambil job yang sama."""
+        with get_db() as db:
+            candidate = (
+                db.query(IngestionJob.id)
+                .filter_by(status="queued")
+                .order_by(IngestionJob.created_at)
+                .first()
+            )
+            if candidate is None:
+                return None
+
+            now = datetime.utcnow()
+            claimed = (
+                db.query(IngestionJob)
+                .filter_by(id=candidate[0], status="queued")
+                .update(
+                    {
+                        "status": "running",
+                        "stage": "starting",
+                        "attempts": IngestionJob.attempts + 1,
+                        "started_at": now,
+                        "updated_at": now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            if not claimed:
+                return None
+
+            return IngestionJobModel.model_validate(db.get(IngestionJob, candidate[0]))
+
+    def update_job_progress(self, id: str, stage: str, progress: float) -> None:
+        with get_db() as db:
+            db.query(IngestionJob).filter_by(id=id).update(
+                {"stage": stage, "progress": progress, "updated_at": datetime.utcnow()}
+            )
+            db.commit()
+
+    def touch_job(self, id: str) -> None:
+        with get_db() as db:
+            db.query(IngestionJob).filter_by(id=id, status="running").update(
+                {"updated_at": datetime.utcnow()}
+            )
+            db.commit()
+
+    def mark_job_completed(self, id: str, stage: str = "completed") -> None:
+        with get_db() as db:
+            now = datetime.utcnow()
+            db.query(IngestionJob).filter_by(id=id).update(
+                {
+                    "status": "completed",
+                    "stage": stage,
+                    "progress": 1.0,
+                    "error": None,
+                    "updated_at": now,
+                    "completed_at": now,
+                }
+            )
+            db.commit()
+
+    def mark_job_failed(self, id: str, error: str) -> None:
+        with get_db() as db:
+            now = datetime.utcnow()
+            db.query(IngestionJob).filter_by(id=id).update(
+                {
+                    "status": "failed",
+                    "error": error,
+                    "updated_at": now,
+                    "completed_at": now,
+                }
+            )
+            db.commit()
+
+    def requeue_stale_jobs(self, stale_after: timedelta, max_attempts: int) -> int:
+        """Kembalikan job `running` yang worker-nya mati (heartbeat kedaluwarsa) ke antrian."""
+        with get_db() as db:
+            threshold = datetime.utcnow() - stale_after
+            stale = db.query(IngestionJob).filter(
+                IngestionJob.status == "running", IngestionJob.updated_at < threshold
+            )
+
+            count = 0
+            for job in stale.all():
+                if job.attempts >= max_attempts:
+                    job.status = "failed"
+                    job.error = f"Gave up after {job.attempts} interrupted attempts."
+                    job.completed_at = datetime.utcnow()
+                else:
+                    job.status = "queued"
+                    job.stage = "queued"
+                    job.progress = 0.0
+                    count += 1
+                job.updated_at = datetime.utcnow()
+
+            db.commit()
+            return count
+
+IngestionJobs = IngestionJobTable()
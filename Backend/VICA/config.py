@@ -31,3 +31,161 @@ QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 # GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY_2")
 JINA_API_KEY = os.getenv("JINA_API_KEY")
+
+####################################
+# RAG INGESTION
+####################################
+
+DATA_DIR = os.getenv(
+    "DATA_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "../data"))
+)
+
+VISION_MODEL_NAME = os.getenv("VISION_MODEL_NAME", "llama-3.2-90b-vision-preview")
+
+# Jumlah halaman yang dideskripsikan secara paralel per dokumen
+PDF_DESCRIBE_CONCURRENCY = int(os.getenv("PDF_DESCRIBE_CONCURRENCY", "4"))
+PDF_DESCRIBE_TIMEOUT = float(os.getenv("PDF_DESCRIBE_TIMEOUT", "60"))
+PDF_DESCRIBE_RETRIES = int(os.getenv("PDF_DESCRIBE_RETRIES", "2"))
+
+# Rasterisasi PDF per jendela halaman, dibatasi memori per job
+PDF_RASTER_DPI = int(os.getenv("PDF_RASTER_DPI", "200"))
+PDF_RASTER_WINDOW = int(os.getenv("PDF_RASTER_WINDOW", "4"))
+PDF_RASTER_MAX_JOB_MEMORY = int(os.getenv("PDF_RASTER_MAX_JOB_MEMORY", str(256 * 1024 * 1024)))
+
+# Halaman born-digital dibaca dari text layer, hanya halaman bergambar/tabel ke vision model
+PDF_TEXT_LAYER_ENABLED = os.getenv("PDF_TEXT_LAYER_ENABLED", "true").lower() == "true"
+PDF_TEXT_MIN_CHARS = int(os.getenv("PDF_TEXT_MIN_CHARS", "100"))
+PDF_MAX_IMAGE_RATIO = float(os.getenv("PDF_MAX_IMAGE_RATIO", "0.5"))
+PDF_MAX_FIGURE_RATIO = float(os.getenv("PDF_MAX_FIGURE_RATIO", "0.2"))
+PDF_MAX_VECTOR_OBJECTS = int(os.getenv("PDF_MAX_VECTOR_OBJECTS", "50"))
+
+# Payload gambar untuk vision model: sisi terpanjang dibatasi, kualitas JPEG
+# dipilih sesuai anggaran ukuran, halaman tanpa warna dikirim grayscale
+VISION_MAX_IMAGE_SIDE = int(os.getenv("VISION_MAX_IMAGE_SIDE", "1120"))
+VISION_MAX_PAYLOAD_BYTES = int(os.getenv("VISION_MAX_PAYLOAD_BYTES", str(1024 * 1024)))
+VISION_JPEG_MIN_QUALITY = int(os.getenv("VISION_JPEG_MIN_QUALITY", "40"))
+VISION_JPEG_MAX_QUALITY = int(os.getenv("VISION_JPEG_MAX_QUALITY", "85"))
+VISION_GRAYSCALE_SATURATION = float(os.getenv("VISION_GRAYSCALE_SATURATION", "12"))
+
+# Beberapa gambar dikemas dalam satu request vision (batas gambar, payload, dan
+# token output per request); 1 berarti satu gambar per request
+VISION_BATCH_MAX_IMAGES = int(os.getenv("VISION_BATCH_MAX_IMAGES", "4"))
+VISION_BATCH_MAX_BYTES = int(os.getenv("VISION_BATCH_MAX_BYTES", str(4 * 1024 * 1024)))
+VISION_BATCH_MAX_TOKENS = int(os.getenv("VISION_BATCH_MAX_TOKENS", "4096"))
+
+# Gambar hasil ekstraksi PDF yang terlalu kecil, hampir polos, atau duplikat
+# (logo, ikon, footer) tidak dikirim ke vision model
+PDF_IMAGE_FILTER_ENABLED = os.getenv("PDF_IMAGE_FILTER_ENABLED", "true").lower() == "true"
+PDF_IMAGE_MIN_SIDE = int(os.getenv("PDF_IMAGE_MIN_SIDE", "64"))
+PDF_IMAGE_MIN_AREA = int(os.getenv("PDF_IMAGE_MIN_AREA", str(128 * 128)))
+PDF_IMAGE_MIN_ENTROPY = float(os.getenv("PDF_IMAGE_MIN_ENTROPY", "2.5"))
+PDF_IMAGE_HASH_DISTANCE = int(os.getenv("PDF_IMAGE_HASH_DISTANCE", "4"))
+
+# Jumlah worker process untuk tahap CPU-bound (partition_pdf, rasterisasi, encoding)
+RAG_CPU_WORKERS = int(os.getenv("RAG_CPU_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# Antrian ingestion di database lokal, file upload disimpan sampai job selesai
+RAG_INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "2"))
+RAG_UPLOAD_DIR = os.getenv("RAG_UPLOAD_DIR", os.path.join(DATA_DIR, "uploads"))
+# Upload di bawah batas ini diproses langsung dari memori, di atasnya lewat mmap
+RAG_UPLOAD_SPOOL_THRESHOLD = int(os.getenv("RAG_UPLOAD_SPOOL_THRESHOLD", str(8 * 1024 * 1024)))
+# Batas token per chunk CSV (header + baris utuh)
+RAG_CSV_CHUNK_TOKENS = int(os.getenv("RAG_CSV_CHUNK_TOKENS", "800"))
+# Tabel CSV/PDF disimpan di SQLite per knowledge base; CSV di atas batas ini
+# tidak di-embed per baris, cukup ringkasannya
+RAG_TABLES_DIR = os.getenv("RAG_TABLES_DIR", os.path.join(DATA_DIR, "tables"))
+RAG_CSV_EMBED_MAX_ROWS = int(os.getenv("RAG_CSV_EMBED_MAX_ROWS", "1000"))
+RAG_SQL_MAX_ROWS = int(os.getenv("RAG_SQL_MAX_ROWS", "50"))
+RAG_SQL_TIMEOUT = float(os.getenv("RAG_SQL_TIMEOUT", "5"))
+RAG_JOB_MAX_ATTEMPTS = int(os.getenv("RAG_JOB_MAX_ATTEMPTS", "3"))
+
+# Query: kandidat dari vector search, lalu top-n hasil rerank diteruskan ke synthesizer
+RAG_RETRIEVE_TOP_K = int(os.getenv("RAG_RETRIEVE_TOP_K", "10"))
+RAG_RERANK_TOP_N = int(os.getenv("RAG_RERANK_TOP_N", "3"))
+RAG_RERANK_MODEL = os.getenv("RAG_RERANK_MODEL", "rerank-english-v3.0")
+# Reranker: cohere | local | auto | none. "auto" melewati Cohere bila hasil dense dan
+# BM25 sudah sepakat (agreement >= RAG_FUSION_CONFIDENCE; 0.66 = 2 dari 3 top-n sama);
+# reranker lokal juga jadi fallback saat Cohere gagal
+RAG_RERANKER = os.getenv("RAG_RERANKER", "auto")
+RAG_FUSION_CONFIDENCE = float(os.getenv("RAG_FUSION_CONFIDENCE", "0.66"))
+# Index BM25 lokal (SQLite FTS5) per knowledge base, digabung dengan hasil dense lewat RRF
+RAG_BM25_ENABLED = os.getenv("RAG_BM25_ENABLED", "true").lower() == "true"
+RAG_BM25_DIR = os.getenv("RAG_BM25_DIR", os.path.join(DATA_DIR, "bm25"))
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+# Handle vector store per collection di-cache untuk pertanyaan lanjutan dalam chat aktif
+RAG_HANDLE_CACHE_SIZE = int(os.getenv("RAG_HANDLE_CACHE_SIZE", "128"))
+RAG_HANDLE_CACHE_TTL = float(os.getenv("RAG_HANDLE_CACHE_TTL", "600"))
+# Cache jawaban per knowledge base; pertanyaan dengan cosine similarity >= threshold
+# mendapat jawaban tersimpan. Validitasnya dicek terhadap daftar file collection di
+# database setiap lookup, sehingga upload/hapus di worker lain ikut mengosongkannya.
+RAG_ANSWER_CACHE_ENABLED = os.getenv("RAG_ANSWER_CACHE_ENABLED", "true").lower() == "true"
+RAG_ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+RAG_ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "256"))
+RAG_ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))
+RAG_ANSWER_CACHE_COLLECTIONS = int(os.getenv("RAG_ANSWER_CACHE_COLLECTIONS", "512"))
+
+# Service RAG dibuat lazy; warm-up di background setelah startup (matikan untuk mode offline)
+RAG_WARM_UP = os.getenv("RAG_WARM_UP", "true").lower() == "true"
+MODEL_METADATA_PATH = os.getenv("MODEL_METADATA_PATH", os.path.join(DATA_DIR, "model_metadata.json"))
+NLTK_DATA_DIR = os.getenv("NLTK_DATA_DIR", os.path.join(DATA_DIR, "nltk_data"))
+
+# Ukuran antrian antar tahap pipeline ingestion dan batch embedding
+RAG_PIPELINE_QUEUE_SIZE = int(os.getenv("RAG_PIPELINE_QUEUE_SIZE", "8"))
+RAG_EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "32"))
+
+# Embedding paralel dan cache vektor (float32) di disk
+RAG_EMBED_MAX_IN_FLIGHT = int(os.getenv("RAG_EMBED_MAX_IN_FLIGHT", "4"))
+RAG_EMBED_RETRIES = int(os.getenv("RAG_EMBED_RETRIES", "3"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(DATA_DIR, "cache/embeddings.db"))
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Cache vektor pertanyaan (model + teks ternormalisasi); persist memakai cache embedding di disk
+RAG_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024"))
+RAG_QUERY_CACHE_TTL = float(os.getenv("RAG_QUERY_CACHE_TTL", "3600"))
+RAG_QUERY_CACHE_PERSIST = os.getenv("RAG_QUERY_CACHE_PERSIST", "false").lower() == "true"
+
+# Bulk upsert ke Qdrant; dengan wait=false ada barrier konsistensi di akhir ingestion
+QDRANT_UPSERT_BATCH_SIZE = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "256"))
+QDRANT_UPSERT_PARALLELISM = int(os.getenv("QDRANT_UPSERT_PARALLELISM", "4"))
+QDRANT_UPSERT_WAIT = os.getenv("QDRANT_UPSERT_WAIT", "false").lower() == "true"
+QDRANT_BARRIER_TIMEOUT = float(os.getenv("QDRANT_BARRIER_TIMEOUT", "60"))
+
+# Cache deskripsi vision model, key = hash(image bytes + prompt + model)
+VISION_CACHE_PATH = os.getenv(
+    "VISION_CACHE_PATH", os.path.join(DATA_DIR, "cache/vision_descriptions.db")
+)
+VISION_CACHE_MAX_BYTES = int(os.getenv("VISION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+####################################
+# WORKER ROLES
+####################################
+
+# Sub-app yang dilayani tiap peran worker; "vica" (auth, chat CRUD) selalu ikut
+# karena sub-app lain memakai auth dan model-nya
+WORKER_ROLE_PROFILES = {
+    "all": ["vica", "ollama", "azure-openai", "groq", "rag", "chainlit"],
+    "api": ["vica"],
+    "llm": ["vica", "ollama", "azure-openai", "groq"],
+    "rag": ["vica", "rag"],
+    "chainlit": ["vica", "chainlit"],
+}
+VICA_WORKER_ROLE = os.getenv("VICA_WORKER_ROLE", "all")
+# Salah ketik peran tidak boleh diam-diam menghasilkan worker tanpa sub-app
+if VICA_WORKER_ROLE not in WORKER_ROLE_PROFILES:
+    raise ValueError(
+        f"Unknown VICA_WORKER_ROLE '{VICA_WORKER_ROLE}', "
+        f"expected one of: {', '.join(WORKER_ROLE_PROFILES)}"
+    )
+# VICA_APPS (dipisah koma) menimpa profil peran, mis. VICA_APPS=vica,rag
+VICA_APPS = [
+    name.strip()
+    for name in os.getenv("VICA_APPS", ",".join(WORKER_ROLE_PROFILES[VICA_WORKER_ROLE])).split(",")
+    if name.strip()
+]
+_unknown_apps = [name for name in VICA_APPS if name not in WORKER_ROLE_PROFILES["all"]]
+if _unknown_apps:
+    raise ValueError(
+        f"Unknown sub-apps in VICA_APPS: {', '.join(_unknown_apps)}, "
+        f"expected any of: {', '.join(WORKER_ROLE_PROFILES['all'])}"
+    )
+# Sub-app di-import saat request pertama, bukan saat startup
+VICA_LAZY_MOUNTS = os.getenv("VICA_LAZY_MOUNTS", "true").lower() == "true"
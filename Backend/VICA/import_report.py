@@ -0,0 +1,130 @@
+"""Laporan waktu import dan RSS per sub-app.
+
+Setiap target di-import di proses Python baru dengan `-X importtime`, sehingga
+hasilnya mencerminkan cold start worker. Contoh:
+
+    python -m Backend.VICA.import_report
+    python -m Backend.VICA.import_report --role rag --top 15
+    python -m Backend.VICA.import_report --target VICA.apps.RAG.main
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ROOT_DIR = os.path.abspath(os.path.join(BACKEND_DIR, ".."))
+
+# Modul yang di-import untuk tiap sub-app (sama dengan SUB_APPS di main.py)
+APP_MODULES = {
+    "ollama": "VICA.apps.ollama.main",
+    "azure-openai": "VICA.apps.AzureOpenAi.main",
+    "groq": "VICA.apps.Groq.main",
+    "rag": "VICA.apps.RAG.main",
+    "vica": "VICA.apps.VICA.main",
+    "chainlit": "chainlit.utils",
+    "backend": "Backend.VICA.main",
+}
+
+IMPORTTIME_PATTERN = re.compile(r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+_CHILD_SCRIPT = """
+import sys, json, time, resource, importlib
+sys.path[:0] = {paths!r}
+started = time.perf_counter()
+importlib.import_module({module!r})
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": len(sys.modules),
+}}))
+"""
+
+
+def measure(module: str, env: Optional[Dict[str, str]] = None) -> dict:
+    """Import `module` di subprocess baru dan kumpulkan waktu, RSS, dan rincian importtime."""
+    script = _CHILD_SCRIPT.format(paths=[ROOT_DIR, BACKEND_DIR], module=module)
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=ROOT_DIR,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+    )
+
+    result = {"module": module, "ok": process.returncode == 0}
+    if process.returncode == 0:
+        result.update(json.loads(process.stdout.strip().splitlines()[-1]))
+    else:
+        result["error"] = (process.stderr.strip().splitlines() or ["unknown error"])[-1]
+    result["packages"] = _top_level_packages(process.stderr)
+    return result
+
+
+def _top_level_packages(importtime_output: str) -> List[Tuple[str, float]]:
+    # Jumlahkan waktu kumulatif import tingkat teratas per package
+    totals: Dict[str, float] = defaultdict(float)
+    for line in importtime_output.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, name = match.groups()
+        # Indentasi 1 spasi = import langsung dari modul target
+        if len(indent) <= 1:
+            totals[name.split(".")[0]] += int(cumulative_us) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def _format_report(results: List[dict], top: int) -> str:
+    lines = [f"{'target':<34} {'import (s)':>10} {'max RSS (MB)':>13} {'modules':>8}"]
+    for result in results:
+        if not result["ok"]:
+            lines.append(f"{result['module']:<34} {'failed':>10}  {result['error']}")
+            continue
+        lines.append(
+            f"{result['module']:<34} {result['seconds']:>10.2f} "
+            f"{result['max_rss_kb'] / 1024:>13.1f} {result['modules']:>8}"
+        )
+
+    for result in results:
+        if not result["packages"]:
+            continue
+        lines.append("")
+        lines.append(f"Slowest imports for {result['module']}:")
+        for name, seconds in result["packages"][:top]:
+            lines.append(f"  {name:<40} {seconds:>8.3f}s")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time and RSS report for VICA sub-apps.")
+    parser.add_argument("--role", help="Ukur aplikasi lengkap dengan VICA_WORKER_ROLE ini")
+    parser.add_argument("--target", action="append", help="Modul yang diukur (boleh berulang)")
+    parser.add_argument("--top", type=int, default=10, help="Jumlah package terlambat yang ditampilkan")
+    parser.add_argument("--eager", action="store_true", help="Nonaktifkan lazy mount (VICA_LAZY_MOUNTS=false)")
+    parser.add_argument("--json", action="store_true", help="Cetak hasil sebagai JSON")
+    args = parser.parse_args(argv)
+
+    env = {"VICA_LAZY_MOUNTS": "false" if args.eager else "true"}
+    if args.role:
+        env["VICA_WORKER_ROLE"] = args.role
+        targets = args.target or [APP_MODULES["backend"]]
+    else:
+        targets = args.target or list(APP_MODULES.values())
+
+    results = [measure(target, env) for target in targets]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(_format_report(results, args.top))
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import time
+import asyncio
+import logging
+import importlib
+import threading
+from typing import Any, Optional
+
+log = logging.getLogger(__name__)
+
+####################
+# LazyApp
+####################
+
+class LazyApp:
+    """ASGI app yang baru di-import saat request pertama masuk ke mount-nya.
+
+    `import_path` berformat "package.module:attribute", mis. "VICA.apps.RAG.main:app".
+    """
+
+    def __init__(self, import_path: str, name: Optional[str] = None) -> None:
+        self.import_path = import_path
+        self.name = name or import_path
+        self._app: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._app is not None
+
+    def load(self) -> Any:
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    module_name, _, attribute = self.import_path.partition(":")
+                    started = time.perf_counter()
+                    module = importlib.import_module(module_name)
+                    self._app = getattr(module, attribute or "app")
+                    log.info(
+                        f"Loaded sub-app '{self.name}' in {time.perf_counter() - started:.2f}s"
+                    )
+        return self._app
+
+    async def __call__(self, scope, receive, send) -> None:
+        app = self._app
+        if app is None:
+            # Import bisa memakan waktu beberapa detik; jangan blokir event loop
+            app = await asyncio.to_thread(self.load)
+        await app(scope, receive, send)
@@ -0,0 +1,57 @@
+"""add ingestion job table
+
+Revision ID: 5b7e2c91a4d3
+Revises: 18539217ecd1
+Create Date: 2026-10-18 09:12:40.512338
+
+"""
+import os
+import sys
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from migrations.utils import get_existing_tables
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c91a4d3'
+down_revision: Union[str, None] = '18539217ecd1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing_tables = set(get_existing_tables())
+
+    if "ingestion_job" not in existing_tables:
+        op.create_table(
+            "ingestion_job",
+            sa.Column("id", sa.String(), nullable=False),
+            sa.Column("user_id", sa.String(), sa.ForeignKey('user.id'), nullable=True),
+            sa.Column("chat_id", sa.String(), nullable=True),
+            sa.Column("filename", sa.Text(), nullable=True),
+            sa.Column("content_type", sa.String(), nullable=True),
+            sa.Column("file_path", sa.Text(), nullable=True),
+            sa.Column("status", sa.String(), nullable=True),
+            sa.Column("stage", sa.String(), nullable=True),
+            sa.Column("progress", sa.Float(), nullable=True),
+            sa.Column("error", sa.Text(), nullable=True),
+            sa.Column("attempts", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("started_at", sa.DateTime(), nullable=True),
+            sa.Column("completed_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_ingestion_job_status_created_at",
+            "ingestion_job",
+            ["status", "created_at"],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ingestion_job_status_created_at", table_name="ingestion_job")
+    op.drop_table("ingestion_job")
@@ -0,0 +1,51 @@
+"""add file collection_id
+
+Revision ID: 9c4d1e7f2a60
+Revises: 5b7e2c91a4d3
+Create Date: 2026-10-18 14:03:27.904215
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4d1e7f2a60'
+down_revision: Union[str, None] = '5b7e2c91a4d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("file", sa.Column("collection_id", sa.String(), nullable=True))
+
+    # Isi kolom baru dari meta file yang sudah ada
+    conn = op.get_bind()
+    file_table = sa.table(
+        "file",
+        sa.column("id", sa.String()),
+        sa.column("meta", sa.Text()),
+        sa.column("collection_id", sa.String()),
+    )
+    for file_id, meta in conn.execute(sa.select(file_table.c.id, file_table.c.meta)).fetchall():
+        collection_id = (json.loads(meta) or {}).get("collection_id") if meta else None
+        if collection_id is not None:
+            conn.execute(
+                file_table.update()
+                .where(file_table.c.id == file_id)
+                .values(collection_id=collection_id)
+            )
+
+    op.create_index(
+        "ix_file_user_id_collection_id",
+        "file",
+        ["user_id", "collection_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_file_user_id_collection_id", table_name="file")
+    with op.batch_alter_table("file") as batch_op:
+        batch_op.drop_column("collection_id")
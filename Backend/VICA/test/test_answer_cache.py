@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from Backend.VICA.apps.RAG.answer_cache import SemanticAnswerCache
+
+EMBEDDING = [0.6, 0.8, 0.0]
+
+
+def test_lookup_with_new_version_drops_answers():
+    cache = SemanticAnswerCache(threshold=0.9)
+    assert cache.lookup("kb", EMBEDDING, "v1") is None
+    assert cache.store("kb", "question", EMBEDDING, "answer", version="v1")
+    assert cache.lookup("kb", EMBEDDING, "v1") is not None
+
+    # File ditambah lewat worker lain: version dari database berubah
+    assert cache.lookup("kb", EMBEDDING, "v2") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_store_with_stale_version_is_rejected():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.lookup("kb", EMBEDDING, "v1")
+    cache.lookup("kb", EMBEDDING, "v2")
+
+    # Query yang dimulai sebelum ingestion selesai membawa version lama
+    assert not cache.store("kb", "question", EMBEDDING, "old answer", version="v1")
+    assert cache.lookup("kb", EMBEDDING, "v2") is None
+
+
+def test_invalidate_rejects_in_flight_answers():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.lookup("kb", EMBEDDING, "v1")
+    cache.invalidate("kb")
+
+    assert not cache.store("kb", "question", EMBEDDING, "old answer", version="v1")
+    cache.lookup("kb", EMBEDDING, "v2")
+    assert cache.store("kb", "question", EMBEDDING, "new answer", version="v2")
+    match = cache.lookup("kb", EMBEDDING, "v2")
+    assert match is not None and match[0].response == "new answer"
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+from llama_index.core.schema import MetadataMode, TextNode
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from Backend.VICA.apps.RAG.bm25 import BM25Index, match_expression
+from Backend.VICA.apps.RAG.embedding import attach_file_metadata
+
+METADATA = {
+    "collection_id": "collection-test",
+    "file_id": "file-test",
+    "filename": "report.pdf",
+    "user_id": "user-test",
+    "chat_id": "chat-test",
+}
+
+
+def _index_node(index, text, **node_kwargs):
+    node = attach_file_metadata(TextNode(text=text, **node_kwargs), dict(METADATA))
+    index.add_nodes("collection-test", "file-test", [node])
+    return node
+
+
+def test_sparse_hit_keeps_bookkeeping_metadata_out_of_llm_text(tmp_path):
+    index = BM25Index(str(tmp_path))
+    _index_node(index, "Quarterly revenue grew in the northern region.")
+
+    hits = index.search("collection-test", "northern revenue")
+    assert len(hits) == 1
+
+    node = hits[0].node
+    assert node.metadata["file_id"] == "file-test"
+    llm_text = node.get_content(metadata_mode=MetadataMode.LLM)
+    embed_text = node.get_content(metadata_mode=MetadataMode.EMBED)
+    for key in ("collection_id", "file_id", "user_id", "chat_id"):
+        assert METADATA[key] not in llm_text
+        assert METADATA[key] not in embed_text
+    assert "report.pdf" in llm_text
+
+
+def test_sparse_hit_restores_node_excluded_keys(tmp_path):
+    index = BM25Index(str(tmp_path))
+    original = _index_node(
+        index,
+        "region,revenue\nnorth,120",
+        metadata={"row_start": 1, "row_end": 1},
+        excluded_llm_metadata_keys=["row_start"],
+    )
+
+    node = index.search("collection-test", "north revenue")[0].node
+    assert node.node_id == original.node_id
+    assert "row_start" in node.excluded_llm_metadata_keys
+    assert "row_start" not in node.get_content(metadata_mode=MetadataMode.LLM)
+
+
+def test_search_ignores_stopwords_and_drop_file(tmp_path):
+    index = BM25Index(str(tmp_path))
+    _index_node(index, "Revenue table for the north region.")
+
+    assert match_expression("what is the revenue") == '"revenue"'
+    assert index.search("collection-test", "what is the") == []
+
+    index.drop_file("collection-test", "file-test")
+    assert index.search("collection-test", "revenue") == []
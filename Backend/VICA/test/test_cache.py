@@ -0,0 +1,79 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from Backend.VICA.apps.RAG import cache as cache_module
+from Backend.VICA.apps.RAG.cache import PersistentLRUCache, TTLCache
+
+
+def test_get_many_returns_only_present_keys(tmp_path):
+    cache = PersistentLRUCache(str(tmp_path / "cache.db"), max_bytes=1024)
+    cache.set_many({"a": b"1", "b": b"22"})
+
+    assert cache.get_many(["a", "missing", "b", "a"]) == {"a": b"1", "b": b"22"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bytes"]) == (2, 1, 3)
+
+
+def test_get_many_handles_more_keys_than_one_query(tmp_path):
+    cache = PersistentLRUCache(str(tmp_path / "cache.db"), max_bytes=1024 * 1024)
+    items = {f"key-{i}": str(i).encode() for i in range(PersistentLRUCache.MAX_BATCH_KEYS * 2 + 7)}
+    cache.set_many(items)
+
+    assert cache.get_many(list(items)) == items
+
+
+def test_set_many_evicts_least_recently_used(tmp_path):
+    cache = PersistentLRUCache(str(tmp_path / "cache.db"), max_bytes=4)
+    cache.set("old", b"12")
+    cache.set("recent", b"34")
+    cache.get_many(["old"])
+
+    # Melebihi batas: entri yang paling lama tidak diakses dibuang lebih dulu
+    cache.set_many({"new": b"56"})
+    assert cache.get_many(["old", "recent", "new"]) == {"old": b"12", "new": b"56"}
+    assert cache.stats()["bytes"] == 4
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_ttl_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache(max_entries=8, ttl=60)
+    cache.set("a", 1)
+
+    now[0] += 59
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a", "expired") == "expired"
+    assert cache.stats()["entries"] == 0
+
+
+def test_ttl_cache_get_or_create_skips_none():
+    cache = TTLCache(max_entries=8, ttl=60)
+    calls = []
+
+    def factory(value):
+        def create():
+            calls.append(value)
+            return value
+        return create
+
+    # Collection yang belum ada (None) dicek ulang pada panggilan berikutnya
+    assert cache.get_or_create("kb", factory(None)) is None
+    assert cache.get_or_create("kb", factory("handle")) == "handle"
+    assert cache.get_or_create("kb", factory("other")) == "handle"
+    assert calls == [None, "handle"]
+
+    cache.delete("kb")
+    assert cache.get_or_create("kb", factory("new")) == "new"
@@ -0,0 +1,62 @@
+import io
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+from llama_index.core.schema import MetadataMode
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from Backend.VICA.apps.RAG.csv_ingest import CSVChunker
+
+CSV_CONTENT = "region,revenue\nnorth,120\nsouth,80\n\neast,95\nwest,60\n"
+
+
+def _chunks(content, max_tokens):
+    # Tokenizer sederhana: satu token per kata
+    return list(CSVChunker(max_tokens=max_tokens, tokenizer=str.split).iter_chunks(io.StringIO(content)))
+
+
+def test_chunks_repeat_header_and_keep_whole_rows():
+    # Header dan tiap baris masing-masing 2 token (termasuk pemisah baris)
+    chunks = _chunks(CSV_CONTENT, max_tokens=6)
+
+    assert [chunk.text for chunk in chunks] == [
+        "region,revenue\nnorth,120\nsouth,80",
+        "region,revenue\neast,95\nwest,60",
+    ]
+    # Baris kosong dilewati tetapi tetap dihitung pada nomor baris
+    assert [(chunk.row_start, chunk.row_end) for chunk in chunks] == [(1, 2), (4, 5)]
+    assert chunks[0].columns == ["region", "revenue"]
+
+
+def test_quoted_cells_stay_intact():
+    content = 'name,notes\nacme,"late, then paid"\nglobex,"line one\nline two"\n'
+    chunks = _chunks(content, max_tokens=100)
+
+    assert len(chunks) == 1
+    assert chunks[0].text == 'name,notes\nacme,"late, then paid"\nglobex,"line one\nline two"'
+    assert (chunks[0].row_start, chunks[0].row_end) == (1, 2)
+
+
+def test_oversized_row_gets_own_chunk():
+    content = "id,text\n1,short\n2," + " ".join(["word"] * 20) + "\n3,short\n"
+    chunks = _chunks(content, max_tokens=6)
+
+    assert [(chunk.row_start, chunk.row_end) for chunk in chunks] == [(1, 1), (2, 2), (3, 3)]
+
+
+def test_empty_file_has_no_chunks():
+    assert _chunks("", max_tokens=10) == []
+    assert _chunks("region,revenue\n", max_tokens=10) == []
+
+
+def test_row_metadata_not_embedded():
+    node = _chunks(CSV_CONTENT, max_tokens=100)[0].to_node()
+
+    assert node.metadata["row_start"] == 1
+    assert node.metadata["row_end"] == 5
+    assert "row_start" not in node.get_content(metadata_mode=MetadataMode.EMBED)
+    # Rentang baris tetap terlihat oleh LLM untuk sitasi
+    assert "row_start" in node.get_content(metadata_mode=MetadataMode.LLM)
@@ -0,0 +1,190 @@
+import os
+import sys
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from Backend.VICA.apps.RAG.describer import PageDescriber, parse_batch_descriptions
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "### Image 1\nfirst\n### Image 2\nsecond",
+        "**Image 1**\nfirst\n**Image 2**\nsecond",
+        "**Image 1:** first\n**Image 2:** second",
+        "Image 1: first\nImage 2: second",
+        "1. Image 1 - first\n2. Image 2 - second",
+        "1.\nfirst\n2.\nsecond",
+    ],
+)
+def test_parse_batch_header_formats(text):
+    assert parse_batch_descriptions(text, 2) == ["first", "second"]
+
+
+def test_parse_batch_keeps_text_on_header_line():
+    text = "### Image 1\nfirst\n## Image 2: chart of monthly sales"
+    assert parse_batch_descriptions(text, 2) == ["first", "chart of monthly sales"]
+
+
+def test_parse_batch_ignores_numbered_lists_inside_descriptions():
+    text = "### 1. Chart\n1. Analyze trends\n2. Note outliers\n### 2. Table\nsecond"
+    assert parse_batch_descriptions(text, 2) == [
+        "Chart\n1. Analyze trends\n2. Note outliers",
+        "Table\nsecond",
+    ]
+
+
+def test_parse_batch_missing_sections_are_none():
+    assert parse_batch_descriptions("### Image 2\nsecond", 3) == [None, "second", None]
+    assert parse_batch_descriptions("no sections at all", 2) == [None, None]
+    assert parse_batch_descriptions(None, 1) == [None]
+
+
+def _describer(batch_fn, calls, **kwargs):
+    async def describe_fn(image):
+        calls.append(image)
+        return f"single {image}"
+
+    return PageDescriber(describe_fn, retry_backoff=0, batch_fn=batch_fn, **kwargs)
+
+
+def test_partial_batch_parse_falls_back_per_page():
+    single_calls = []
+
+    async def batch_fn(images):
+        return [f"batch {images[0]}", None, f"batch {images[2]}"]
+
+    describer = _describer(batch_fn, single_calls, batch_size=3)
+    report = asyncio.run(describer.describe([(1, "a"), (2, "b"), (3, "c")]))
+
+    assert [page.description for page in report.pages] == ["batch a", "single b", "batch c"]
+    assert single_calls == ["b"]
+
+
+def test_unparseable_batches_switch_to_single_requests():
+    batch_calls, single_calls = [], []
+
+    async def batch_fn(images):
+        batch_calls.append(images)
+        return [None] * len(images)
+
+    describer = _describer(batch_fn, single_calls, batch_size=2, concurrency=1, max_unparsed_batches=2)
+    pages = [(n, f"img{n}") for n in range(1, 9)]
+    report = asyncio.run(describer.describe(pages))
+
+    assert report.failed_pages == []
+    assert len(report.pages) == 8
+    # Setelah 2 batch gagal diparse, sisa halaman tidak lagi dikirim sebagai batch
+    assert len(batch_calls) <= 3
+    assert len(single_calls) == 8
+
+
+def test_request_descriptions_caches_only_parsed_images(tmp_path):
+    for module in ("groq", "fastapi", "pdf2image", "pdfminer", "dotenv"):
+        pytest.importorskip(module)
+    from Backend.VICA.apps.RAG.cache import PersistentLRUCache
+    from Backend.VICA.apps.RAG.pdf import BATCH_PROMPTS, PDFService
+
+    def create(**kwargs):
+        content = "### Image 1\nfirst"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    client = SimpleNamespace(
+        base_url=None, chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    cache = PersistentLRUCache(str(tmp_path / "vision.db"), max_bytes=1024 * 1024)
+    service = PDFService(client, cache=cache)
+
+    images = ["aW1hZ2Ux", "aW1hZ2Uy"]
+    assert asyncio.run(service._request_descriptions(images)) == ["first", None]
+    # Hasil batch disimpan dengan key batch, gambar yang tidak terbaca tidak disimpan
+    assert service._cache_get(images[0]) is None
+    assert service._cache_get(images[0], BATCH_PROMPTS) == "first"
+    assert service._cache_get(images[1], BATCH_PROMPTS) is None
+
+
+def test_describe_retries_and_reports_failed_pages():
+    attempts = {}
+
+    async def describe_fn(image):
+        attempts[image] = attempts.get(image, 0) + 1
+        if image == "broken" or (image == "flaky" and attempts[image] < 2):
+            raise RuntimeError(f"{image} failed")
+        return f"description of {image}"
+
+    describer = PageDescriber(describe_fn, retries=2, retry_backoff=0)
+    report = asyncio.run(describer.describe([(1, "ok"), (2, "flaky"), (3, "broken")]))
+
+    assert [(page.page_number, page.attempts) for page in report.pages] == [(1, 1), (2, 2), (3, 3)]
+    assert report.failed_pages == [3]
+    assert report.pages[2].error == "broken failed"
+    # Halaman gagal tidak masuk ke teks gabungan
+    assert "broken" not in report.text
+    assert "description of flaky" in report.text
+
+
+def test_describe_times_out_slow_pages():
+    async def describe_fn(image):
+        if image == "slow":
+            await asyncio.sleep(1)
+        return image
+
+    describer = PageDescriber(describe_fn, timeout=0.01, retries=0)
+    report = asyncio.run(describer.describe([(1, "slow"), (2, "fast")]))
+
+    assert report.failed_pages == [1]
+    assert report.pages[0].error.startswith("Timed out")
+    assert report.pages[1].description == "fast"
+
+
+def test_describe_limits_concurrency():
+    running = []
+    peak = []
+
+    async def describe_fn(image):
+        running.append(image)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(image)
+        return image
+
+    describer = PageDescriber(describe_fn, concurrency=2)
+    report = asyncio.run(describer.describe([(n, str(n)) for n in range(1, 7)]))
+
+    assert max(peak) == 2
+    assert [page.page_number for page in report.pages] == [1, 2, 3, 4, 5, 6]
+
+
+def test_stream_yields_in_source_order_as_pages_finish():
+    finished = []
+
+    async def describe_fn(image):
+        # Halaman awal paling lambat selesai
+        await asyncio.sleep(0.03 / int(image))
+        finished.append(int(image))
+        return image
+
+    async def collect():
+        describer = PageDescriber(describe_fn, concurrency=3)
+        return [page.page_number async for page in describer.stream([(n, str(n)) for n in (1, 2, 3)])]
+
+    assert asyncio.run(collect()) == [1, 2, 3]
+    assert finished == [3, 2, 1]
+
+
+def test_stream_propagates_source_errors():
+    async def pages():
+        yield 1, "1"
+        raise RuntimeError("rasterization failed")
+
+    async def describe_fn(image):
+        return image
+
+    async def collect():
+        return [page async for page in PageDescriber(describe_fn).stream(pages())]
+
+    with pytest.raises(RuntimeError, match="rasterization failed"):
+        asyncio.run(collect())
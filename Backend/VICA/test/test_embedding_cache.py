@@ -0,0 +1,133 @@
+import io
+import os
+import sys
+import uuid
+import asyncio
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from Backend.VICA.apps.RAG import cache as cache_module
+from Backend.VICA.apps.RAG import embedding as embedding_module
+from Backend.VICA.apps.RAG.cache import PersistentLRUCache, TTLCache
+from Backend.VICA.apps.RAG.csv_ingest import CSVChunker
+from Backend.VICA.apps.RAG.embedding import EmbeddingService, attach_file_metadata
+
+CSV_CONTENT = "region,revenue\nnorth,120\nsouth,80\neast,95\nwest,60\n"
+
+
+class CountingEmbedModel:
+    model_name = "counting-test-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def aget_text_embedding_batch(self, texts):
+        self.calls += 1
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+
+def _upload_nodes(file_id):
+    # Sama seperti ingestion: chunk CSV lalu tempel metadata per upload
+    metadata = {
+        "collection_id": "collection-test",
+        "file_id": file_id,
+        "filename": "sales.csv",
+        "user_id": "user-test",
+        "chat_id": "chat-test",
+    }
+    chunker = CSVChunker(max_tokens=8, tokenizer=str.split)
+    return [
+        attach_file_metadata(chunk.to_node(), metadata)
+        for chunk in chunker.iter_chunks(io.StringIO(CSV_CONTENT))
+    ]
+
+
+def test_reupload_hits_embedding_cache(tmp_path):
+    embed_model = CountingEmbedModel()
+    cache = PersistentLRUCache(str(tmp_path / "embeddings.db"), max_bytes=1024 * 1024)
+    service = EmbeddingService(embed_model, batch_size=2, cache=cache)
+
+    first = asyncio.run(service.aembed_nodes(_upload_nodes(str(uuid.uuid4()))))
+    assert embed_model.calls > 0
+
+    # File yang sama di-upload ulang dengan file_id berbeda: tidak ada panggilan API
+    embed_model.calls = 0
+    second = asyncio.run(service.aembed_nodes(_upload_nodes(str(uuid.uuid4()))))
+    assert embed_model.calls == 0
+    assert [node.embedding for node in second] == [node.embedding for node in first]
+
+
+def test_file_metadata_kept_out_of_embed_and_llm_text():
+    node = _upload_nodes("file-test")[0]
+
+    assert node.metadata["file_id"] == "file-test"
+    for key in ("collection_id", "file_id", "user_id", "chat_id"):
+        assert key in node.excluded_embed_metadata_keys
+        assert key in node.excluded_llm_metadata_keys
+
+
+class FlakyQueryModel:
+    model_name = "flaky-query-model"
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+
+    def get_query_embedding(self, query):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("embedding API unavailable")
+        return [float(len(query)), 0.0]
+
+    async def aget_query_embedding(self, query):
+        return self.get_query_embedding(query)
+
+
+def test_query_cache_normalizes_question():
+    embed_model = FlakyQueryModel()
+    service = EmbeddingService(embed_model, query_cache=TTLCache(8, ttl=60))
+
+    first = service.embed_query("Total  revenue per region?")
+    # Beda spasi dan huruf besar/kecil: tetap dari cache
+    assert asyncio.run(service.aembed_query("total revenue PER region? ")) == first
+    assert embed_model.calls == 1
+    assert service.query_stats()["hits"] == 1
+
+
+def test_query_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    embed_model = FlakyQueryModel()
+    service = EmbeddingService(embed_model, query_cache=TTLCache(8, ttl=60))
+
+    service.embed_query("question")
+    now[0] += 61
+    service.embed_query("question")
+    assert embed_model.calls == 2
+
+
+def test_persisted_query_embeddings_survive_restart(tmp_path):
+    disk = PersistentLRUCache(str(tmp_path / "embeddings.db"), max_bytes=1024 * 1024)
+    first = EmbeddingService(FlakyQueryModel(), cache=disk, query_cache=TTLCache(8, ttl=60), persist_queries=True)
+    embedding = asyncio.run(first.aembed_query("question"))
+
+    # Worker baru: cache memori kosong, vektor dibaca dari disk
+    embed_model = FlakyQueryModel()
+    second = EmbeddingService(embed_model, cache=disk, query_cache=TTLCache(8, ttl=60), persist_queries=True)
+    assert asyncio.run(second.aembed_query("question")) == embedding
+    assert embed_model.calls == 0
+
+
+def test_sync_query_embedding_is_retried(monkeypatch):
+    monkeypatch.setattr(embedding_module.time, "sleep", lambda delay: None)
+    embed_model = FlakyQueryModel(failures=2)
+    service = EmbeddingService(embed_model, retries=2)
+
+    assert service.embed_query("question") == [8.0, 0.0]
+    assert embed_model.calls == 3
+
+    with pytest.raises(RuntimeError):
+        EmbeddingService(FlakyQueryModel(failures=3), retries=2).embed_query("question")
@@ -0,0 +1,89 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic")
+pytest.importorskip("dotenv")
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from VICA.apps.VICA.models import file as file_module
+from VICA.apps.VICA.models.file import File, Files
+
+USER_ID = "user-test"
+
+
+@pytest.fixture(autouse=True)
+def memory_db(monkeypatch):
+    # Database sementara di memori, bukan data/vica.db
+    engine = create_engine("sqlite://")
+    File.__table__.create(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+    @contextmanager
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(file_module, "get_db", get_db)
+    yield
+    engine.dispose()
+
+
+def _insert(file_id, collection_id, filename="report.pdf", content_hash="hash-a"):
+    return Files.insert_new_file(
+        file_id,
+        USER_ID,
+        filename,
+        {"collection_id": collection_id, "content_hash": content_hash},
+    )
+
+
+def test_files_are_filtered_by_collection():
+    _insert("file-1", "collection-a")
+    _insert("file-2", "collection-b")
+    _insert("file-3", "collection-a", filename="other.pdf", content_hash="hash-b")
+
+    assert [f.id for f in Files.get_files_by_collection_id(USER_ID, "collection-a")] == ["file-1", "file-3"]
+    assert Files.get_files_by_collection_id("other-user", "collection-a") == []
+
+
+def test_duplicate_lookup_by_content_hash():
+    _insert("file-1", "collection-a")
+
+    assert Files.get_file_by_collection_id_and_hash(USER_ID, "collection-a", "hash-a").id == "file-1"
+    # Hash yang sama di collection lain bukan duplikat
+    assert Files.get_file_by_collection_id_and_hash(USER_ID, "collection-b", "hash-a") is None
+
+
+def test_replace_in_place_changes_version():
+    _insert("file-1", "collection-a")
+    before = Files.get_collection_version(USER_ID, "collection-a")
+
+    # Upload ulang dengan nama sama tetapi isi berbeda: file lama ditemukan lalu diganti
+    previous = Files.get_files_by_collection_id_and_filename(USER_ID, "collection-a", "report.pdf")
+    assert [f.id for f in previous] == ["file-1"]
+    _insert("file-2", "collection-a", content_hash="hash-b")
+    Files.delete_file_by_id("file-1")
+
+    after = Files.get_collection_version(USER_ID, "collection-a")
+    assert after != before
+    assert [f.id for f in Files.get_files_by_collection_id(USER_ID, "collection-a")] == ["file-2"]
+    # Collection lain tidak terpengaruh
+    assert Files.get_collection_version(USER_ID, "collection-b") == Files.get_collection_version(USER_ID, "collection-c")
+
+
+def test_delete_files_by_collection_id():
+    _insert("file-1", "collection-a")
+    _insert("file-2", "collection-b")
+
+    assert Files.delete_files_by_collection_id(USER_ID, "collection-a")
+    assert Files.get_files_by_collection_id(USER_ID, "collection-a") == []
+    assert len(Files.get_files_by_collection_id(USER_ID, "collection-b")) == 1
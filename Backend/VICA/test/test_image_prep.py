@@ -0,0 +1,56 @@
+import os
+import sys
+import base64
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from Backend.VICA.apps.RAG.image_prep import UnsupportedImageError, VisionImagePreparer
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10"><rect width="10" height="10"/></svg>'
+
+
+def _encode(image, format):
+    buffered = BytesIO()
+    image.save(buffered, format=format)
+    return buffered.getvalue()
+
+
+def _decoded(prepared):
+    return Image.open(BytesIO(base64.b64decode(prepared.base64)))
+
+
+def test_small_jpeg_is_sent_unchanged():
+    data = _encode(Image.new("RGB", (64, 64), (200, 30, 30)), "JPEG")
+    prepared = VisionImagePreparer().prepare_bytes(data)
+
+    assert base64.b64decode(prepared.base64) == data
+    assert prepared.mime_type == "image/jpeg"
+
+
+def test_png_is_reencoded_as_jpeg():
+    data = _encode(Image.new("RGBA", (2000, 1000), (30, 30, 200, 128)), "PNG")
+    prepared = VisionImagePreparer(max_side=1000).prepare_bytes(data)
+
+    image = _decoded(prepared)
+    assert image.format == "JPEG"
+    assert image.size == (1000, 500)
+    assert prepared.mime_type == "image/jpeg"
+    assert prepared.original_bytes == len(data)
+
+
+@pytest.mark.parametrize("data", [SVG, b"not an image", b"\x89PNG\r\n\x1a\n truncated"])
+def test_unreadable_images_are_rejected(data):
+    with pytest.raises(UnsupportedImageError):
+        VisionImagePreparer().prepare_bytes(data)
+
+
+def test_decompression_bomb_is_rejected(monkeypatch):
+    data = _encode(Image.new("L", (100, 100)), "PNG")
+    # Batas piksel diturunkan agar gambar kecil ini dianggap decompression bomb
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+
+    with pytest.raises(UnsupportedImageError):
+        VisionImagePreparer().prepare_bytes(data)
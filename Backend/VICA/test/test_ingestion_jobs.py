@@ -0,0 +1,137 @@
+import os
+import sys
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic")
+pytest.importorskip("dotenv")
+pytest.importorskip("fastapi")
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from VICA.apps.VICA.models import ingestion_job as job_module
+from VICA.apps.VICA.models.ingestion_job import IngestionJob, IngestionJobs
+from Backend.VICA.apps.RAG.jobs import IngestionJobQueue
+
+STALE_AFTER = timedelta(seconds=120)
+
+
+@pytest.fixture(autouse=True)
+def memory_db(monkeypatch):
+    # Database sementara di memori, bukan data/vica.db; dipakai bersama oleh thread worker
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    IngestionJob.__table__.create(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+    @contextmanager
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(job_module, "get_db", get_db)
+    yield get_db
+    engine.dispose()
+
+
+def _insert(job_id, file_path="upload"):
+    return IngestionJobs.insert_new_job("user-test", "chat-test", "report.pdf", "application/pdf", file_path, job_id)
+
+
+def _age(get_db, job_id, seconds):
+    # Simulasikan heartbeat terakhir beberapa detik yang lalu
+    with get_db() as db:
+        db.query(IngestionJob).filter_by(id=job_id).update(
+            {"updated_at": datetime.utcnow() - timedelta(seconds=seconds)}
+        )
+        db.commit()
+
+
+def test_claim_takes_oldest_job_once():
+    _insert("job-1")
+    _insert("job-2")
+
+    first = IngestionJobs.claim_next_job()
+    second = IngestionJobs.claim_next_job()
+
+    assert (first.id, first.status, first.attempts) == ("job-1", "running", 1)
+    assert second.id == "job-2"
+    assert IngestionJobs.claim_next_job() is None
+
+
+def test_stale_running_job_is_requeued(memory_db):
+    _insert("job-stale")
+    _insert("job-alive")
+    IngestionJobs.claim_next_job()
+    IngestionJobs.claim_next_job()
+    _age(memory_db, "job-stale", 300)
+
+    assert IngestionJobs.requeue_stale_jobs(STALE_AFTER, max_attempts=3) == 1
+    assert IngestionJobs.get_job_by_id("job-stale").status == "queued"
+    assert IngestionJobs.get_job_by_id("job-alive").status == "running"
+
+    # Diambil ulang dengan attempts bertambah
+    reclaimed = IngestionJobs.claim_next_job()
+    assert (reclaimed.id, reclaimed.attempts) == ("job-stale", 2)
+
+
+def test_stale_job_fails_after_max_attempts(memory_db):
+    _insert("job-1")
+    IngestionJobs.claim_next_job()
+    _age(memory_db, "job-1", 300)
+
+    assert IngestionJobs.requeue_stale_jobs(STALE_AFTER, max_attempts=1) == 0
+    job = IngestionJobs.get_job_by_id("job-1")
+    assert job.status == "failed"
+    assert "interrupted" in job.error
+
+
+class FakeRAGService:
+    def __init__(self, error=None):
+        self.error = error
+        self.received = None
+
+    async def create_knowledge_base(self, user_id, chat_id, source, progress=None):
+        self.received = bytes(source.view())
+        await progress("embedding", 0.5)
+        if self.error is not None:
+            raise self.error
+        return "created"
+
+
+def test_run_marks_job_completed_and_removes_upload(tmp_path):
+    upload = tmp_path / "job-1"
+    upload.write_bytes(b"%PDF-1.4 test")
+    _insert("job-1", str(upload))
+    service = FakeRAGService()
+    queue = IngestionJobQueue(lambda: service, str(tmp_path))
+
+    asyncio.run(queue._run(IngestionJobs.claim_next_job()))
+
+    job = IngestionJobs.get_job_by_id("job-1")
+    assert (job.status, job.stage, job.progress) == ("completed", "created", 1.0)
+    assert service.received == b"%PDF-1.4 test"
+    assert not upload.exists()
+
+
+def test_run_records_failure(tmp_path):
+    upload = tmp_path / "job-1"
+    upload.write_bytes(b"%PDF-1.4 test")
+    _insert("job-1", str(upload))
+    queue = IngestionJobQueue(lambda: FakeRAGService(RuntimeError("qdrant down")), str(tmp_path))
+
+    asyncio.run(queue._run(IngestionJobs.claim_next_job()))
+
+    job = IngestionJobs.get_job_by_id("job-1")
+    assert (job.status, job.stage, job.error) == ("failed", "embedding", "qdrant down")
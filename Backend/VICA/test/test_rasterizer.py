@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pdf2image")
+pytest.importorskip("fastapi")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from Backend.VICA.apps.RAG import rasterizer as rasterizer_module
+from Backend.VICA.apps.RAG.image_prep import VisionImagePreparer
+from Backend.VICA.apps.RAG.rasterizer import PDFRasterizer
+
+A4 = (595.0, 842.0)
+A0 = (2384.0, 3370.0)
+MB = 1024 * 1024
+
+
+def _rasterizer(**kwargs):
+    kwargs.setdefault("preparer", VisionImagePreparer(max_side=1120, max_dpi=200))
+    return PDFRasterizer(dpi=200, **kwargs)
+
+
+def test_large_page_does_not_lower_dpi_of_other_pages():
+    rasterizer = _rasterizer(window_size=4, max_job_memory=256 * MB)
+    pages = list(range(1, 11))
+    sizes = {page: A0 if page == 5 else A4 for page in pages}
+
+    windows = rasterizer._plan(pages, sizes)
+
+    a4_dpi = rasterizer.preparer.target_dpi(A4)
+    assert windows == [(1, 4, a4_dpi), (5, 5, 72), (6, 9, a4_dpi), (10, 10, a4_dpi)]
+
+
+def test_page_over_budget_gets_lower_dpi():
+    rasterizer = _rasterizer(preparer=VisionImagePreparer(max_side=4000, max_dpi=200))
+    budget = rasterizer._bitmap_bytes(A4, 200) // 2
+
+    assert rasterizer._page_dpi(A4, rasterizer._bitmap_bytes(A4, 200)) == 200
+    dpi = rasterizer._page_dpi(A4, budget)
+    assert 72 <= dpi < 200
+    assert rasterizer._bitmap_bytes(A4, dpi) <= budget
+
+
+def test_windows_respect_budget_size_and_gaps():
+    rasterizer = _rasterizer(window_size=3)
+    sizes = {page: A4 for page in (1, 2, 3, 4, 6, 7)}
+    dpis = {page: 100 for page in sizes}
+    page_bytes = rasterizer._bitmap_bytes(A4, 100)
+
+    # Maks. 3 halaman per jendela, halaman 5 tidak diminta sehingga 6-7 jendela baru
+    assert rasterizer._windows(list(sizes), sizes, dpis, 100 * page_bytes) == [
+        (1, 3, 100), (4, 4, 100), (6, 7, 100)
+    ]
+    # Budget hanya cukup untuk 2 halaman per jendela
+    assert rasterizer._windows(list(sizes), sizes, dpis, 2 * page_bytes) == [
+        (1, 2, 100), (3, 4, 100), (6, 7, 100)
+    ]
+
+
+def test_in_flight_pages_are_reserved_from_budget():
+    preparer = VisionImagePreparer(max_payload_bytes=MB)
+
+    assert _rasterizer(max_job_memory=64 * MB, preparer=preparer)._render_budget() == 64 * MB
+    assert _rasterizer(max_job_memory=64 * MB, preparer=preparer, in_flight_pages=16)._render_budget() == 48 * MB
+    # Budget render tidak pernah di bawah seperempat batas job
+    assert _rasterizer(max_job_memory=64 * MB, preparer=preparer, in_flight_pages=100)._render_budget() == 16 * MB
+
+
+def test_page_sizes_read_per_page(monkeypatch):
+    def fake_pdfinfo(pdf_path, first_page=None, last_page=None):
+        assert (first_page, last_page) == (2, 4)
+        return {
+            "Pages": "4",
+            "Page    2 size": "595 x 842 pts (A4)",
+            "Page    3 size": "2384 x 3370 pts (A0)",
+        }
+
+    monkeypatch.setattr(rasterizer_module, "pdfinfo_from_path", fake_pdfinfo)
+    sizes = _rasterizer()._page_sizes("doc.pdf", [2, 3, 4], (612.0, 792.0))
+
+    assert sizes == {2: A4, 3: A0, 4: (612.0, 792.0)}
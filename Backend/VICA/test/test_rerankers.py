@@ -0,0 +1,100 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+from llama_index.core.schema import NodeWithScore, TextNode
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from Backend.VICA.apps.RAG.rerankers import (
+    FallbackReranker,
+    Reranker,
+    build_reranker,
+    ranking_agreement,
+    reciprocal_rank_fusion,
+)
+
+
+def _ranking(*node_ids):
+    return [
+        NodeWithScore(node=TextNode(id_=node_id, text=f"text of {node_id}"), score=1.0)
+        for node_id in node_ids
+    ]
+
+
+def _ids(candidates):
+    return [candidate.node.node_id for candidate in candidates]
+
+
+class FailingReranker(Reranker):
+    name = "failing"
+
+    def __init__(self):
+        self.calls = 0
+
+    def rerank(self, question, candidates, top_n, confidence=0.0):
+        self.calls += 1
+        raise RuntimeError("remote reranker unavailable")
+
+    async def arerank(self, question, candidates, top_n, confidence=0.0):
+        self.calls += 1
+        raise RuntimeError("remote reranker unavailable")
+
+
+class ReversingReranker(Reranker):
+    name = "reversing"
+
+    def rerank(self, question, candidates, top_n, confidence=0.0):
+        return list(reversed(candidates))[:top_n]
+
+
+def test_rrf_scores_and_order():
+    fused = reciprocal_rank_fusion([_ranking("a", "b", "c"), _ranking("b", "d")], k=60)
+
+    assert _ids(fused) == ["b", "a", "d", "c"]
+    assert fused[0].score == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[1].score == pytest.approx(1 / 61)
+
+
+def test_rrf_prefers_node_from_first_ranking():
+    dense = _ranking("a")
+    sparse = [NodeWithScore(node=TextNode(id_="a", text="sparse copy"), score=9.0)]
+
+    fused = reciprocal_rank_fusion([dense, sparse])
+    assert fused[0].node is dense[0].node
+
+
+def test_ranking_agreement():
+    assert ranking_agreement(_ranking("a", "b", "c"), _ranking("c", "b", "a"), 3) == 1.0
+    assert ranking_agreement(_ranking("a", "b", "c"), _ranking("a", "b", "x"), 3) == pytest.approx(2 / 3)
+    assert ranking_agreement(_ranking("a", "b", "c"), _ranking("x", "y", "z"), 3) == 0.0
+    assert ranking_agreement(_ranking("a", "b"), [], 3) == 0.0
+    # Kurang dari top_n kandidat dense: dibandingkan dengan jumlah yang ada
+    assert ranking_agreement(_ranking("a"), _ranking("a", "b"), 3) == 1.0
+
+
+def test_default_confidence_accepts_two_of_three():
+    agreement = ranking_agreement(_ranking("a", "b", "c"), _ranking("a", "b", "x"), 3)
+    reranker = build_reranker("auto", rerank_client=object())
+
+    assert reranker._confident(agreement)
+
+
+def test_fallback_reranker_uses_fallback_on_failure():
+    primary = FailingReranker()
+    reranker = FallbackReranker(primary, ReversingReranker())
+    candidates = _ranking("a", "b", "c")
+
+    assert _ids(reranker.rerank("question", candidates, 2)) == ["c", "b"]
+    assert _ids(asyncio.run(reranker.arerank("question", candidates, 2))) == ["c", "b"]
+    assert primary.calls == 2
+
+
+def test_fallback_reranker_skips_primary_when_confident():
+    primary = FailingReranker()
+    reranker = FallbackReranker(primary, ReversingReranker(), min_confidence=0.66)
+
+    assert _ids(reranker.rerank("question", _ranking("a", "b"), 2, confidence=1.0)) == ["b", "a"]
+    assert primary.calls == 0
@@ -0,0 +1,105 @@
+import io
+import os
+import sys
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from Backend.VICA.apps.RAG.tabular import (
+    TabularStore,
+    TextToSQLEngine,
+    _read_only_authorizer,
+    is_tabular_question,
+)
+
+COLLECTION_ID = "collection-test"
+CSV_CONTENT = "region,revenue\nnorth,120\nsouth,80\neast,95\n"
+
+
+class FakeLLM:
+    """Kembalikan SQL yang sudah ditentukan, lalu jawaban tetap untuk prompt jawaban."""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.prompts = []
+
+    def complete(self, prompt):
+        self.prompts.append(prompt)
+        text = self.sql if prompt.rstrip().endswith("SQL:") else "answer"
+        return SimpleNamespace(text=text)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TabularStore(str(tmp_path))
+    store.load_csv(COLLECTION_ID, "file-test", "sales.csv", io.StringIO(CSV_CONTENT))
+    return store
+
+
+def _table_name(store):
+    return store.list_tables(COLLECTION_ID)[0].table_name
+
+
+def test_authorizer_rejects_delete(store):
+    table = _table_name(store)
+    conn = sqlite3.connect(store.db_path(COLLECTION_ID))
+    try:
+        conn.set_authorizer(_read_only_authorizer)
+        with pytest.raises(sqlite3.DatabaseError, match="not authorized"):
+            conn.execute(f'DELETE FROM "{table}"')
+    finally:
+        conn.close()
+
+
+def test_query_rejects_delete_hidden_in_cte(store):
+    # Lolos pemeriksaan awalan SELECT/WITH, harus ditolak authorizer
+    table = _table_name(store)
+    with pytest.raises(sqlite3.DatabaseError):
+        store.query(COLLECTION_ID, f'WITH doomed AS (SELECT 1) DELETE FROM "{table}"')
+
+    _, rows, _ = store.query(COLLECTION_ID, f'SELECT COUNT(*) FROM "{table}"')
+    assert rows == [(3,)]
+
+
+def test_query_rejects_multiple_statements(store):
+    table = _table_name(store)
+    with pytest.raises(ValueError):
+        store.query(COLLECTION_ID, f'SELECT * FROM "{table}"; DROP TABLE "{table}"')
+
+    conn = sqlite3.connect(store.db_path(COLLECTION_ID))
+    try:
+        conn.set_authorizer(_read_only_authorizer)
+        with pytest.raises((sqlite3.DatabaseError, sqlite3.ProgrammingError, sqlite3.Warning)):
+            conn.execute(f'SELECT * FROM "{table}"; DROP TABLE "{table}"')
+    finally:
+        conn.close()
+
+
+def test_tabular_question_requires_schema_mention(store):
+    tables = store.list_tables(COLLECTION_ID)
+
+    assert is_tabular_question("What is the total revenue per region?", tables)
+    assert not is_tabular_question("How many pages does the report have?", tables)
+    assert not is_tabular_question("Summarize the document.", tables)
+
+
+def test_zero_rows_falls_back(store):
+    table = _table_name(store)
+    llm = FakeLLM(f'SELECT SUM("revenue") FROM "{table}" WHERE "region" = \'west\' GROUP BY "region"')
+    engine = TextToSQLEngine(store, llm)
+
+    assert engine.answer(COLLECTION_ID, "What is the total revenue for region west?") is None
+    # Tidak ada prompt jawaban yang dikirim untuk hasil kosong
+    assert len(llm.prompts) == 1
+
+
+def test_rows_are_answered_with_sql(store):
+    table = _table_name(store)
+    engine = TextToSQLEngine(store, FakeLLM(f'SELECT SUM("revenue") FROM "{table}"'))
+
+    result = engine.answer(COLLECTION_ID, "What is the total revenue?")
+    assert result is not None
+    assert result.rows == [(295,)]
+    assert result.answer == "answer"
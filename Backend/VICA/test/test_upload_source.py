@@ -0,0 +1,90 @@
+import os
+import sys
+import asyncio
+import hashlib
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from Backend.VICA.apps.RAG.upload_source import UploadSource
+
+
+class FakeUpload:
+    """Pengganti UploadFile: read/seek async, opsional gagal setelah beberapa chunk."""
+
+    def __init__(self, data, filename="report.csv", fail_after=None):
+        self.data = data
+        self.filename = filename
+        self.content_type = "text/csv"
+        self.fail_after = fail_after
+        self._position = 0
+        self._reads = 0
+
+    async def seek(self, offset):
+        self._position = offset
+
+    async def read(self, size):
+        self._reads += 1
+        if self.fail_after is not None and self._reads > self.fail_after:
+            raise ConnectionError("client disconnected")
+        chunk = self.data[self._position : self._position + size]
+        self._position += len(chunk)
+        return chunk
+
+
+def _from_upload(upload, **kwargs):
+    return asyncio.run(UploadSource.from_upload(upload, **kwargs))
+
+
+def test_small_upload_stays_in_memory():
+    data = b"region,revenue\nnorth,120\n"
+    with _from_upload(FakeUpload(data), spool_threshold=1024, chunk_size=8) as source:
+        assert source._path is None
+        assert bytes(source.view()) == data
+        assert source.sha256 == hashlib.sha256(data).hexdigest()
+        assert source.text_stream().read() == data.decode()
+
+        # Path sementara hanya ada selama dipakai
+        with source.as_path() as path:
+            assert path.endswith(".csv")
+            with open(path, "rb") as tmp_file:
+                assert tmp_file.read() == data
+        assert not os.path.exists(path)
+
+
+def test_large_upload_is_spooled_to_disk():
+    data = os.urandom(64 * 1024)
+    source = _from_upload(FakeUpload(data), spool_threshold=16 * 1024, chunk_size=4096)
+    spill_path = source._path
+
+    assert os.path.exists(spill_path)
+    assert source.size == len(data)
+    assert bytes(source.view()) == data
+    assert source.sha256 == hashlib.sha256(data).hexdigest()
+    with source.open() as stream:
+        assert stream.read() == data
+    with source.as_path() as path:
+        assert path == spill_path
+
+    source.close()
+    assert not os.path.exists(spill_path)
+
+
+def test_failed_upload_removes_spill(tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    upload = FakeUpload(os.urandom(64 * 1024), fail_after=5)
+
+    with pytest.raises(ConnectionError):
+        _from_upload(upload, spool_threshold=4096, chunk_size=4096)
+    assert os.listdir(tmp_path) == []
+
+
+def test_from_path_keeps_caller_file(tmp_path):
+    path = tmp_path / "queued-upload"
+    path.write_bytes(b"%PDF-1.4")
+
+    with UploadSource.from_path(str(path), "report.pdf", "application/pdf") as source:
+        assert bytes(source.view()) == b"%PDF-1.4"
+    assert path.exists()
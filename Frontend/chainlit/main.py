@@ -1,5 +1,6 @@
 import os
 import sys
+import asyncio
 import httpx
 import base64
 from typing import Optional, Dict
@@ -15,6 +16,8 @@ chat_id = "7ea73edb-9f9f-458c-907e-b966719bcfb8"
 CHAT_COMPLETIONS_ENDPOINT = "http://localhost:8000/groq/chat/completions"
 RAG_ENDPOINT = "http://localhost:8000/rag/knowledge/query/{chat_id}"
 UPLOAD_KNOWLEDGE_BASE_ENDPOINT = "http://localhost:8000/rag/knowledge/create"
+INGESTION_JOB_ENDPOINT = "http://localhost:8000/rag/knowledge/jobs/{job_id}"
+INGESTION_JOB_POLL_INTERVAL = 3
 
 LITERAL_API_KEY = os.getenv("LITERAL_API_KEY")
 
@@ -222,6 +225,28 @@ async def upload_knowledge_base(user_id: str, chat_id: str, file):
         file_stream.close()  # Tutup file di blok finally
 
 
+async def wait_for_ingestion_job(job_id: str, status_message: cl.Message) -> dict:
+    """Poll status job ingestion sampai selesai atau gagal."""
+    auth_token = cl.user_session.get("auth_token")
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    url = INGESTION_JOB_ENDPOINT.format(job_id=job_id)
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as client:
+        while True:
+            response = await client.get(url, headers=headers)
+            response.raise_for_status()
+            job = response.json()
+
+            if job["status"] in ("completed", "failed"):
+                return job
+
+            status_message.content = (
+                f"Creating Knowledge Base: {job['stage']} ({int(job['progress'] * 100)}%)"
+            )
+            await status_message.update()
+            await asyncio.sleep(INGESTION_JOB_POLL_INTERVAL)
+
+
 @cl.on_message
 async def main(message: cl.Message):
     """Process user message based on the chat settings."""
@@ -250,8 +275,23 @@ async def main(message: cl.Message):
         # Check if files were uploaded
         if files:
             uploaded_file = files[0]
-            await cl.Message(content=f"Creating Knowledge Base User ID: {user_id}, Chat ID: {chat_id}....").send()
-            await upload_knowledge_base(user_id, chat_id, uploaded_file)
+            status_message = cl.Message(content=f"Creating Knowledge Base User ID: {user_id}, Chat ID: {chat_id}....")
+            await status_message.send()
+            result = await upload_knowledge_base(user_id, chat_id, uploaded_file)
+            if not isinstance(result, dict) or "job_id" not in result:
+                await cl.Message(content=f"Creating Knowledge Base failed: {result}").send()
+                return
+
+            try:
+                job = await wait_for_ingestion_job(result["job_id"], status_message)
+            except Exception as e:
+                await cl.Message(content=f"Could not check Knowledge Base status: {e}").send()
+                return
+
+            if job["status"] == "failed":
+                await cl.Message(content=f"Creating Knowledge Base failed: {job['error']}").send()
+                return
+
             elements = [
                 cl.File(
                     name= uploaded_file.name,